@@ -0,0 +1,263 @@
+from collections.abc import AsyncIterator
+from contextlib import nullcontext
+from functools import partial
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+import pandas as pd
+from pandas import DataFrame
+
+from app.BaseDatabaseLoader import BaseDatabaseLoader
+from app.BulkLoader import BulkLoader
+from app.ResultFrame import make_dataframe
+from app.enums.BackendEnum import BackendEnum
+
+
+class AsyncDatabaseLoader(BaseDatabaseLoader):
+    """
+    Async counterpart of DatabaseLoader built on SQLAlchemy asyncio extension
+    and aiomysql driver, queries and loads don't block the event loop
+    while they wait for server
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 5,
+        track_versions: bool = False,
+        maintain_rollups: bool = False,
+    ):
+        """
+        :param pool_size: number of pooled connections, it limits concurrent queries
+        :param track_versions: give new version tokens to pairs changed by loads
+        :param maintain_rollups: update prepared rollups from changed rows of loads
+        """
+
+        super().__init__(
+            pool_size=pool_size,
+            backend=BackendEnum.mysql.value,
+            track_versions=track_versions,
+            maintain_rollups=maintain_rollups,
+        )
+
+        # define connection string for db
+        self.connection_string: str = self._get_connection_string(driver="aiomysql")
+        # define engine for db, it is created in init()
+        self.engine: AsyncEngine | None = None
+
+    async def __aenter__(self):
+        await self.init()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def init(self):
+        """
+        Initialize async SQLAlchemy engine and test connection
+        """
+
+        try:
+            self.engine = create_async_engine(
+                self.connection_string, **self._get_engine_options()
+            )
+            # bulk loader runs on async connections through run_sync
+            self.bulk_loader = BulkLoader(
+                engine=self.engine.sync_engine,
+                dialect=self.dialect,
+                track_changes=self.track_versions or self.maintain_rollups,
+            )
+
+            await self._test_db_initialization()
+            print("Success. Async DB engine has been created.")
+
+        except Exception as e:
+            print(f"Unable to create async SQLAlchemy engine: {e}")
+            self.engine = None
+            raise ConnectionError(f"Unable to connect to BD: {e}")
+
+    async def close(self):
+        """
+        Close every pooled connection
+        """
+
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = None
+
+    async def _test_db_initialization(self):
+        """
+        Test DB connection
+        """
+
+        async with self.engine.connect() as connection:
+            result = (await connection.execute(text("SELECT 1 + 1"))).fetchone()
+            if result and result[0] == 2:
+                self._print_db_working(engine=self.engine)
+
+    async def execute_query_async(self, query: str):
+        """
+        Execute custom MYSQL query and return result
+
+        :param query: query to execute
+        :type query: str
+        """
+
+        try:
+            async with self.engine.connect() as connection:
+                result = (await connection.execute(text(query))).fetchall()
+                if result:
+                    return result
+        except Exception as e:
+            print(f"Error. Unable to execute SQL query: {e}")
+            return []
+
+    async def fetch_dataframe_async(
+        self, query: str, schema: dict[str, str] | None = None, chunk_size: int = 10000
+    ) -> DataFrame:
+        """
+        Execute query and return typed DataFrame, also with columns of zero-row result
+
+        :param query: query to execute
+        :param schema: dtype of columns, e.g. {"price": "float64"}, inferred if missing
+        :param chunk_size: rows fetched from server-side cursor at once
+        :return: DataFrame
+        """
+
+        try:
+            frames = [
+                df
+                async for df in self.iter_dataframe_async(
+                    query=query, schema=schema, chunk_size=chunk_size
+                )
+            ]
+        except Exception:
+            # result broken mid-stream is not returned partially, empty frame is never cached
+            return self._make_empty_frame(schema=schema)
+
+        if len(frames) == 1:
+            return frames[0]
+
+        return pd.concat(frames, ignore_index=True)
+
+    async def iter_dataframe_async(
+        self, query: str, schema: dict[str, str] | None = None, chunk_size: int = 10000
+    ) -> AsyncIterator[DataFrame]:
+        """
+        Execute query streaming rows with server-side cursor and yield typed DataFrame of every chunk
+
+        :param query: query to execute
+        :param schema: dtype of columns, e.g. {"price": "float64"}, inferred if missing
+        :param chunk_size: rows in one DataFrame
+        :return: async iterator of DataFrames, one empty typed DataFrame for zero-row result
+        """
+
+        is_empty = True
+        try:
+            async with self.engine.connect() as connection:
+                result = await connection.stream(text(query))
+                columns = list(result.keys())
+
+                async for rows in result.partitions(chunk_size):
+                    is_empty = False
+                    yield make_dataframe(rows=rows, columns=columns, schema=schema)
+
+                if is_empty:
+                    yield make_dataframe(rows=[], columns=columns, schema=schema)
+
+        except Exception as e:
+            print(f"Error. Unable to execute SQL query: {e}")
+            # yielded chunks can't be taken back, consumer must not take them for whole result
+            if not is_empty:
+                raise
+            yield self._make_empty_frame(schema=schema)
+
+    async def get_watermarks_async(self, table_name: str) -> dict[tuple[str, str], int]:
+        """
+        Get latest loaded date_key for every (coin_name, currency) pair in one grouped query
+
+        :param table_name: table name to get watermarks from.
+        :return: dictionary with (coin_name, currency) as key and MAX(date_key) as value
+        """
+
+        rows = (
+            await self.execute_query_async(
+                query=self._make_watermarks_query(table_name)
+            )
+            or []
+        )
+        return self._to_watermarks(rows)
+
+    async def get_data_versions_async(
+        self, table_name: str
+    ) -> dict[tuple[str, str], int]:
+        """
+        Get version token of every loaded (coin_name, currency) pair of table
+
+        :param table_name: data table name
+        :return: dictionary with (coin_name, currency) as key and token as value
+        """
+
+        # tokens read before are reused without connection until the next load
+        versions = self.data_versions.get_cached_versions(table_name=table_name)
+        if versions is not None:
+            return versions
+
+        async with self.engine.connect() as connection:
+            return await connection.run_sync(
+                lambda sync_connection: self.data_versions.get_versions(
+                    conn=sync_connection, table_name=table_name
+                )
+            )
+
+    async def prepare_rollups_async(self, table_name: str):
+        """
+        Create rollup tables of table if they don't exist yet and fill them from its rows
+
+        :param table_name: data table name
+        """
+
+        async with self.engine.connect() as connection:
+            await connection.run_sync(
+                lambda sync_connection: self.rollups.prepare(
+                    conn=sync_connection, table_name=table_name
+                )
+            )
+
+    async def load_dataframe_async(
+        self,
+        df: DataFrame,
+        table_name: str,
+        strategy: str | None = None,
+        mode: str = "ignore",
+    ) -> dict[str, any] | None:
+        """
+        Load Pandas DataFrame into MySQL table in chunks
+
+        :param df: DataFrame to load.
+        :param table_name: table name where to load.
+        :param strategy: bulk load strategy "insert", "infile" or "auto", loader default if None
+        :param mode: "ignore", "upsert" or "merge", see DatabaseLoader.load_dataframe
+        :return: load statistics or None on error
+        """
+
+        if not self.engine:
+            print("Engine is not initialized")
+            return
+
+        def load(sync_connection) -> dict[str, any] | None:
+            # versions and rollups are updated on the same connection as rows
+            return self._load_tracked(
+                connect=lambda: nullcontext(sync_connection),
+                table_name=table_name,
+                load=partial(
+                    self.bulk_loader.load_with_connection,
+                    conn=sync_connection,
+                    df=df,
+                    table_name=table_name,
+                    strategy=strategy,
+                    mode=mode,
+                ),
+            )
+
+        async with self.engine.connect() as connection:
+            return await connection.run_sync(load)
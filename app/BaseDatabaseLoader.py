@@ -0,0 +1,171 @@
+import os
+from collections.abc import Callable
+from contextlib import AbstractContextManager
+from dotenv import load_dotenv
+
+from sqlalchemy import Connection, Engine
+from sqlalchemy.pool import StaticPool
+from pandas import DataFrame
+
+from app.BulkLoader import BulkLoader
+from app.DataVersions import DataVersions
+from app.ResultFrame import make_dataframe
+from app.Rollups import Rollups
+from app.SqlDialect import get_dialect
+from app.enums.BackendEnum import BackendEnum
+
+load_dotenv()
+
+
+class BaseDatabaseLoader:
+    """
+    Base class of sync and async database loaders.
+    Holds dialect, version tokens and rollups of backend, builds connection settings
+    and loads DataFrames keeping versions and rollups in step with rows.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 5,
+        backend: str = BackendEnum.mysql.value,
+        database: str | None = None,
+        track_versions: bool = False,
+        maintain_rollups: bool = False,
+    ):
+        """
+        :param pool_size: number of pooled connections
+        :param backend: value of BackendEnum
+        :param database: file of embedded database, in-memory database if None
+        :param track_versions: give new version tokens to pairs changed by loads,
+            results cached by QueryCache are valid only while loads of table track versions
+        :param maintain_rollups: update prepared rollups from changed rows of loads,
+            otherwise loads only mark rollups stale and they are rebuilt when prepared
+        """
+
+        self.dialect = get_dialect(backend)
+        self.database = database
+        self.pool_size = pool_size
+        # version tokens of loaded pairs, they invalidate cached query results
+        self.track_versions = track_versions
+        self.data_versions = DataVersions(dialect=self.dialect)
+        # monthly and prefix rollups of data tables read by rollup analytics engine
+        self.maintain_rollups = maintain_rollups
+        self.rollups = Rollups(dialect=self.dialect)
+        self.bulk_loader: BulkLoader | None = None
+
+    def _get_connection_string(self, driver: str = "pymysql") -> str:
+        """
+        Get connection string of backend
+
+        :param driver: MySQL driver, e.g. "pymysql" or "aiomysql"
+        :return: connection string
+        """
+
+        backend = self.dialect.backend
+
+        if backend == BackendEnum.sqlite.value:
+            return f"sqlite:///{self.database}" if self.database else "sqlite://"
+        if backend == BackendEnum.duckdb.value:
+            return f"duckdb:///{self.database or ':memory:'}"
+
+        user = os.getenv("DB_USER")
+        password = os.getenv("DB_PASSWORD")
+        host = os.getenv("DB_HOST")
+        port = os.getenv("INTERNAL_DB_PORT")
+        name = os.getenv("DB_NAME")
+
+        return f"mysql+{driver}://{user}:{password}@{host}:{port}/{name}"
+
+    def _get_engine_options(self) -> dict[str, any]:
+        if self.dialect.backend == BackendEnum.mysql.value:
+            # local_infile lets bulk loader use LOAD DATA LOCAL INFILE
+            # pool is sized explicitly so parallel loader never waits for overflow connections
+            return {
+                "connect_args": {"local_infile": True},
+                "pool_size": self.pool_size,
+                "max_overflow": 0,
+                "pool_pre_ping": True,
+            }
+
+        # every connection to in-memory database would open a new empty one
+        if not self.database:
+            options = {"poolclass": StaticPool}
+            if self.dialect.backend == BackendEnum.sqlite.value:
+                options["connect_args"] = {"check_same_thread": False}
+            return options
+
+        return {"pool_size": self.pool_size, "max_overflow": 0}
+
+    def _print_db_working(self, engine: Engine):
+        if self.dialect.backend == BackendEnum.mysql.value:
+            print(
+                f"Success. MySQL is working correctly. {engine.url.host}:{engine.url.port}"
+            )
+        else:
+            print(
+                f"Success. {self.dialect.backend} is working correctly. {engine.url.database or 'in-memory'}"
+            )
+
+    def _make_watermarks_query(self, table_name: str) -> str:
+        return f"""
+            SELECT coin_name, currency, MAX(date_key) AS max_date_key
+            FROM {self.dialect.quote(table_name)}
+            GROUP BY coin_name, currency;
+        """
+
+    @staticmethod
+    def _to_watermarks(rows: list) -> dict[tuple[str, str], int]:
+        return {(row[0], row[1]): int(row[2]) for row in rows}
+
+    @staticmethod
+    def _make_empty_frame(schema: dict[str, str] | None) -> DataFrame:
+        """
+        Get typed empty DataFrame returned instead of failed query result
+        """
+
+        return make_dataframe(rows=[], columns=list(schema or {}), schema=schema)
+
+    def _load_tracked(
+        self,
+        connect: Callable[[], AbstractContextManager[Connection]],
+        table_name: str,
+        load: Callable[[], dict[str, any]],
+    ) -> dict[str, any] | None:
+        """
+        Run load and give new version tokens and rollup rows to pairs it changed
+
+        :param connect: function opening sync connection, e.g. engine.connect
+        :param table_name: table name where to load
+        :param load: function loading rows and returning load statistics
+        :return: load statistics or None on error
+        """
+
+        try:
+            # rollups, if any, are stale until they are updated from rows of this load
+            with connect() as connection:
+                self.rollups.mark_stale(conn=connection, table_name=table_name)
+
+            stats = load()
+
+            with connect() as connection:
+                # only pairs with inserted or updated rows get new version
+                if self.track_versions:
+                    self.data_versions.bump(
+                        conn=connection,
+                        table_name=table_name,
+                        pairs=stats["changed_pairs"],
+                    )
+                # rollups are recomputed from days of changed rows only
+                if self.maintain_rollups:
+                    self.rollups.update(
+                        conn=connection,
+                        table_name=table_name,
+                        keys=stats["changed_keys"],
+                    )
+
+            return stats
+
+        except Exception as e:
+            # rollups stay marked stale and are rebuilt when they are prepared
+            self.rollups.invalidate(table_name=table_name)
+            print(f"Error while loading DataFrame into table. {e}")
@@ -1,15 +1,159 @@
 import asyncio
+import random
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
 import aiohttp
 
+from app.JsonDecoder import JsonDecoder
+from app.RateLimiter import RateLimiter
+from app.ResponseCache import ResponseCache
+
 
 class BaseFetchClass:
     """
     Base class for fetching data using aiohttp.
     """
 
-    def __init__(self, max_concurrent: int = 3):
-        # create semaphore for excessive requests handling
-        self.semaphore = asyncio.Semaphore(max_concurrent)
+    def __init__(
+        self,
+        max_concurrent: int = 3,
+        requests_per_minute: int | None = None,
+        burst: int | None = None,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        cache: ResponseCache | None = None,
+        request_timeout: float = 15,
+        limit_per_host: int = 10,
+        keepalive_timeout: float = 30,
+        dns_cache_ttl: int = 300,
+        compression: bool = True,
+        decoder: JsonDecoder | None = None,
+    ):
+        # create rate limiter for excessive requests handling
+        self.limiter = RateLimiter(
+            requests_per_minute=requests_per_minute,
+            burst=burst,
+            max_concurrent=max_concurrent,
+        )
+
+        # retry settings
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        # optional on-disk response cache
+        self.cache = cache
+
+        # requests in flight by normalized key with amount of waiting callers
+        self._in_flight: dict[str, list] = {}
+
+        # JSON decoder, orjson based when available
+        self.decoder = decoder or JsonDecoder()
+
+        # connection settings, timeout object is shared by every request
+        self._timeout = aiohttp.ClientTimeout(total=request_timeout)
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.compression = compression
+        self._session: aiohttp.ClientSession | None = None
+
+        # per-run statistics
+        self.stats: dict[str, int | float] = {}
+        self.reset_stats()
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        """
+        Open long-lived session reused by every fetch until close() is called.
+        """
+
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+
+    async def close(self):
+        """
+        Close long-lived session and its connection pool.
+        """
+
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        """
+        Create aiohttp session with tuned connection pool.
+
+        :return: aiohttp session instance
+        """
+
+        connector = aiohttp.TCPConnector(
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+        )
+        headers = {
+            "Accept-Encoding": "gzip, deflate" if self.compression else "identity"
+        }
+
+        return aiohttp.ClientSession(
+            connector=connector,
+            headers=headers,
+            timeout=self._timeout,
+            auto_decompress=self.compression,
+        )
+
+    @asynccontextmanager
+    async def _session_scope(self):
+        """
+        Get long-lived session if it is open, otherwise temporary one.
+        """
+
+        if self._session is not None and not self._session.closed:
+            yield self._session
+            return
+
+        session = self._create_session()
+        try:
+            yield session
+        finally:
+            await session.close()
+
+    def reset_stats(self):
+        """
+        Reset per-run fetch statistics.
+        """
+
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "server_errors": 0,
+            "timeouts": 0,
+            "failed": 0,
+            "coalesced": 0,
+            "wait_time": 0.0,
+            "backoff_time": 0.0,
+        }
+
+    def get_stats(self) -> dict[str, int | float]:
+        """
+        Get fetch statistics of current run.
+
+        :return: dictionary with counters and time spent waiting in seconds
+        """
+
+        return {**self.stats, "concurrency_limit": self.limiter.concurrency_limit}
 
     async def gather_data(self, urls: list[tuple[str, dict]]) -> list[dict[str, any]]:
         """
@@ -20,28 +164,165 @@ class BaseFetchClass:
         """
 
         result = []
+        self.reset_stats()
 
-        # open aiohttp connection
-        async with aiohttp.ClientSession() as session:
+        # reuse long-lived aiohttp session or open temporary one
+        async with self._session_scope() as session:
             tasks = []
 
             # go through urls and get all aiohttp tasks
             for url, params in urls:
                 task = asyncio.create_task(
-                    self._fetch_data(session=session, base_url=url, params=params)
+                    self._get_data(session=session, base_url=url, params=params)
                 )
                 tasks.append(task)
 
             # prepare tasks for execution
             result = await asyncio.gather(*tasks)
 
+            # persist cache index for next runs
+            if self.cache is not None:
+                self.cache.flush()
+
+            self._print_stats()
             return result
 
+    async def stream_data(
+        self, urls: list[tuple[str, dict]], max_in_flight: int | None = None
+    ) -> AsyncIterator[tuple[int, dict[str, any]]]:
+        """
+        Yields data of every url as soon as it is fetched.
+
+        :param urls: list of tuple with full url in dictionary.
+        :param max_in_flight: maximum amount of requests scheduled at once,
+            consumer not reading results stops scheduling of new requests
+        :return: async iterator of (index of url, fetched data)
+        """
+
+        self.reset_stats()
+        max_in_flight = max_in_flight or max(1, len(urls))
+        pending: set[asyncio.Task] = set()
+        url_iterator = iter(enumerate(urls))
+
+        # reuse long-lived aiohttp session or open temporary one
+        async with self._session_scope() as session:
+            try:
+                while True:
+                    # fill window of scheduled requests
+                    while len(pending) < max_in_flight:
+                        next_url = next(url_iterator, None)
+                        if next_url is None:
+                            break
+                        index, (url, params) = next_url
+                        pending.add(
+                            asyncio.create_task(
+                                self._get_indexed_data(
+                                    index=index,
+                                    session=session,
+                                    base_url=url,
+                                    params=params,
+                                )
+                            )
+                        )
+
+                    if not pending:
+                        break
+
+                    # yield results in order of completion
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        yield task.result()
+            finally:
+                # cancel requests if consumer stopped early
+                for task in pending:
+                    task.cancel()
+
+        if self.cache is not None:
+            self.cache.flush()
+
+        self._print_stats()
+
+    async def _get_indexed_data(
+        self, index: int, session: aiohttp.ClientSession, base_url: str, params: dict
+    ) -> tuple[int, dict[str, any]]:
+        """
+        Get data and keep index of url it belongs to.
+        """
+
+        return index, await self._get_data(
+            session=session, base_url=base_url, params=params
+        )
+
+    async def _get_data(
+        self, session: aiohttp.ClientSession, base_url: str, params: dict
+    ) -> dict[str, any]:
+        """
+        Get data sharing one underlying request between concurrent callers
+        asking for the same normalized url and params.
+
+        :param session: aiohttp session instance
+        :param base_url: base url
+        :param params: dictionary with keys and values of url params
+        :return: cached or fetched result
+        """
+
+        key = BaseFetchClass._make_request_key(base_url=base_url, params=params)
+
+        # join request which is already in flight
+        entry = self._in_flight.get(key)
+        if entry is None:
+            task = asyncio.create_task(
+                self._get_cached_data(session=session, base_url=base_url, params=params)
+            )
+            entry = [task, 0]
+            self._in_flight[key] = entry
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+
+        entry[1] += 1
+        try:
+            # shield shared request from cancellation of a single caller
+            return await asyncio.shield(entry[0])
+        finally:
+            entry[1] -= 1
+
+            # cancel request nobody waits for anymore
+            if entry[1] == 0 and not entry[0].done():
+                entry[0].cancel()
+
+    async def _get_cached_data(
+        self, session: aiohttp.ClientSession, base_url: str, params: dict
+    ) -> dict[str, any]:
+        """
+        Get data from response cache or fetch it.
+
+        :param session: aiohttp session instance
+        :param base_url: base url
+        :param params: dictionary with keys and values of url params
+        :return: cached or fetched result
+        """
+
+        if self.cache is not None:
+            # read cache off the event loop
+            body = await asyncio.to_thread(self.cache.get, base_url, params)
+            if body is not None:
+                try:
+                    return await self.decoder.decode_async(body)
+                except ValueError:
+                    print(f"Unable to decode cached response for {base_url}")
+
+        # successful responses are saved to cache by _request
+        return await self._fetch_data(session=session, base_url=base_url, params=params)
+
     async def _fetch_data(
         self, session: aiohttp.ClientSession, base_url: str, params: dict
     ) -> dict[str, any]:
         """
         Fetches data from one URL given as an argument.
+        Retries rate limit, server and timeout errors with exponential backoff.
 
         :param session: aiohttp session instance
         :param base_url: base url
@@ -49,38 +330,187 @@ class BaseFetchClass:
         :return: fetched result
         """
 
-        async with self.semaphore:
-            timeout = aiohttp.ClientTimeout(total=15)
+        for attempt in range(self.max_retries + 1):
+            # wait for rate limiter
+            self.stats["wait_time"] += await self.limiter.acquire()
             try:
-                # get response
-                async with session.get(
-                    base_url, params=params, timeout=timeout
-                ) as response:
-                    # check if response is received
-                    if response.status == 200:
-                        res = await response.json()
-
-                        # check if response contains errors
-                        if isinstance(res, dict) and "error" in res:
-                            print(f"API error for {response.url}: {res['error']}")
-                            return {}
-
-                        # return response if everything is correct
-                        return res
-
-                    # check if response has rate limit error
-                    elif response.status == 429:
-                        print(f"Rate limit (429) for {response.url}")
-                        return {}
-                    # check if response has other types of error
-                    else:
-                        print(
-                            f"Error. Unable to fetch data from {response.url}. Error code: {response.status}."
-                        )
-                        return {}
-            except aiohttp.ClientError as e:
-                print(f"Critical aiohttp error. {e}")
-                return {}
-            except asyncio.TimeoutError as e:
-                print(f"Timeout for {base_url}")
-                return {}
+                result, retry_after = await self._request(
+                    session=session, base_url=base_url, params=params
+                )
+            finally:
+                await self.limiter.release()
+
+            # return result if request is not retryable
+            if result is not None:
+                return result
+
+            if attempt == self.max_retries:
+                break
+
+            # wait before next attempt
+            delay = (
+                retry_after
+                if retry_after is not None
+                else self._get_backoff_delay(attempt)
+            )
+            self.stats["retries"] += 1
+            self.stats["backoff_time"] += delay
+            await asyncio.sleep(delay)
+
+        self.stats["failed"] += 1
+        print(
+            f"Error. Unable to fetch data from {base_url} after {self.max_retries + 1} attempts."
+        )
+        return {}
+
+    async def _request(
+        self, session: aiohttp.ClientSession, base_url: str, params: dict
+    ) -> tuple[dict[str, any] | None, float | None]:
+        """
+        Make one request to URL given as an argument.
+
+        :param session: aiohttp session instance
+        :param base_url: base url
+        :param params: dictionary with keys and values of url params
+        :return: fetched result or None if request should be retried, and Retry-After delay
+        """
+
+        self.stats["requests"] += 1
+        try:
+            # get response
+            async with session.get(
+                base_url, params=params, timeout=self._timeout
+            ) as response:
+                # check if response is received
+                if response.status == 200:
+                    body = await response.read()
+                    self.limiter.on_success()
+
+                    # decode large bodies off the event loop
+                    try:
+                        res = await self.decoder.decode_async(body)
+                    except ValueError as e:
+                        print(f"Unable to decode response from {response.url}. {e}")
+                        return None, None
+
+                    # check if response contains errors
+                    if isinstance(res, dict) and "error" in res:
+                        print(f"API error for {response.url}: {res['error']}")
+                        return {}, None
+
+                    # cache raw body so it is decoded the same way on hit
+                    if self.cache is not None:
+                        await asyncio.to_thread(self.cache.set, base_url, params, body)
+
+                    # return response if everything is correct
+                    return res, None
+
+                # check if response has rate limit error
+                elif response.status == 429:
+                    retry_after = self._parse_retry_after(
+                        response.headers.get("Retry-After")
+                    )
+                    # server may ask to wait for hours, never wait longer than backoff allows
+                    if retry_after is not None:
+                        retry_after = min(retry_after, self.backoff_max)
+                    print(f"Rate limit (429) for {response.url}")
+                    self.stats["rate_limited"] += 1
+                    self.limiter.on_rate_limited(retry_after)
+                    return None, retry_after
+
+                # check if response has server error
+                elif response.status >= 500:
+                    print(
+                        f"Server error for {response.url}. Error code: {response.status}."
+                    )
+                    self.stats["server_errors"] += 1
+                    return None, None
+
+                # check if response has other types of error
+                else:
+                    print(
+                        f"Error. Unable to fetch data from {response.url}. Error code: {response.status}."
+                    )
+                    return {}, None
+        except aiohttp.ClientError as e:
+            print(f"Critical aiohttp error. {e}")
+            return None, None
+        except asyncio.TimeoutError as e:
+            print(f"Timeout for {base_url}")
+            self.stats["timeouts"] += 1
+            return None, None
+
+    def _get_backoff_delay(self, attempt: int) -> float:
+        """
+        Get exponential backoff delay with full jitter.
+
+        :param attempt: zero-based number of failed attempt
+        :return: delay in seconds
+        """
+
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    @staticmethod
+    def _make_request_key(base_url: str, params: dict) -> str:
+        """
+        Make key identifying request by normalized url and params.
+        Coin ids are lowercase so the whole url is lowercased.
+
+        :param base_url: base url
+        :param params: dictionary with keys and values of url params
+        :return: normalized request key
+        """
+
+        normalized_params = sorted(
+            (str(k), str(v).strip().lower()) for k, v in params.items()
+        )
+        return f"{base_url.strip().rstrip('/').lower()}?{normalized_params}"
+
+    @staticmethod
+    def _parse_retry_after(value: str | None) -> float | None:
+        """
+        Parse Retry-After header given either in seconds or as HTTP date.
+
+        :param value: header value
+        :return: delay in seconds or None if header is absent or invalid
+        """
+
+        if not value:
+            return None
+
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+    def _print_stats(self):
+        """
+        Print fetch statistics of current run.
+        """
+
+        stats = self.get_stats()
+        print(
+            f"Fetch stats. Requests: {stats['requests']}, retries: {stats['retries']}, "
+            f"rate limited: {stats['rate_limited']}, failed: {stats['failed']}, "
+            f"coalesced: {stats['coalesced']}, "
+            f"waited: {stats['wait_time']:.2f}s, backed off: {stats['backoff_time']:.2f}s, "
+            f"concurrency: {stats['concurrency_limit']:.2f}."
+        )
+
+        if self.cache is not None:
+            report = self.cache.get_report()
+            print(
+                f"Cache stats. Hits: {report['hits']}, misses: {report['misses']}, "
+                f"hit ratio: {report['hit_ratio']:.2%}, entries: {report['entries']}, "
+                f"size: {report['total_bytes']} bytes."
+            )
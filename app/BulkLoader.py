@@ -0,0 +1,676 @@
+import os
+import tempfile
+import threading
+import time
+from itertools import chain
+
+import pandas as pd
+from sqlalchemy import Connection, Engine
+
+from app.SqlDialect import (
+    CRYPTO_DATA_KEY_COLUMNS,
+    CRYPTO_DATA_PAIR_COLUMNS,
+    SqlDialect,
+)
+
+
+class BulkLoader:
+    """
+    Bulk loader of DataFrames into database table.
+
+    Frame is sent in chunks committed one by one, either as multi-row INSERT
+    statements, as temporary TSV files loaded with LOAD DATA LOCAL INFILE (MySQL)
+    or as DataFrame scanned by database directly (DuckDB). In auto mode every
+    strategy of backend is probed on first rows and the fastest one is used
+    for the rest of the frame and following loads.
+
+    Rows with existing primary key are ignored, updated in place (upsert) or
+    merged from temporary staging table with one set-based statement (merge).
+    With track_changes, keys of chunks whose statement inserted or updated rows
+    (of rows which differ from stored ones in merge mode) are reported as
+    changed_keys and their pairs, derived once per load, as changed_pairs.
+    """
+
+    MODES = ("ignore", "upsert", "merge")
+
+    def __init__(
+        self,
+        engine: Engine,
+        dialect: SqlDialect | None = None,
+        strategy: str = "auto",
+        rows_per_statement: int = 5000,
+        sample_rows: int = 2000,
+        key_columns: tuple[str, ...] = CRYPTO_DATA_KEY_COLUMNS,
+        verbose: bool = True,
+        track_changes: bool = False,
+    ):
+        """
+        :param engine: SQLAlchemy engine, LOAD DATA requires local_infile connect arg
+        :param dialect: SQL dialect of backend, MySQL if None
+        :param strategy: one of dialect bulk strategies or "auto"
+        :param rows_per_statement: max rows sent in one statement or file
+        :param sample_rows: rows loaded with every strategy when probing in auto mode
+        :param key_columns: primary key columns of target tables
+        :param verbose: print statistics of every load
+        :param track_changes: report keys and pairs of changed rows,
+            needed by data versions and rollups only
+        """
+
+        self.dialect = dialect or SqlDialect()
+        if strategy not in (*self.dialect.bulk_strategies, "auto"):
+            raise ValueError(f"Unknown bulk load strategy: {strategy}")
+
+        self.engine = engine
+        self.strategy = strategy
+        self.rows_per_statement = rows_per_statement
+        self.sample_rows = sample_rows
+        self.key_columns = key_columns
+        self.verbose = verbose
+        self.track_changes = track_changes
+
+        # learned state is shared by threads of ParallelLoader
+        self._lock = threading.Lock()
+        self._best_strategy: str | None = None
+        self._unavailable_strategies: set[str] = set()
+        self._max_allowed_packet: int | None = None
+
+    def load(
+        self,
+        df: pd.DataFrame,
+        table_name: str,
+        strategy: str | None = None,
+        mode: str = "ignore",
+    ) -> dict[str, any]:
+        """
+        Load DataFrame into table
+
+        :param df: DataFrame to load
+        :param table_name: table name where to load
+        :param strategy: overrides strategy given in constructor
+        :param mode: "ignore" keeps existing rows, "upsert" updates them with
+            ON DUPLICATE KEY UPDATE, "merge" loads into staging table first
+            and reports inserted, updated and unchanged rows
+        :return: load statistics
+        """
+
+        with self.engine.connect() as conn:
+            return self.load_with_connection(
+                conn=conn, df=df, table_name=table_name, strategy=strategy, mode=mode
+            )
+
+    def load_with_connection(
+        self,
+        conn: Connection,
+        df: pd.DataFrame,
+        table_name: str,
+        strategy: str | None = None,
+        mode: str = "ignore",
+    ) -> dict[str, any]:
+        """
+        Load DataFrame through given connection, also used by async loader via run_sync
+
+        :param conn: open connection
+        :param df: DataFrame to load
+        :param table_name: table name where to load
+        :param strategy: overrides strategy given in constructor
+        :param mode: "ignore", "upsert" or "merge"
+        :return: load statistics
+        """
+
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown load mode: {mode}")
+
+        strategy = strategy or self.strategy
+
+        if mode == "merge":
+            stats = self.load_merge(
+                conn=conn, df=df, table_name=table_name, strategy=strategy
+            )
+        else:
+            # LOAD DATA can only ignore or replace whole rows,
+            # first strategy of every backend supports upsert
+            if mode == "upsert" and strategy in ("infile", "auto"):
+                strategy = self.dialect.bulk_strategies[0]
+
+            stats = self._load_chunks(
+                conn=conn, df=df, table_name=table_name, strategy=strategy, mode=mode
+            )
+
+        stats["changed_pairs"] = BulkLoader._get_changed_pairs(stats["changed_keys"])
+
+        if self.verbose:
+            BulkLoader._print_stats(stats=stats, table_name=table_name)
+
+        return stats
+
+    def load_merge(
+        self,
+        conn: Connection,
+        df: pd.DataFrame,
+        table_name: str,
+        strategy: str | None = None,
+    ) -> dict[str, any]:
+        """
+        Bulk load DataFrame into temporary staging table and merge it into
+        target table with one INSERT ... SELECT ... ON DUPLICATE KEY UPDATE
+
+        :param conn: open connection, temporary table lives only in it
+        :param df: DataFrame to load
+        :param table_name: table name where to merge
+        :param strategy: strategy of loading staging table
+        :return: load statistics with inserted, updated and unchanged row counts
+        """
+
+        staging_table = f"{table_name}_staging"
+        columns = list(df.columns)
+
+        conn.exec_driver_sql(self.dialect.drop_staging_table_sql(staging_table))
+        conn.exec_driver_sql(
+            self.dialect.create_staging_table_sql(
+                staging_table=staging_table, table_name=table_name
+            )
+        )
+
+        try:
+            stats = self._load_chunks(
+                conn=conn,
+                df=df,
+                table_name=staging_table,
+                strategy=strategy or self.strategy,
+                mode="ignore",
+            )
+
+            counts = self._count_merge_changes(
+                conn=conn,
+                staging_table=staging_table,
+                table_name=table_name,
+                columns=columns,
+            )
+
+            started = time.perf_counter()
+            conn.exec_driver_sql(
+                self.dialect.merge_sql(
+                    staging_table=staging_table,
+                    table_name=table_name,
+                    columns=columns,
+                    key_columns=list(self.key_columns),
+                    value_columns=self._get_value_columns(columns),
+                )
+            )
+            conn.commit()
+            stats["merge_seconds"] = time.perf_counter() - started
+        finally:
+            conn.exec_driver_sql(self.dialect.drop_staging_table_sql(staging_table))
+
+        # counts replace keys of rows loaded into staging table
+        stats.update(counts)
+        return stats
+
+    def load_insert(
+        self,
+        conn: Connection,
+        df: pd.DataFrame,
+        table_name: str,
+        mode: str = "ignore",
+    ) -> dict[str, any]:
+        """
+        Load DataFrame with chunked multi-row INSERT statements,
+        every statement is kept below max_allowed_packet or parameter limit
+
+        :param conn: open connection
+        :param df: DataFrame to load
+        :param table_name: table name where to load
+        :param mode: "ignore" or "upsert"
+        :return: load statistics
+        """
+
+        stats = BulkLoader._make_stats(strategy="insert")
+        if df.empty:
+            return stats
+
+        columns = BulkLoader._get_column_values(df)
+        cols = ", ".join(self.dialect.quote(k) for k in df.columns)
+        row_placeholder = (
+            "(" + ", ".join([self.dialect.placeholder] * len(df.columns)) + ")"
+        )
+        insert, on_duplicate = self._get_insert_clauses(columns=df.columns, mode=mode)
+
+        chunk_size = self._get_insert_chunk_size(conn=conn, columns=columns)
+
+        for start in range(0, len(df), chunk_size):
+            rows = list(
+                zip(*(values[start : start + chunk_size] for values in columns))
+            )
+            sql = (
+                f"{insert} {self.dialect.quote(table_name)} ({cols}) VALUES "
+                + ", ".join([row_placeholder] * len(rows))
+                + on_duplicate
+            )
+
+            started = time.perf_counter()
+            result = conn.exec_driver_sql(sql, tuple(chain.from_iterable(rows)))
+            affected_rows = self.dialect.affected_rows(result)
+            conn.commit()
+            BulkLoader._add_chunk(stats, len(rows), time.perf_counter() - started)
+            self._add_changed_keys(
+                stats, df.iloc[start : start + chunk_size], affected_rows
+            )
+
+        return stats
+
+    def load_infile(
+        self, conn: Connection, df: pd.DataFrame, table_name: str
+    ) -> dict[str, any]:
+        """
+        Load DataFrame with LOAD DATA LOCAL INFILE from temporary TSV file
+        written for every chunk, rows with existing primary key are ignored
+
+        :param conn: open connection
+        :param df: DataFrame to load
+        :param table_name: table name where to load
+        :return: load statistics
+        """
+
+        stats = BulkLoader._make_stats(strategy="infile")
+        if df.empty:
+            return stats
+
+        cols = ", ".join(f"`{k}`" for k in df.columns)
+
+        for start in range(0, len(df), self.rows_per_statement):
+            df_chunk = df.iloc[start : start + self.rows_per_statement]
+
+            started = time.perf_counter()
+            path = BulkLoader._write_tsv(df_chunk)
+            try:
+                result = conn.exec_driver_sql(
+                    f"LOAD DATA LOCAL INFILE '{path}' IGNORE INTO TABLE `{table_name}` "
+                    "FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' "
+                    f"({cols})"
+                )
+                affected_rows = self.dialect.affected_rows(result)
+                conn.commit()
+            finally:
+                os.remove(path)
+            BulkLoader._add_chunk(stats, len(df_chunk), time.perf_counter() - started)
+            self._add_changed_keys(stats, df_chunk, affected_rows)
+
+        return stats
+
+    def load_frame(
+        self,
+        conn: Connection,
+        df: pd.DataFrame,
+        table_name: str,
+        mode: str = "ignore",
+    ) -> dict[str, any]:
+        """
+        Load DataFrame chunks registered as DuckDB views with INSERT ... SELECT,
+        column arrays are scanned directly without converting them into Python objects
+
+        :param conn: open DuckDB connection
+        :param df: DataFrame to load
+        :param table_name: table name where to load
+        :param mode: "ignore" or "upsert"
+        :return: load statistics
+        """
+
+        stats = BulkLoader._make_stats(strategy="frame")
+        if df.empty:
+            return stats
+
+        cols = ", ".join(self.dialect.quote(k) for k in df.columns)
+        insert, on_duplicate = self._get_insert_clauses(columns=df.columns, mode=mode)
+        view_name = f"{table_name}_frame"
+        driver_connection = conn.connection.driver_connection
+
+        for start in range(0, len(df), self.rows_per_statement):
+            df_chunk = df.iloc[start : start + self.rows_per_statement]
+
+            started = time.perf_counter()
+            driver_connection.register(view_name, df_chunk)
+            try:
+                result = conn.exec_driver_sql(
+                    f"{insert} {self.dialect.quote(table_name)} ({cols}) "
+                    f"SELECT {cols} FROM {self.dialect.quote(view_name)} WHERE TRUE"
+                    + on_duplicate
+                )
+                affected_rows = self.dialect.affected_rows(result)
+                conn.commit()
+            finally:
+                driver_connection.unregister(view_name)
+            BulkLoader._add_chunk(stats, len(df_chunk), time.perf_counter() - started)
+            self._add_changed_keys(stats, df_chunk, affected_rows)
+
+        return stats
+
+    def _get_insert_clauses(self, columns, mode: str) -> tuple[str, str]:
+        """
+        Get INSERT keyword and clause handling rows with existing primary key
+        """
+
+        if mode == "upsert":
+            return "INSERT INTO", self.dialect.upsert_clause(
+                key_columns=list(self.key_columns),
+                value_columns=self._get_value_columns(columns),
+            )
+
+        return self.dialect.insert_ignore, ""
+
+    def _load_chunks(
+        self,
+        conn: Connection,
+        df: pd.DataFrame,
+        table_name: str,
+        strategy: str,
+        mode: str,
+    ) -> dict[str, any]:
+        if strategy == "auto":
+            with self._lock:
+                strategy = self._best_strategy
+
+        if strategy is None:
+            return self._load_probing(conn=conn, df=df, table_name=table_name)
+
+        return self._load_with(
+            conn=conn, df=df, table_name=table_name, strategy=strategy, mode=mode
+        )
+
+    def _load_with(
+        self,
+        conn: Connection,
+        df: pd.DataFrame,
+        table_name: str,
+        strategy: str,
+        mode: str = "ignore",
+    ) -> dict[str, any]:
+        if strategy == "infile":
+            return self.load_infile(conn=conn, df=df, table_name=table_name)
+        if strategy == "frame":
+            return self.load_frame(conn=conn, df=df, table_name=table_name, mode=mode)
+        if strategy == "insert":
+            return self.load_insert(conn=conn, df=df, table_name=table_name, mode=mode)
+
+        raise ValueError(f"Unknown bulk load strategy: {strategy}")
+
+    def _load_probing(
+        self, conn: Connection, df: pd.DataFrame, table_name: str
+    ) -> dict[str, any]:
+        """
+        Load first rows with every strategy ignoring existing rows,
+        remember the fastest one and load the rest of rows with it
+
+        :param conn: open connection
+        :param df: DataFrame to load
+        :param table_name: table name where to load
+        :return: merged load statistics
+        """
+
+        probes: dict[str, dict[str, any]] = {}
+        offset = 0
+
+        for strategy in self._get_available_strategies():
+
+            df_sample = df.iloc[offset : offset + self.sample_rows]
+            if df_sample.empty:
+                break
+
+            try:
+                probes[strategy] = self._load_with(
+                    conn=conn, df=df_sample, table_name=table_name, strategy=strategy
+                )
+            except Exception as e:
+                if strategy == "insert":
+                    raise
+
+                # e.g. LOAD DATA LOCAL is disabled on client or server
+                print(f"Error. Bulk load strategy {strategy} is not available: {e}")
+                with self._lock:
+                    self._unavailable_strategies.add(strategy)
+                continue
+
+            offset += len(df_sample)
+
+        best = max(probes, key=lambda s: probes[s]["rows_per_sec"], default="insert")
+
+        # remember winner only when every available strategy has been measured
+        if all(s in probes for s in self._get_available_strategies()):
+            with self._lock:
+                self._best_strategy = best
+
+        stats_list = list(probes.values())
+        if offset < len(df):
+            stats_list.append(
+                self._load_with(
+                    conn=conn, df=df.iloc[offset:], table_name=table_name, strategy=best
+                )
+            )
+
+        stats = BulkLoader._merge_stats(stats_list, strategy=best)
+        stats["probes"] = {s: probes[s]["rows_per_sec"] for s in probes}
+
+        return stats
+
+    def _count_merge_changes(
+        self,
+        conn: Connection,
+        staging_table: str,
+        table_name: str,
+        columns: list[str],
+    ) -> dict[str, int]:
+        """
+        Count rows of staging table which are new, differ from target table or are equal to it
+
+        :param conn: open connection with staging table
+        :param staging_table: staging table name
+        :param table_name: target table name
+        :param columns: loaded columns
+        :return: inserted, updated and unchanged row counts and keys of inserted or updated rows
+        """
+
+        quote = self.dialect.quote
+        join_on = " AND ".join(f"s.{quote(k)} = t.{quote(k)}" for k in self.key_columns)
+        is_equal = (
+            " AND ".join(
+                self.dialect.null_safe_equal(f"s.{quote(k)}", f"t.{quote(k)}")
+                for k in self._get_value_columns(columns)
+            )
+            or "TRUE"
+        )
+        first_key = quote(self.key_columns[0])
+        keys = ", ".join(f"s.{quote(k)}" for k in self.key_columns)
+
+        # only keys of changed rows are read, unchanged rows are counted
+        rows = conn.exec_driver_sql(f"""
+            SELECT {keys}, CASE WHEN t.{first_key} IS NULL THEN 1 ELSE 0 END
+            FROM {quote(staging_table)} AS s
+            LEFT JOIN {quote(table_name)} AS t ON {join_on}
+            WHERE t.{first_key} IS NULL OR NOT ({is_equal})
+            """).fetchall()
+        total = conn.exec_driver_sql(
+            f"SELECT COUNT(*) FROM {quote(staging_table)}"
+        ).fetchone()[0]
+
+        key_size = len(self.key_columns)
+        inserted = sum(int(row[key_size]) for row in rows)
+        counts = {
+            "inserted": inserted,
+            "updated": len(rows) - inserted,
+            "unchanged": int(total) - len(rows),
+            "changed_keys": [],
+        }
+        self._add_changed_keys(
+            counts,
+            pd.DataFrame(
+                [row[:key_size] for row in rows], columns=list(self.key_columns)
+            ),
+            affected_rows=len(rows),
+        )
+
+        return counts
+
+    def _get_value_columns(self, columns) -> list[str]:
+        return [k for k in columns if k not in self.key_columns]
+
+    def _get_available_strategies(self) -> list[str]:
+        with self._lock:
+            return [
+                s
+                for s in self.dialect.bulk_strategies
+                if s not in self._unavailable_strategies
+            ]
+
+    def _get_insert_chunk_size(self, conn: Connection, columns: list[list]) -> int:
+        """
+        Get rows per INSERT statement bounded by max_allowed_packet,
+        size of row is estimated on first rows
+
+        :param conn: open connection
+        :param columns: values of every column
+        :return: rows per statement
+        """
+
+        # embedded backends limit number of parameters instead of packet size
+        if self.dialect.max_statement_params is not None:
+            rows_in_statement = self.dialect.max_statement_params // len(columns)
+            return max(1, min(self.rows_per_statement, rows_in_statement))
+
+        with self._lock:
+            if self._max_allowed_packet is None:
+                row = conn.exec_driver_sql("SELECT @@max_allowed_packet").fetchone()
+                self._max_allowed_packet = int(row[0]) if row else 4 * 1024 * 1024
+
+        sample = list(zip(*(values[:100] for values in columns)))
+        # every value is escaped and separated by comma, row is wrapped in brackets
+        row_bytes = max(sum(len(str(value)) + 4 for value in row) + 4 for row in sample)
+
+        # leave part of packet for statement header
+        rows_in_packet = int(self._max_allowed_packet * 0.9) // row_bytes
+
+        return max(1, min(self.rows_per_statement, rows_in_packet))
+
+    @staticmethod
+    def _get_column_values(df: pd.DataFrame) -> list[list]:
+        """
+        Get values of every column as list of Python objects with None for missing values
+        """
+
+        return [
+            df[column].astype(object).where(df[column].notna(), None).tolist()
+            for column in df.columns
+        ]
+
+    @staticmethod
+    def _write_tsv(df: pd.DataFrame) -> str:
+        """
+        Write DataFrame to temporary TSV file in format expected by LOAD DATA
+
+        :param df: DataFrame to write
+        :return: path of file with forward slashes
+        """
+
+        fd, path = tempfile.mkstemp(suffix=".tsv")
+        with os.fdopen(fd, "w", newline="", encoding="utf-8") as file:
+            df.to_csv(
+                file,
+                sep="\t",
+                header=False,
+                index=False,
+                na_rep="\\N",
+                lineterminator="\n",
+            )
+
+        return path.replace("\\", "/")
+
+    @staticmethod
+    def _make_stats(strategy: str) -> dict[str, any]:
+        return {
+            "strategy": strategy,
+            "rows": 0,
+            "seconds": 0.0,
+            "rows_per_sec": 0.0,
+            "chunk_latencies": [],
+            "changed_keys": [],
+            "changed_pairs": set(),
+        }
+
+    @staticmethod
+    def _add_chunk(stats: dict[str, any], rows: int, seconds: float):
+        stats["rows"] += rows
+        stats["seconds"] += seconds
+        stats["chunk_latencies"].append(seconds)
+        if stats["seconds"]:
+            stats["rows_per_sec"] = stats["rows"] / stats["seconds"]
+
+    def _add_changed_keys(
+        self, stats: dict[str, any], df_chunk: pd.DataFrame, affected_rows: int
+    ):
+        """
+        Remember keys of rows loaded by statement which inserted or updated any of them
+
+        :param stats: load statistics
+        :param df_chunk: rows loaded by statement
+        :param affected_rows: rows changed by statement, -1 if unknown
+        """
+
+        key_columns = list(self.key_columns)
+        if (
+            not self.track_changes
+            or df_chunk.empty
+            or affected_rows == 0
+            or not set(key_columns) <= set(df_chunk.columns)
+        ):
+            return
+
+        stats["changed_keys"].append(df_chunk[key_columns])
+
+    @staticmethod
+    def _get_changed_pairs(keys: list[pd.DataFrame]) -> set[tuple[str, str]]:
+        """
+        Get (coin_name, currency) pairs of changed keys of load
+        """
+
+        pair_columns = list(CRYPTO_DATA_PAIR_COLUMNS)
+        frames = [
+            df_keys[pair_columns]
+            for df_keys in keys
+            if set(pair_columns) <= set(df_keys.columns)
+        ]
+        if not frames:
+            return set()
+
+        df_pairs = pd.concat(frames).astype(object).drop_duplicates()
+        return set(df_pairs.itertuples(index=False, name=None))
+
+    @staticmethod
+    def _merge_stats(stats_list: list[dict[str, any]], strategy: str) -> dict[str, any]:
+        merged = BulkLoader._make_stats(strategy=strategy)
+        for stats in stats_list:
+            merged["rows"] += stats["rows"]
+            merged["seconds"] += stats["seconds"]
+            merged["chunk_latencies"].extend(stats["chunk_latencies"])
+            merged["changed_keys"].extend(stats["changed_keys"])
+
+        if merged["seconds"]:
+            merged["rows_per_sec"] = merged["rows"] / merged["seconds"]
+
+        return merged
+
+    @staticmethod
+    def _print_stats(stats: dict[str, any], table_name: str):
+        latencies = stats["chunk_latencies"]
+        if not latencies:
+            return
+
+        print(
+            f"Success. Loaded {stats['rows']} records into {table_name} "
+            f"with {stats['strategy']} in {stats['seconds']:.2f}s "
+            f"({stats['rows_per_sec']:.0f} rows/s, {len(latencies)} chunks, "
+            f"chunk latency avg {sum(latencies) / len(latencies) * 1000:.1f}ms, "
+            f"max {max(latencies) * 1000:.1f}ms)"
+        )
+        if "inserted" in stats:
+            print(
+                f"Success. Merged into {table_name}: {stats['inserted']} inserted, "
+                f"{stats['updated']} updated, {stats['unchanged']} unchanged"
+            )
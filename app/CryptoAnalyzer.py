@@ -1,39 +1,137 @@
 import pandas as pd
+from app.AsyncDatabaseLoader import AsyncDatabaseLoader
 from app.DatabaseLoader import DatabaseLoader
+from app.FrameAnalyzer import FrameAnalyzer
+from app.QueryCache import QueryCache
+from app.Rollups import Rollups
+from app.enums.AnalyticsEngineEnum import AnalyticsEngineEnum
 from app.enums.ColumnsToAnalyzeEnum import ColumnsToAnalyzeEnum
 from app.enums.OrderEnum import OrderEnum
 
 
 class CryptoAnalyzer:
-    """Class for executing MySQL queries to extract analyzed data from table and return it as DataFrame"""
+    """Class for executing SQL queries to extract analyzed data from table and return it as DataFrame"""
+
+    def __init__(
+        self,
+        db: DatabaseLoader | AsyncDatabaseLoader,
+        table_name: str,
+        cache: QueryCache | None = None,
+        df: pd.DataFrame | None = None,
+        engine: str = AnalyticsEngineEnum.sql.value,
+    ):
+        """
+        :param db: database loader, async methods require AsyncDatabaseLoader
+        :param table_name: table name with crypto data
+        :param cache: cache of query results, queries always run on database if None
+        :param df: normalized crypto data analyzed in process by frame engine
+        :param engine: value of AnalyticsEngineEnum used when method gets no engine
+        """
 
-    def __init__(self, db: DatabaseLoader, table_name: str):
         self.db = db
         self._table_name = table_name
+        self.cache = cache
+        self.engine = engine
+        # frame engine runs the same analytics on DataFrame without database round trips
+        self.frame_analyzer = (
+            FrameAnalyzer(df=df, dialect=db.dialect) if df is not None else None
+        )
+
+    def get_history(self, pairs: list[tuple[str, str]] | None = None) -> pd.DataFrame:
+        """
+        Get the whole stored history of pairs from table, not only rows of the last load
+
+        :param pairs: (coin_name, currency) pairs, every pair if None
+        :return: DataFrame with coin_name, currency, date_key and analyzed columns
+        """
+
+        query, schema = self._make_history_query(pairs=pairs)
+        return self.db.fetch_dataframe(query=query, schema=schema)
+
+    async def get_history_async(
+        self, pairs: list[tuple[str, str]] | None = None
+    ) -> pd.DataFrame:
+        """
+        Async version of get_history, db has to be AsyncDatabaseLoader
+        """
+
+        query, schema = self._make_history_query(pairs=pairs)
+        return await self.db.fetch_dataframe_async(query=query, schema=schema)
+
+    def load_frame(self, pairs: list[tuple[str, str]] | None = None) -> pd.DataFrame:
+        """
+        Load the whole stored history of pairs from table into frame engine
+
+        :param pairs: (coin_name, currency) pairs, every pair if None
+        :return: loaded history, see get_history
+        """
+
+        df = self.get_history(pairs=pairs)
+        self.frame_analyzer = FrameAnalyzer(df=df, dialect=self.db.dialect)
+        return df
+
+    async def load_frame_async(
+        self, pairs: list[tuple[str, str]] | None = None
+    ) -> pd.DataFrame:
+        """
+        Async version of load_frame, db has to be AsyncDatabaseLoader
+        """
+
+        df = await self.get_history_async(pairs=pairs)
+        self.frame_analyzer = FrameAnalyzer(df=df, dialect=self.db.dialect)
+        return df
 
     def get_spikes(
         self,
         up_to_rank: int,
         column: ColumnsToAnalyzeEnum,
         order: OrderEnum,
-        coin_name: str,
-        currency: str,
         start_date_key: str,
         end_date_key: str,
-    ) -> pd.DataFrame:
+        pairs: list[tuple[str, str]] | None = None,
+        by_pair: bool = False,
+        engine: str | None = None,
+    ) -> pd.DataFrame | dict[tuple[str, str], pd.DataFrame]:
         """
         Get days where price or volume for each (coin, currency) was either the biggest or smallest
 
         :param up_to_rank: amount of days
         :param column: which column to rank
         :param order: in which column order to get data
-        :param coin_name: coin name to retrieve data for
-        :param currency: currency in which retrieve data in
         :param start_date_key: YYYYMMDD format string for defining starting date for getting spikes
         :param end_date_key: YYYYMMDD format string for defining ending date for getting spikes
+        :param pairs: (coin_name, currency) pairs to analyze, every pair of table if None
+        :param by_pair: return dictionary of DataFrames with (coin_name, currency) as key
+        :param engine: value of AnalyticsEngineEnum, analyzer default if None
         """
 
-        SQL_WHERE_CLAUSE = f"WHERE coin_name = '{coin_name}' AND currency = '{currency}' AND date_key BETWEEN {start_date_key} AND {end_date_key}"
+        return self._analyze(
+            name="spikes",
+            params={
+                "up_to_rank": up_to_rank,
+                "column": column,
+                "order": order,
+                "pairs": pairs,
+                "start_date_key": start_date_key,
+                "end_date_key": end_date_key,
+            },
+            by_pair=by_pair,
+            engine=engine,
+        )
+
+    def _make_spikes_query(
+        self,
+        up_to_rank: int,
+        column: ColumnsToAnalyzeEnum,
+        order: OrderEnum,
+        pairs: list[tuple[str, str]] | None,
+        start_date_key: str,
+        end_date_key: str,
+    ) -> tuple[str, dict[str, str]]:
+        SQL_WHERE_CLAUSE = self._make_where_clause(
+            pairs=pairs,
+            condition=f"date_key BETWEEN {start_date_key} AND {end_date_key}",
+        )
 
         SQL_QUERY = f"""
             WITH ranked_data AS (
@@ -48,62 +146,264 @@ class CryptoAnalyzer:
             SELECT * FROM ranked_data WHERE {column}_rank <= {up_to_rank};
         """
 
-        data = self.db.execute_query(query=SQL_QUERY)
-        return pd.DataFrame(data)
+        SQL_SCHEMA = {
+            "coin_name": "str",
+            "date_key": "int64",
+            "currency": "str",
+            column: "float64",
+            f"{column}_rank": "int64",
+        }
+
+        return SQL_QUERY, SQL_SCHEMA
 
     def get_moving_average(
         self,
         column: ColumnsToAnalyzeEnum,
         preceding_days: int,
         following_days: int,
-        coin_name: str,
-        currency: str,
-    ) -> pd.DataFrame:
+        start_date_key: str | None = None,
+        end_date_key: str | None = None,
+        pairs: list[tuple[str, str]] | None = None,
+        by_pair: bool = False,
+        engine: str | None = None,
+    ) -> pd.DataFrame | dict[tuple[str, str], pd.DataFrame]:
         """
         Get moving average for price or volume for each (coin, currency)
 
-        :param coin_name: coin name to retrieve data for
-        :param currency: currency in which retrieve data in
         :param column: column to extract from db
         :preceding_days: previous days to take into acount when calculating moving average
         :following_days: future days to take into acount when calculating moving average
+        :param start_date_key: YYYYMMDD first day of returned rows, earlier rows still fill windows, no limit if None
+        :param end_date_key: YYYYMMDD last day of returned rows, later rows still fill windows, no limit if None
+        :param pairs: (coin_name, currency) pairs to analyze, every pair of table if None
+        :param by_pair: return dictionary of DataFrames with (coin_name, currency) as key
+        :param engine: value of AnalyticsEngineEnum, analyzer default if None
         """
 
-        SQL_WHERE_CLAUSE = (
-            f"WHERE coin_name = '{coin_name}' AND currency = '{currency}'"
+        return self._analyze(
+            name="moving_average",
+            params={
+                "column": column,
+                "preceding_days": preceding_days,
+                "following_days": following_days,
+                "start_date_key": start_date_key,
+                "end_date_key": end_date_key,
+                "pairs": pairs,
+            },
+            by_pair=by_pair,
+            engine=engine,
         )
 
-        SQL_QUERY = f"""
+    def _make_moving_average_query(
+        self,
+        column: ColumnsToAnalyzeEnum,
+        preceding_days: int,
+        following_days: int,
+        pairs: list[tuple[str, str]] | None,
+        start_date_key: str | None = None,
+        end_date_key: str | None = None,
+    ) -> tuple[str, dict[str, str]]:
+        SQL_WHERE_CLAUSE = self._make_where_clause(pairs=pairs)
+
+        SQL_QUERY = self._make_date_range_query(
+            query=f"""
             SELECT coin_name, currency, date_key, {column}, AVG({column}) OVER (
                 PARTITION BY coin_name, currency
                 ORDER BY date_key
                 ROWS BETWEEN {preceding_days} PRECEDING AND {following_days} FOLLOWING
-            ) AS moving_avg_{column} 
+            ) AS moving_avg_{column}
             FROM {self._table_name}
-            {SQL_WHERE_CLAUSE};
+            {SQL_WHERE_CLAUSE}""",
+            start_date_key=start_date_key,
+            end_date_key=end_date_key,
+        )
+
+        SQL_SCHEMA = {
+            "coin_name": "str",
+            "currency": "str",
+            "date_key": "int64",
+            column: "float64",
+            f"moving_avg_{column}": "float64",
+        }
+
+        return SQL_QUERY, SQL_SCHEMA
+
+    def _make_moving_average_rollup_query(
+        self,
+        column: ColumnsToAnalyzeEnum,
+        preceding_days: int,
+        following_days: int,
+        pairs: list[tuple[str, str]] | None,
+        start_date_key: str | None = None,
+        end_date_key: str | None = None,
+    ) -> tuple[str, dict[str, str]]:
+        return self._make_prefix_averages_query(
+            column=column,
+            windows={f"moving_avg_{column}": (preceding_days, following_days)},
+            pairs=pairs,
+            start_date_key=start_date_key,
+            end_date_key=end_date_key,
+        )
+
+    def get_moving_averages(
+        self,
+        column: ColumnsToAnalyzeEnum,
+        windows: list[tuple[int, int]],
+        start_date_key: str | None = None,
+        end_date_key: str | None = None,
+        pairs: list[tuple[str, str]] | None = None,
+        by_pair: bool = False,
+        engine: str | None = None,
+    ) -> pd.DataFrame | dict[tuple[str, str], pd.DataFrame]:
         """
+        Get moving averages over several windows for (coin, currency) pairs in one scan
 
-        data = self.db.execute_query(query=SQL_QUERY)
-        return pd.DataFrame(data)
+        :param column: column to extract from db
+        :param windows: (preceding_days, following_days) of every moving average
+        :param start_date_key: YYYYMMDD first day of returned rows, earlier rows still fill windows, no limit if None
+        :param end_date_key: YYYYMMDD last day of returned rows, later rows still fill windows, no limit if None
+        :param pairs: (coin_name, currency) pairs to analyze, every pair of table if None
+        :param by_pair: return dictionary of DataFrames with (coin_name, currency) as key
+        :param engine: value of AnalyticsEngineEnum, analyzer default if None
+        :return: wide DataFrame with moving_avg_{column}_{preceding}_{following} column of every window
+        """
+
+        return self._analyze(
+            name="moving_averages",
+            params={
+                "column": column,
+                "windows": windows,
+                "start_date_key": start_date_key,
+                "end_date_key": end_date_key,
+                "pairs": pairs,
+            },
+            by_pair=by_pair,
+            engine=engine,
+        )
+
+    def _make_moving_averages_query(
+        self,
+        column: ColumnsToAnalyzeEnum,
+        windows: list[tuple[int, int]],
+        pairs: list[tuple[str, str]] | None,
+        start_date_key: str | None = None,
+        end_date_key: str | None = None,
+    ) -> tuple[str, dict[str, str]]:
+        windows = self.get_unique_windows(windows)
+        SQL_WHERE_CLAUSE = self._make_where_clause(pairs=pairs)
+
+        # every window is computed over the same sorted partition in one scan
+        SQL_AVERAGES = ",\n".join(
+            f"""AVG({column}) OVER (
+                PARTITION BY coin_name, currency
+                ORDER BY date_key
+                ROWS BETWEEN {preceding_days} PRECEDING AND {following_days} FOLLOWING
+            ) AS moving_avg_{column}_{preceding_days}_{following_days}"""
+            for preceding_days, following_days in windows
+        )
+
+        SQL_QUERY = self._make_date_range_query(
+            query=f"""
+            SELECT coin_name, currency, date_key, {column},
+            {SQL_AVERAGES}
+            FROM {self._table_name}
+            {SQL_WHERE_CLAUSE}""",
+            start_date_key=start_date_key,
+            end_date_key=end_date_key,
+        )
+
+        SQL_SCHEMA = {
+            "coin_name": "str",
+            "currency": "str",
+            "date_key": "int64",
+            column: "float64",
+            **{
+                f"moving_avg_{column}_{preceding_days}_{following_days}": "float64"
+                for preceding_days, following_days in windows
+            },
+        }
+
+        return SQL_QUERY, SQL_SCHEMA
+
+    def _make_moving_averages_rollup_query(
+        self,
+        column: ColumnsToAnalyzeEnum,
+        windows: list[tuple[int, int]],
+        pairs: list[tuple[str, str]] | None,
+        start_date_key: str | None = None,
+        end_date_key: str | None = None,
+    ) -> tuple[str, dict[str, str]]:
+        return self._make_prefix_averages_query(
+            column=column,
+            windows={
+                f"moving_avg_{column}_{preceding_days}_{following_days}": (
+                    preceding_days,
+                    following_days,
+                )
+                for preceding_days, following_days in self.get_unique_windows(windows)
+            },
+            pairs=pairs,
+            start_date_key=start_date_key,
+            end_date_key=end_date_key,
+        )
 
     def get_volatility(
         self,
         column: ColumnsToAnalyzeEnum,
         lag_to_row: int,
-        coin_name: str,
-        currency: str,
-    ) -> pd.DataFrame:
+        start_date_key: str | None = None,
+        end_date_key: str | None = None,
+        pairs: list[tuple[str, str]] | None = None,
+        by_pair: bool = False,
+        engine: str | None = None,
+    ) -> pd.DataFrame | dict[tuple[str, str], pd.DataFrame]:
         """
-        Get volatility by days for (coin, currency) pair
+        Get volatility by days for (coin, currency) pairs
 
         :param column: columns to analyze
         :param lag_to_row: how many days to LAG back
-        :param coin_name: coin name to retrieve data for
-        :param currency: currency in which retrieve data in
+        :param start_date_key: YYYYMMDD first day of returned rows, earlier rows still fill windows, no limit if None
+        :param end_date_key: YYYYMMDD last day of returned rows, later rows still fill windows, no limit if None
+        :param pairs: (coin_name, currency) pairs to analyze, every pair of table if None
+        :param by_pair: return dictionary of DataFrames with (coin_name, currency) as key
+        :param engine: value of AnalyticsEngineEnum, analyzer default if None
         """
 
-        SQL_WHERE_CLAUSE = (
-            f"WHERE coin_name = '{coin_name}' AND currency = '{currency}'"
+        return self._analyze(
+            name="volatility",
+            params={
+                "column": column,
+                "lag_to_row": lag_to_row,
+                "start_date_key": start_date_key,
+                "end_date_key": end_date_key,
+                "pairs": pairs,
+            },
+            by_pair=by_pair,
+            engine=engine,
+        )
+
+    def _make_volatility_query(
+        self,
+        column: ColumnsToAnalyzeEnum,
+        lag_to_row: int,
+        pairs: list[tuple[str, str]] | None,
+        start_date_key: str | None = None,
+        end_date_key: str | None = None,
+    ) -> tuple[str, dict[str, str]]:
+        SQL_WHERE_CLAUSE = self._make_where_clause(pairs=pairs)
+        # rows are filtered after LAG, so rows before range are still lagged rows
+        SQL_RESULT_WHERE_CLAUSE = self._make_where_clause(
+            pairs=None,
+            condition=" AND ".join(
+                condition
+                for condition in (
+                    "previous IS NOT NULL",
+                    self._make_date_range_condition(
+                        start_date_key=start_date_key, end_date_key=end_date_key
+                    ),
+                )
+                if condition
+            ),
         )
 
         SQL_QUERY = f"""
@@ -120,31 +420,223 @@ class CryptoAnalyzer:
                 {SQL_WHERE_CLAUSE}
             )
             SELECT 
-                ROUND(({column} - previous)/previous*100, 2) AS {column}_growth,
+                ROUND(({column} - previous)/NULLIF(previous, 0)*100, 2) AS {column}_growth,
                 coin_name,
                 date_key,
                 currency
             FROM LaggedData
-            WHERE previous IS NOT NULL;
+            {SQL_RESULT_WHERE_CLAUSE};
         """
 
-        data = self.db.execute_query(query=SQL_QUERY)
-        return pd.DataFrame(data)
+        SQL_SCHEMA = {
+            f"{column}_growth": "float64",
+            "coin_name": "str",
+            "date_key": "int64",
+            "currency": "str",
+        }
+
+        return SQL_QUERY, SQL_SCHEMA
 
-    def get_monthly_analysis(self, coin_name: str, currency: str) -> pd.DataFrame:
+    def _make_volatility_rollup_query(
+        self,
+        column: ColumnsToAnalyzeEnum,
+        lag_to_row: int,
+        pairs: list[tuple[str, str]] | None,
+        start_date_key: str | None = None,
+        end_date_key: str | None = None,
+    ) -> tuple[str, dict[str, str]]:
+        SQL_QUERY = f"""
+            {self._make_prefix_cte(
+                column=column,
+                pairs=pairs,
+                start_date_key=start_date_key,
+                end_date_key=end_date_key,
+            )}
+            SELECT
+                {self._make_prefix_growth(column=column, alias="previous")} AS {column}_growth,
+                cur.coin_name,
+                cur.date_key,
+                cur.currency
+            FROM CurrentRows AS cur
+            {self._make_prefix_join(alias="previous", row=f"cur.row_index - {lag_to_row}")};
         """
-        Get monthly analysis of price, volume and capitalization for (coin, currency) pair
 
-        :param coin_name: coin name to retrieve data for
-        :type coin_name: str
-        :param currency: currency in which retrieve data in
-        :type currency: str
+        SQL_SCHEMA = {
+            f"{column}_growth": "float64",
+            "coin_name": "str",
+            "date_key": "int64",
+            "currency": "str",
+        }
+
+        return SQL_QUERY, SQL_SCHEMA
+
+    def get_growth(
+        self,
+        column: ColumnsToAnalyzeEnum,
+        lags: list[int],
+        start_date_key: str | None = None,
+        end_date_key: str | None = None,
+        pairs: list[tuple[str, str]] | None = None,
+        by_pair: bool = False,
+        engine: str | None = None,
+    ) -> pd.DataFrame | dict[tuple[str, str], pd.DataFrame]:
         """
+        Get growth over several lags for (coin, currency) pairs in one scan
 
-        SQL_WHERE_CLAUSE = (
-            f"WHERE coin_name = '{coin_name}' AND currency = '{currency}'"
+        :param column: columns to analyze
+        :param lags: how many days to LAG back for every growth
+        :param start_date_key: YYYYMMDD first day of returned rows, earlier rows still fill windows, no limit if None
+        :param end_date_key: YYYYMMDD last day of returned rows, later rows still fill windows, no limit if None
+        :param pairs: (coin_name, currency) pairs to analyze, every pair of table if None
+        :param by_pair: return dictionary of DataFrames with (coin_name, currency) as key
+        :param engine: value of AnalyticsEngineEnum, analyzer default if None
+        :return: wide DataFrame with {column}_growth_{lag} column of every lag, NaN where row has no lagged row
+        """
+
+        return self._analyze(
+            name="growth",
+            params={
+                "column": column,
+                "lags": lags,
+                "start_date_key": start_date_key,
+                "end_date_key": end_date_key,
+                "pairs": pairs,
+            },
+            by_pair=by_pair,
+            engine=engine,
+        )
+
+    def _make_growth_query(
+        self,
+        column: ColumnsToAnalyzeEnum,
+        lags: list[int],
+        pairs: list[tuple[str, str]] | None,
+        start_date_key: str | None = None,
+        end_date_key: str | None = None,
+    ) -> tuple[str, dict[str, str]]:
+        lags = self.get_unique_lags(lags)
+        SQL_WHERE_CLAUSE = self._make_where_clause(pairs=pairs)
+        # rows are filtered after LAG, so rows before range are still lagged rows
+        SQL_RESULT_WHERE_CLAUSE = self._make_where_clause(
+            pairs=None,
+            condition=self._make_date_range_condition(
+                start_date_key=start_date_key, end_date_key=end_date_key
+            ),
+        )
+
+        # every lag is taken from the same sorted partition in one scan
+        SQL_LAGS = ",\n".join(f"""LAG({column}, {lag}) OVER (
+                    PARTITION BY coin_name, currency
+                    ORDER BY date_key
+                ) AS previous_{lag}""" for lag in lags)
+        SQL_GROWTH = ",\n".join(
+            f"ROUND(({column} - previous_{lag})/NULLIF(previous_{lag}, 0)*100, 2) "
+            f"AS {column}_growth_{lag}"
+            for lag in lags
         )
 
+        SQL_QUERY = f"""
+            WITH LaggedData AS (
+                SELECT {SQL_LAGS},
+                coin_name,
+                currency,
+                date_key,
+                {column}
+                FROM {self._table_name}
+                {SQL_WHERE_CLAUSE}
+            )
+            SELECT
+                coin_name,
+                currency,
+                date_key,
+                {SQL_GROWTH}
+            FROM LaggedData
+            {SQL_RESULT_WHERE_CLAUSE};
+        """
+
+        SQL_SCHEMA = {
+            "coin_name": "str",
+            "currency": "str",
+            "date_key": "int64",
+            **{f"{column}_growth_{lag}": "float64" for lag in lags},
+        }
+
+        return SQL_QUERY, SQL_SCHEMA
+
+    def _make_growth_rollup_query(
+        self,
+        column: ColumnsToAnalyzeEnum,
+        lags: list[int],
+        pairs: list[tuple[str, str]] | None,
+        start_date_key: str | None = None,
+        end_date_key: str | None = None,
+    ) -> tuple[str, dict[str, str]]:
+        lags = self.get_unique_lags(lags)
+
+        # rows without lagged row are kept with NULL growth
+        SQL_JOINS = "\n".join(
+            self._make_prefix_join(
+                alias=f"previous_{lag}", row=f"cur.row_index - {lag}", is_optional=True
+            )
+            for lag in lags
+        )
+        SQL_GROWTH = ",\n".join(
+            f"{self._make_prefix_growth(column=column, alias=f'previous_{lag}')} "
+            f"AS {column}_growth_{lag}"
+            for lag in lags
+        )
+
+        SQL_QUERY = f"""
+            {self._make_prefix_cte(
+                column=column,
+                pairs=pairs,
+                start_date_key=start_date_key,
+                end_date_key=end_date_key,
+            )}
+            SELECT
+                cur.coin_name,
+                cur.currency,
+                cur.date_key,
+                {SQL_GROWTH}
+            FROM CurrentRows AS cur
+            {SQL_JOINS};
+        """
+
+        SQL_SCHEMA = {
+            "coin_name": "str",
+            "currency": "str",
+            "date_key": "int64",
+            **{f"{column}_growth_{lag}": "float64" for lag in lags},
+        }
+
+        return SQL_QUERY, SQL_SCHEMA
+
+    def get_monthly_analysis(
+        self,
+        pairs: list[tuple[str, str]] | None = None,
+        by_pair: bool = False,
+        engine: str | None = None,
+    ) -> pd.DataFrame | dict[tuple[str, str], pd.DataFrame]:
+        """
+        Get monthly analysis of price, volume and capitalization for (coin, currency) pairs
+
+        :param pairs: (coin_name, currency) pairs to analyze, every pair of table if None
+        :param by_pair: return dictionary of DataFrames with (coin_name, currency) as key
+        :param engine: value of AnalyticsEngineEnum, analyzer default if None
+        """
+
+        return self._analyze(
+            name="monthly_analysis",
+            params={"pairs": pairs},
+            by_pair=by_pair,
+            engine=engine,
+        )
+
+    def _make_monthly_analysis_query(
+        self, pairs: list[tuple[str, str]] | None
+    ) -> tuple[str, dict[str, str]]:
+        SQL_WHERE_CLAUSE = self._make_where_clause(pairs=pairs)
+
         SQL_QUERY = f"""
             WITH DataByMonth AS (
                 SELECT
@@ -154,7 +646,7 @@ class CryptoAnalyzer:
                     {ColumnsToAnalyzeEnum.capitalization.value},
                     {ColumnsToAnalyzeEnum.volume.value},
 
-                    DATE_FORMAT(STR_TO_DATE(date_key, '%Y%m%d'), '%Y-%m') AS year_month_key
+                    {self.db.dialect.year_month("date_key")} AS year_month_key
                 FROM {self._table_name}
                 {SQL_WHERE_CLAUSE}
             )
@@ -168,5 +660,506 @@ class CryptoAnalyzer:
             FROM DataByMonth
             GROUP BY year_month_key, coin_name, currency;
         """
-        data = self.db.execute_query(query=SQL_QUERY)
-        return pd.DataFrame(data)
+        SQL_SCHEMA = {
+            "avg_price": "float64",
+            "avg_volume": "float64",
+            "avg_capitalization": "float64",
+            "year_month_key": "str",
+            "coin_name": "str",
+            "currency": "str",
+        }
+
+        return SQL_QUERY, SQL_SCHEMA
+
+    def _make_monthly_analysis_rollup_query(
+        self, pairs: list[tuple[str, str]] | None
+    ) -> tuple[str, dict[str, str]]:
+        SQL_WHERE_CLAUSE = self._make_where_clause(pairs=pairs)
+
+        SQL_QUERY = f"""
+            SELECT
+                {ColumnsToAnalyzeEnum.price.value}_sum / row_count AS avg_price,
+                {ColumnsToAnalyzeEnum.volume.value}_sum / row_count AS avg_volume,
+                {ColumnsToAnalyzeEnum.capitalization.value}_sum / row_count AS avg_capitalization,
+                year_month_key,
+                coin_name,
+                currency
+            FROM {Rollups.get_monthly_table(self._table_name)}
+            {SQL_WHERE_CLAUSE};
+        """
+        SQL_SCHEMA = {
+            "avg_price": "float64",
+            "avg_volume": "float64",
+            "avg_capitalization": "float64",
+            "year_month_key": "str",
+            "coin_name": "str",
+            "currency": "str",
+        }
+
+        return SQL_QUERY, SQL_SCHEMA
+
+    async def analyze_async(
+        self,
+        name: str,
+        pairs: list[tuple[str, str]] | None = None,
+        by_pair: bool = False,
+        engine: str | None = None,
+        **params,
+    ) -> pd.DataFrame | dict[tuple[str, str], pd.DataFrame]:
+        """
+        Async version of every analytic method, db has to be AsyncDatabaseLoader
+
+        :param name: analytic name, e.g. "spikes" runs get_spikes
+        :param pairs: (coin_name, currency) pairs to analyze, every pair of table if None
+        :param by_pair: return dictionary of DataFrames with (coin_name, currency) as key
+        :param engine: value of AnalyticsEngineEnum, analyzer default if None
+        :param params: other parameters of analytic method
+        """
+
+        if not hasattr(self, f"_make_{name}_query"):
+            raise ValueError(f"Unknown analytic: {name}")
+
+        df = await self._query_async(
+            name=name, params={**params, "pairs": pairs}, engine=engine
+        )
+        return self.split_by_pair(df=df, pairs=pairs) if by_pair else df
+
+    def _analyze(
+        self, name: str, params: dict[str, any], by_pair: bool, engine: str | None
+    ) -> pd.DataFrame | dict[tuple[str, str], pd.DataFrame]:
+        df = self._query(name=name, params=params, engine=engine)
+        return self.split_by_pair(df=df, pairs=params["pairs"]) if by_pair else df
+
+    def _query(
+        self, name: str, params: dict[str, any], engine: str | None
+    ) -> pd.DataFrame:
+        """
+        Run analytic on database or on DataFrame
+
+        :param name: analytic name, e.g. "spikes"
+        :param params: parameters of analytic query
+        :param engine: value of AnalyticsEngineEnum, analyzer default if None
+        :return: DataFrame with columns of query schema
+        """
+
+        engine = self._get_engine(engine=engine)
+        query, schema = self._make_query(name=name, params=params, engine=engine)
+        if engine == AnalyticsEngineEnum.frame.value:
+            return self._query_frame(name=name, params=params, schema=schema)
+
+        if self._is_rollup_query(name=name, engine=engine):
+            self.db.prepare_rollups(table_name=self._table_name)
+        return self._fetch(query=query, schema=schema, pairs=params["pairs"])
+
+    async def _query_async(
+        self, name: str, params: dict[str, any], engine: str | None
+    ) -> pd.DataFrame:
+        """
+        Async version of _query, db has to be AsyncDatabaseLoader
+        """
+
+        engine = self._get_engine(engine=engine)
+        query, schema = self._make_query(name=name, params=params, engine=engine)
+        if engine == AnalyticsEngineEnum.frame.value:
+            return self._query_frame(name=name, params=params, schema=schema)
+
+        if self._is_rollup_query(name=name, engine=engine):
+            await self.db.prepare_rollups_async(table_name=self._table_name)
+        return await self._fetch_async(
+            query=query, schema=schema, pairs=params["pairs"]
+        )
+
+    def _query_frame(
+        self, name: str, params: dict[str, any], schema: dict[str, str]
+    ) -> pd.DataFrame:
+        df = getattr(self.frame_analyzer, f"get_{name}")(**params)
+        return df[list(schema)].astype(schema)
+
+    def _make_query(
+        self, name: str, params: dict[str, any], engine: str
+    ) -> tuple[str, dict[str, str]]:
+        # analytics without rollup query run on data table with rollup engine too
+        if self._is_rollup_query(name=name, engine=engine):
+            return getattr(self, f"_make_{name}_rollup_query")(**params)
+
+        return getattr(self, f"_make_{name}_query")(**params)
+
+    def _is_rollup_query(self, name: str, engine: str) -> bool:
+        return engine == AnalyticsEngineEnum.rollup.value and hasattr(
+            self, f"_make_{name}_rollup_query"
+        )
+
+    def _get_engine(self, engine: str | None) -> str:
+        engine = engine or self.engine
+        if engine not in (e.value for e in AnalyticsEngineEnum):
+            raise ValueError(f"Unknown analytics engine: {engine}")
+
+        if engine == AnalyticsEngineEnum.frame.value and self.frame_analyzer is None:
+            raise ValueError("Frame analytics engine requires DataFrame")
+
+        return engine
+
+    def _fetch(
+        self,
+        query: str,
+        schema: dict[str, str],
+        pairs: list[tuple[str, str]] | None,
+    ) -> pd.DataFrame:
+        """
+        Get query result from cache or database
+
+        :param query: query to execute
+        :param schema: dtype of result columns
+        :param pairs: queried pairs, every pair of table if None
+        :return: DataFrame
+        """
+
+        if self.cache is None:
+            return self.db.fetch_dataframe(query=query, schema=schema)
+
+        version = self._get_version_token(
+            versions=self.db.get_data_versions(table_name=self._table_name),
+            pairs=pairs,
+        )
+        if version is None:
+            return self.db.fetch_dataframe(query=query, schema=schema)
+
+        df = self.cache.get(query=query, version=version)
+        if df is None:
+            df = self.db.fetch_dataframe(query=query, schema=schema)
+            self._set_cache(query=query, version=version, df=df)
+
+        return df
+
+    async def _fetch_async(
+        self,
+        query: str,
+        schema: dict[str, str],
+        pairs: list[tuple[str, str]] | None,
+    ) -> pd.DataFrame:
+        """
+        Async version of _fetch, db has to be AsyncDatabaseLoader
+        """
+
+        if self.cache is None:
+            return await self.db.fetch_dataframe_async(query=query, schema=schema)
+
+        version = self._get_version_token(
+            versions=await self.db.get_data_versions_async(table_name=self._table_name),
+            pairs=pairs,
+        )
+        if version is None:
+            return await self.db.fetch_dataframe_async(query=query, schema=schema)
+
+        df = self.cache.get(query=query, version=version)
+        if df is None:
+            df = await self.db.fetch_dataframe_async(query=query, schema=schema)
+            self._set_cache(query=query, version=version, df=df)
+
+        return df
+
+    def _set_cache(self, query: str, version: list, df: pd.DataFrame):
+        # failed queries are returned as empty frames too, they are never cached
+        if not df.empty:
+            self.cache.set(query=query, version=version, df=df)
+
+    @staticmethod
+    def _get_version_token(
+        versions: dict[tuple[str, str], int], pairs: list[tuple[str, str]] | None
+    ) -> list | None:
+        """
+        Get data version token of queried pairs
+
+        :param versions: version token of every loaded pair of table
+        :param pairs: queried pairs, every pair of table if None
+        :return: JSON serializable token changing whenever any queried pair is reloaded,
+            None if some pair has no token and result must not be cached
+        """
+
+        # pairs without rows have no token, the same empty token fits every database
+        if pairs is None:
+            if not versions:
+                return None
+            return sorted([*pair, version] for pair, version in versions.items())
+
+        if any(pair not in versions for pair in pairs):
+            return None
+
+        return [versions[pair] for pair in pairs]
+
+    @staticmethod
+    def get_unique_windows(windows: list[tuple[int, int]]) -> list[tuple[int, int]]:
+        """
+        Get windows without repeats keeping their order, every window is one result column
+
+        :param windows: (preceding_days, following_days) of every moving average
+        :return: list of unique windows
+        """
+
+        windows = list(dict.fromkeys(tuple(window) for window in windows))
+        if not windows:
+            raise ValueError("At least one window is required")
+
+        return windows
+
+    @staticmethod
+    def get_unique_lags(lags: list[int]) -> list[int]:
+        """
+        Get lags without repeats keeping their order, every lag is one result column
+
+        :param lags: how many days to LAG back for every growth
+        :return: list of unique lags
+        """
+
+        lags = list(dict.fromkeys(lags))
+        if not lags:
+            raise ValueError("At least one lag is required")
+
+        return lags
+
+    @staticmethod
+    def split_by_pair(
+        df: pd.DataFrame, pairs: list[tuple[str, str]] | None = None
+    ) -> dict[tuple[str, str], pd.DataFrame]:
+        """
+        Split result of batch query into DataFrame of every (coin_name, currency) pair
+
+        :param df: result of batch query
+        :param pairs: pairs to return, pairs without rows get empty DataFrame, every pair of df if None
+        :return: dictionary with (coin_name, currency) as key and DataFrame as value
+        """
+
+        groups = {
+            pair: group.reset_index(drop=True)
+            for pair, group in df.groupby(["coin_name", "currency"], sort=False)
+        }
+        if pairs is None:
+            return groups
+
+        return {pair: groups.get(pair, df.iloc[0:0]) for pair in pairs}
+
+    def _make_history_query(
+        self, pairs: list[tuple[str, str]] | None
+    ) -> tuple[str, dict[str, str]]:
+        """
+        Get query of every stored row of pairs analyzed by frame engine
+        """
+
+        columns = [c.value for c in ColumnsToAnalyzeEnum]
+        SQL_QUERY = f"""
+            SELECT coin_name, currency, date_key, {", ".join(columns)}
+            FROM {self._table_name}
+            {self._make_where_clause(pairs=pairs)};
+        """
+        schema = {
+            "coin_name": "str",
+            "currency": "str",
+            "date_key": "int64",
+            **{column: "float64" for column in columns},
+        }
+
+        return SQL_QUERY, schema
+
+    def _make_where_clause(
+        self, pairs: list[tuple[str, str]] | None, condition: str | None = None
+    ) -> str:
+        """
+        Get WHERE clause filtering (coin_name, currency) pairs
+
+        :param pairs: pairs to filter, no filter if None
+        :param condition: additional condition joined with AND
+        :return: WHERE clause or empty string
+        """
+
+        conditions = []
+        if pairs is not None:
+            conditions.append(self._make_pairs_condition(pairs=pairs))
+        if condition:
+            conditions.append(condition)
+
+        if not conditions:
+            return ""
+
+        return "WHERE " + " AND ".join(conditions)
+
+    def _make_pairs_condition(self, pairs: list[tuple[str, str]]) -> str:
+        # nothing matches empty list of pairs
+        if not pairs:
+            return "1 = 0"
+
+        conditions = [
+            f"coin_name = '{coin_name}' AND currency = '{currency}'"
+            for coin_name, currency in pairs
+        ]
+        if len(conditions) == 1:
+            return conditions[0]
+
+        return "(" + " OR ".join(f"({c})" for c in conditions) + ")"
+
+    def _make_date_range_query(
+        self, query: str, start_date_key: str | None, end_date_key: str | None
+    ) -> str:
+        """
+        Get query keeping rows of window query inside date range, windows are computed before rows are filtered
+        """
+
+        condition = self._make_date_range_condition(
+            start_date_key=start_date_key, end_date_key=end_date_key
+        )
+        if not condition:
+            return f"{query};"
+
+        return f"SELECT * FROM ({query}) AS Windowed WHERE {condition};"
+
+    @staticmethod
+    def _make_date_range_condition(
+        start_date_key: str | None, end_date_key: str | None
+    ) -> str:
+        """
+        Get condition keeping rows inside date range, empty string if range has no limits
+        """
+
+        conditions = []
+        if start_date_key is not None:
+            conditions.append(f"date_key >= {start_date_key}")
+        if end_date_key is not None:
+            conditions.append(f"date_key <= {end_date_key}")
+
+        return " AND ".join(conditions)
+
+    def _make_prefix_averages_query(
+        self,
+        column: ColumnsToAnalyzeEnum,
+        windows: dict[str, tuple[int, int]],
+        pairs: list[tuple[str, str]] | None,
+        start_date_key: str | None = None,
+        end_date_key: str | None = None,
+    ) -> tuple[str, dict[str, str]]:
+        """
+        Get ROWS-window averages as differences of cumulative sums of prefix rollup
+
+        :param column: column to average
+        :param windows: (preceding_days, following_days) of every result column
+        :param pairs: (coin_name, currency) pairs, every pair if None
+        :param start_date_key: YYYYMMDD first day of returned rows, no limit if None
+        :param end_date_key: YYYYMMDD last day of returned rows, no limit if None
+        :return: query and its schema
+        """
+
+        joins = []
+        averages = []
+        for i, (name, (preceding_days, following_days)) in enumerate(windows.items()):
+            # frame without following rows ends at the current row itself
+            last = "cur"
+            if following_days:
+                # frame is cut at the last row of pair
+                last = f"last_{i}"
+                joins.append(
+                    self._make_prefix_join(
+                        alias=last,
+                        row=self.db.dialect.least(
+                            f"cur.row_index + {following_days}", "PairSizes.row_count"
+                        ),
+                    )
+                )
+            # the first row of pair has no row before it
+            joins.append(
+                self._make_prefix_join(
+                    alias=f"before_{i}",
+                    row=f"cur.row_index - {preceding_days + 1}",
+                    is_optional=True,
+                )
+            )
+            averages.append(
+                f"({last}.{column}_cum - COALESCE(before_{i}.{column}_cum, 0)) "
+                f"/ ({last}.row_index - COALESCE(before_{i}.row_index, 0)) AS {name}"
+            )
+
+        SQL_PAIR_SIZES_CTE = ""
+        SQL_PAIR_SIZES_JOIN = ""
+        if any(following_days for _, following_days in windows.values()):
+            # max of unique (pair, row_index) index is read without scanning rows of pair
+            SQL_PAIR_SIZES_CTE = f""",
+            PairSizes AS (
+                SELECT coin_name, currency, MAX(row_index) AS row_count
+                FROM {Rollups.get_prefix_table(self._table_name)}
+                {self._make_where_clause(pairs=pairs)}
+                GROUP BY coin_name, currency
+            )"""
+            SQL_PAIR_SIZES_JOIN = """JOIN PairSizes
+                ON PairSizes.coin_name = cur.coin_name
+                AND PairSizes.currency = cur.currency"""
+
+        SQL_AVERAGES = ",\n".join(averages)
+        SQL_JOINS = "\n".join(joins)
+
+        SQL_QUERY = f"""
+            {self._make_prefix_cte(
+                column=column,
+                pairs=pairs,
+                start_date_key=start_date_key,
+                end_date_key=end_date_key,
+            )}{SQL_PAIR_SIZES_CTE}
+            SELECT cur.coin_name, cur.currency, cur.date_key, cur.{column},
+            {SQL_AVERAGES}
+            FROM CurrentRows AS cur
+            {SQL_PAIR_SIZES_JOIN}
+            {SQL_JOINS};
+        """
+
+        SQL_SCHEMA = {
+            "coin_name": "str",
+            "currency": "str",
+            "date_key": "int64",
+            column: "float64",
+            **{name: "float64" for name in windows},
+        }
+
+        return SQL_QUERY, SQL_SCHEMA
+
+    def _make_prefix_cte(
+        self,
+        column: ColumnsToAnalyzeEnum,
+        pairs: list[tuple[str, str]] | None,
+        start_date_key: str | None,
+        end_date_key: str | None,
+    ) -> str:
+        """
+        Get WITH clause of CurrentRows table with prefix rollup rows of queried pairs and days,
+        rows of frames and lags around them are joined from prefix rollup by row index
+        """
+
+        SQL_WHERE_CLAUSE = self._make_where_clause(
+            pairs=pairs,
+            condition=self._make_date_range_condition(
+                start_date_key=start_date_key, end_date_key=end_date_key
+            ),
+        )
+
+        return f"""
+            WITH CurrentRows AS (
+                SELECT coin_name, currency, date_key, row_index, {column}, {column}_cum
+                FROM {Rollups.get_prefix_table(self._table_name)}
+                {SQL_WHERE_CLAUSE}
+            )"""
+
+    def _make_prefix_join(self, alias: str, row: str, is_optional: bool = False) -> str:
+        """
+        Get join of prefix rollup row of the same pair as current row cur by row index
+        """
+
+        return (
+            f"{'LEFT JOIN' if is_optional else 'JOIN'} "
+            f"{Rollups.get_prefix_table(self._table_name)} AS {alias} "
+            f"ON {alias}.coin_name = cur.coin_name "
+            f"AND {alias}.currency = cur.currency "
+            f"AND {alias}.row_index = {row}"
+        )
+
+    @staticmethod
+    def _make_prefix_growth(column: ColumnsToAnalyzeEnum, alias: str) -> str:
+        # the same expression as growth of LAG queries
+        return (
+            f"ROUND((cur.{column} - {alias}.{column})"
+            f"/NULLIF({alias}.{column}, 0)*100, 2)"
+        )
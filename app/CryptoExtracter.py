@@ -1,5 +1,7 @@
+from datetime import datetime, timezone
+
 from app.BaseFetchClass import BaseFetchClass
-from app.consts import BASE_URL
+from app.consts import BASE_URL, FX_REFERENCE_COIN
 
 
 class CryptoExtracter(BaseFetchClass):
@@ -12,6 +14,7 @@ class CryptoExtracter(BaseFetchClass):
         starting_from_timestamp: int,
         up_to_timestamp: int,
         coins_data: list[tuple[str, str]],
+        watermarks: dict[tuple[str, str], int] | None = None,
     ) -> list[dict[str, any]]:
         """
         Fetch retrospective cryptocurrency data based on time and coin types.
@@ -20,6 +23,7 @@ class CryptoExtracter(BaseFetchClass):
         :param up_to_timestamp: up to what time get data
         :param coins: list of coins to fetch
         :param currency: desired currency to output
+        :param watermarks: latest loaded date_key of pairs to fetch incrementally
         :return: fetched data
         """
 
@@ -27,13 +31,17 @@ class CryptoExtracter(BaseFetchClass):
             starting_from=starting_from_timestamp,
             up_to=up_to_timestamp,
             coins_data=coins_data,
+            watermarks=watermarks,
         )
 
         return await self.gather_data(urls)
 
     @staticmethod
     def calculate_retrospective_url_params(
-        coins_data: list[tuple[str, str]], starting_from: int, up_to: int
+        coins_data: list[tuple[str, str]],
+        starting_from: int,
+        up_to: int,
+        watermarks: dict[tuple[str, str], int] | None = None,
     ) -> list[tuple[str, dict]]:
         """
         Calculate list with urls(baseurl, params)
@@ -42,14 +50,176 @@ class CryptoExtracter(BaseFetchClass):
         :param up_to_timestamp: up to what time get data
         :param coins: list of coins to fetch
         :param currency: desired currency to output
+        :param watermarks: latest loaded date_key of pairs. Range of such pair
+            begins at the start of its watermark day instead of starting_from
         :return: Description
         """
         urls = []
+        watermarks = watermarks or {}
 
         # generate urls for extracting data by cortesion product of coin name and currency
         for coin_name, currency in coins_data:
+            # start from pair's own watermark so only new days are fetched
+            watermark = watermarks.get((coin_name, currency))
+            pair_starting_from = (
+                CryptoExtracter.date_key_to_timestamp(watermark)
+                if watermark is not None
+                else starting_from
+            )
+
             url = f"{BASE_URL}/coins/{coin_name}/market_chart/range"
-            params = {"vs_currency": currency, "from": starting_from, "to": up_to}
+            params = {"vs_currency": currency, "from": pair_starting_from, "to": up_to}
             urls.append((url, params))
 
         return urls
+
+    async def get_fx_data(
+        self,
+        starting_from_timestamp: int,
+        up_to_timestamp: int,
+        currencies: list[str],
+        reference_coin: str = FX_REFERENCE_COIN,
+    ) -> dict[str, dict[str, any]]:
+        """
+        Fetch prices of one reference coin in every currency to build historical FX table.
+
+        :param starting_from_timestamp: starting from what time get data
+        :param up_to_timestamp: up to what time get data
+        :param currencies: currencies to get rates for, base currency included
+        :param reference_coin: coin which prices are used as FX bridge
+        :return: fetched data by currency
+        """
+
+        fx_data = await self.get_retrospective_data(
+            starting_from_timestamp=starting_from_timestamp,
+            up_to_timestamp=up_to_timestamp,
+            coins_data=[(reference_coin, currency) for currency in currencies],
+        )
+
+        return dict(zip(currencies, fx_data))
+
+    async def get_range_data(
+        self, ranges: list[tuple[str, str, int, int]]
+    ) -> list[dict[str, any]]:
+        """
+        Fetch cryptocurrency data for individual time range of every pair.
+
+        :param ranges: list of (coin_name, currency, from_timestamp, to_timestamp)
+        :return: fetched data in the same order as ranges
+        """
+
+        urls = CryptoExtracter.calculate_range_url_params(ranges=ranges)
+
+        return await self.gather_data(urls)
+
+    @staticmethod
+    def calculate_range_url_params(
+        ranges: list[tuple[str, str, int, int]],
+    ) -> list[tuple[str, dict]]:
+        """
+        Calculate list with urls(baseurl, params) for individual time ranges
+
+        :param ranges: list of (coin_name, currency, from_timestamp, to_timestamp)
+        :return: list of (url, params)
+        """
+
+        return [
+            (
+                f"{BASE_URL}/coins/{coin_name}/market_chart/range",
+                {"vs_currency": currency, "from": starting_from, "to": up_to},
+            )
+            for coin_name, currency, starting_from, up_to in ranges
+        ]
+
+    @staticmethod
+    def get_incremental_coins_data(
+        coins_data: list[tuple[str, str]],
+        watermarks: dict[tuple[str, str], int],
+        backfill: bool = True,
+    ) -> list[tuple[str, str]]:
+        """
+        Get pairs to fetch in incremental mode
+
+        :param coins_data: requested (coin_name, currency) pairs
+        :param watermarks: latest loaded date_key of pairs
+        :param backfill: whether to fetch full history for pairs without loaded rows
+        :return: pairs to fetch
+        """
+
+        if backfill:
+            return list(coins_data)
+
+        return [pair for pair in coins_data if pair in watermarks]
+
+    @staticmethod
+    def get_base_currency_coins_data(
+        coins_data: list[tuple[str, str]],
+        base_currency: str,
+        native_pairs: list[tuple[str, str]] | None = None,
+    ) -> list[tuple[str, str]]:
+        """
+        Get pairs to fetch when other currencies are derived from base currency
+
+        :param coins_data: requested (coin_name, currency) pairs
+        :param base_currency: currency every coin is fetched in
+        :param native_pairs: requested pairs which are fetched in their own currency
+        :return: one base currency pair per coin followed by native pairs
+        """
+
+        native_pairs = native_pairs or []
+        base_pairs = list(
+            dict.fromkeys((coin_name, base_currency) for coin_name, _ in coins_data)
+        )
+
+        return base_pairs + [
+            pair
+            for pair in coins_data
+            if pair in native_pairs and pair not in base_pairs
+        ]
+
+    @staticmethod
+    def get_base_currency_watermarks(
+        coins_data: list[tuple[str, str]],
+        watermarks: dict[tuple[str, str], int],
+        base_currency: str,
+        native_pairs: list[tuple[str, str]] | None = None,
+    ) -> dict[tuple[str, str], int]:
+        """
+        Get watermarks of pairs fetched when other currencies are derived from base currency
+
+        :param coins_data: requested (coin_name, currency) pairs
+        :param watermarks: latest loaded date_key of requested pairs
+        :param base_currency: currency every coin is fetched in
+        :param native_pairs: requested pairs which are fetched in their own currency
+        :return: watermarks of base currency pairs and native pairs
+        """
+
+        native_pairs = native_pairs or []
+        dependents: dict[tuple[str, str], list[tuple[str, str]]] = {}
+        for coin_name, currency in coins_data:
+            fetched_pair = (
+                (coin_name, currency)
+                if (coin_name, currency) in native_pairs
+                else (coin_name, base_currency)
+            )
+            dependents.setdefault(fetched_pair, []).append((coin_name, currency))
+
+        # fetched pair starts at the earliest watermark of pairs derived from it,
+        # one pair without loaded rows needs the whole range
+        return {
+            fetched_pair: min(watermarks[pair] for pair in pairs)
+            for fetched_pair, pairs in dependents.items()
+            if all(pair in watermarks for pair in pairs)
+        }
+
+    @staticmethod
+    def date_key_to_timestamp(date_key: int) -> int:
+        """
+        Convert YYYYMMDD date key into UNIX timestamp of the start of that day (UTC)
+
+        :param date_key: date key in YYYYMMDD format
+        :return: UNIX timestamp in seconds
+        """
+
+        date = datetime.strptime(str(date_key), "%Y%m%d").replace(tzinfo=timezone.utc)
+        return int(date.timestamp())
@@ -0,0 +1,182 @@
+import asyncio
+import time
+
+import pandas as pd
+
+from app.CryptoExtracter import CryptoExtracter
+from app.CryptoTransformer import CryptoTransformer
+from app.DatabaseLoader import DatabaseLoader
+
+
+class CryptoPipeline:
+    """
+    Streaming fetch-transform-load pipeline.
+
+    Every response is normalized as soon as it arrives and loaded in batches
+    while other pairs are still being fetched. Bounded queue between transform
+    and load stages provides backpressure so raw payloads don't pile up in memory.
+    Normalized batches are kept for the returned frame only if keep_frames is set.
+    """
+
+    def __init__(
+        self,
+        extracter: CryptoExtracter,
+        db_loader: DatabaseLoader,
+        table_name: str,
+        batch_size: int = 20,
+        max_buffered_batches: int = 2,
+        max_in_flight: int | None = None,
+        aggregate_daily: bool = False,
+        load_mode: str = "ignore",
+        keep_frames: bool = True,
+    ):
+        self.extracter = extracter
+        self.db_loader = db_loader
+        self._table_name = table_name
+        self.batch_size = batch_size
+        self.max_buffered_batches = max_buffered_batches
+        self.max_in_flight = max_in_flight or batch_size
+        self.aggregate_daily = aggregate_daily
+        self.load_mode = load_mode
+        self.keep_frames = keep_frames
+        self.loaded_rows = 0
+
+    async def run(
+        self, urls: list[tuple[str, dict]], coins_data: list[tuple[str, str]]
+    ) -> pd.DataFrame:
+        """
+        Fetch, normalize and load data of every url
+
+        :param urls: list of (url, params) aligned with coins_data
+        :param coins_data: (coin_name, currency) pair of every url
+        :return: normalized DataFrame of all loaded pairs, empty if keep_frames is not set
+        """
+
+        started = time.perf_counter()
+        self.loaded_rows = 0
+        queue: asyncio.Queue[pd.DataFrame | None] = asyncio.Queue(
+            maxsize=self.max_buffered_batches
+        )
+        loader_task = asyncio.create_task(self._load_batches(queue))
+
+        frames: list[pd.DataFrame] = []
+        batch_data: list[dict[str, any]] = []
+        batch_coins_data: list[tuple[str, str]] = []
+
+        try:
+            async for index, coin_data in self.extracter.stream_data(
+                urls, max_in_flight=self.max_in_flight
+            ):
+                # skip failed fetches
+                if not coin_data:
+                    print(f"No data for pair {'/'.join(coins_data[index])}")
+                    continue
+
+                batch_data.append(coin_data)
+                batch_coins_data.append(coins_data[index])
+
+                if len(batch_data) >= self.batch_size:
+                    await self._put_batch(
+                        queue, loader_task, frames, batch_data, batch_coins_data
+                    )
+                    batch_data, batch_coins_data = [], []
+
+            # flush last incomplete batch
+            if batch_data:
+                await self._put_batch(
+                    queue, loader_task, frames, batch_data, batch_coins_data
+                )
+        finally:
+            # tell loader there are no more batches
+            if not loader_task.done():
+                await self._put(queue, loader_task, None)
+            await loader_task
+
+        print(f"Pipeline finished in {time.perf_counter() - started:.2f}s")
+        return CryptoTransformer.concat_normalized(frames)
+
+    async def _put_batch(
+        self,
+        queue: asyncio.Queue,
+        loader_task: asyncio.Task,
+        frames: list[pd.DataFrame],
+        batch_data: list[dict[str, any]],
+        batch_coins_data: list[tuple[str, str]],
+    ):
+        """
+        Normalize batch off the event loop and pass it to loader
+
+        :param queue: queue of batches to load
+        :param loader_task: task loading batches from queue
+        :param frames: list to collect normalized frames into
+        :param batch_data: fetched data of batch
+        :param batch_coins_data: (coin_name, currency) pairs of batch
+        """
+
+        df_batch = await asyncio.to_thread(
+            self._normalize_batch, batch_data, batch_coins_data
+        )
+        if df_batch.empty:
+            return
+
+        if self.keep_frames:
+            frames.append(df_batch)
+
+        # wait here if loader is behind
+        await self._put(queue, loader_task, df_batch)
+
+    @staticmethod
+    async def _put(
+        queue: asyncio.Queue,
+        loader_task: asyncio.Task,
+        item: pd.DataFrame | None,
+    ):
+        """
+        Put item to queue unless loader stops first, full queue is never drained then
+
+        :param queue: queue of batches to load
+        :param loader_task: task loading batches from queue
+        :param item: batch to load or None to stop loader
+        """
+
+        put_task = asyncio.ensure_future(queue.put(item))
+        await asyncio.wait({put_task, loader_task}, return_when=asyncio.FIRST_COMPLETED)
+        if put_task.done():
+            return
+
+        put_task.cancel()
+        # raise error loader failed with
+        await loader_task
+        raise RuntimeError("Loader stopped before all batches were loaded")
+
+    async def _load_batches(self, queue: asyncio.Queue):
+        """
+        Load batches from queue until None is received
+
+        :param queue: queue of batches to load
+        """
+
+        while True:
+            df_batch = await queue.get()
+            if df_batch is None:
+                return
+
+            stats = await asyncio.to_thread(
+                self.db_loader.load_dataframe,
+                df=df_batch,
+                table_name=self._table_name,
+                mode=self.load_mode,
+            )
+            # loader reports errors in its result instead of raising them
+            if stats is None or stats.get("errors"):
+                raise RuntimeError(
+                    f"Batch of {len(df_batch)} rows was not loaded into {self._table_name}"
+                )
+            self.loaded_rows += stats["rows"]
+
+    def _normalize_batch(
+        self, data: list[dict[str, any]], coins_data: list[tuple[str, str]]
+    ) -> pd.DataFrame:
+        transformer = CryptoTransformer(aggregate_daily=self.aggregate_daily)
+        transformer.normalize_crypto_data(data=data, coins_data=coins_data)
+        return transformer.get_normalized_crypto()
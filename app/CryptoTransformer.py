@@ -1,29 +1,106 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 
+from app.JsonDecoder import SERIES_KEYS
+
+# schema of normalized DataFrame before memory-lean conversion
+WIDE_SCHEMA = {
+    "price": np.float64,
+    "volume": np.float64,
+    "capitalization": np.float64,
+    "date_key": np.int64,
+    "coin_name": object,
+    "currency": object,
+}
+
+# FX rate is not taken from base prices further than a day away
+MAX_FX_GAP_MS = 24 * 60 * 60 * 1000
+
 
 class CryptoTransformer:
 
-    def __init__(self):
+    def __init__(
+        self,
+        vectorized: bool = True,
+        aggregate_daily: bool = False,
+        workers: int = 1,
+        compact: bool = False,
+        float32_measures: bool = False,
+    ):
         self._normalized_df: pd.DataFrame | None = None
 
+        # use NumPy fast path instead of DataFrame merges
+        self.vectorized = vectorized
+
+        # amount of processes normalizing pairs of the fast path
+        self.workers = workers
+
+        # memory-lean schema: int32 date_key, categoricals built from coins_data
+        # and optionally float32 volume and capitalization
+        self.compact = compact
+        self.float32_measures = float32_measures
+
+        # reduce intraday points to one OHLCV row per day
+        self.aggregate_daily = aggregate_daily
+
     def get_normalized_crypto(self):
         if self._normalized_df is None or self._normalized_df.empty:
             return pd.DataFrame([])
         else:
             return self._normalized_df
 
+    def memory_report(self) -> pd.DataFrame:
+        """
+        Get memory usage of normalized DataFrame per column.
+        "after" is the schema actually in use. "before" is not measured: compact
+        schema is built up front and the wide frame never exists, so "before" is
+        estimated by re-casting the final frame to the wide schema with object
+        strings and 64-bit numbers which pd.concat materializes. The estimate has
+        rows of the final frame, e.g. without duplicates dropped by normalization.
+
+        :return: DataFrame with before_bytes and after_bytes by column and total
+        """
+
+        df = self.get_normalized_crypto()
+        if df.empty:
+            return pd.DataFrame(columns=["before_bytes", "after_bytes"])
+
+        # estimate of wide frame, see docstring
+        df_wide = df.astype(
+            {
+                column: dtype
+                for column, dtype in WIDE_SCHEMA.items()
+                if column in df.columns
+            }
+        )
+
+        report = pd.DataFrame(
+            {
+                "before_bytes": df_wide.memory_usage(index=False, deep=True),
+                "after_bytes": df.memory_usage(index=False, deep=True),
+            }
+        )
+        report.loc["total"] = report.sum()
+
+        return report
+
     def normalize_crypto_data(
         self, data: list[dict[str, any]], coins_data: list[tuple[str, str]]
     ) -> pd.DataFrame:
 
         # define final DataFrame
         list_of_dfs: list[pd.DataFrame] = []
+        list_of_parts: list[dict[str, any]] = []
+        self._normalized_df = None
 
         # check if every coin has its fetched data
         if len(coins_data) != len(data):
             print("Error. Not every coin has its data.")
             return
 
+        pairs: list[tuple[dict[str, any], str, str]] = []
         for i, coin_data in enumerate(data):
             # get coin name and currency
             coin_name = coins_data[i][0] or "Unknown"
@@ -34,60 +111,573 @@ class CryptoTransformer:
                 print(f"No data for pair {coin_name}/{currency}")
                 continue
 
-            df_prices = pd.DataFrame(
-                coin_data["prices"], columns=["timestamp", "price"]
-            )
-            df_total_volumes = pd.DataFrame(
-                coin_data["total_volumes"], columns=["timestamp", "total_volumes"]
+            pairs.append((coin_data, coin_name, currency))
+
+        if not self.vectorized:
+            for coin_data, coin_name, currency in pairs:
+                df_data = CryptoTransformer._normalize_pair_pandas(
+                    coin_data=coin_data, coin_name=coin_name, currency=currency
+                )
+
+                # append particular coin data to final result
+                if df_data is not None:
+                    list_of_dfs.append(df_data)
+        elif self.workers > 1 and len(pairs) > 1:
+            list_of_parts = CryptoTransformer._normalize_parallel(
+                pairs=pairs, workers=self.workers
             )
-            df_market_caps = pd.DataFrame(
-                coin_data["market_caps"], columns=["timestamp", "market_caps"]
+        else:
+            list_of_parts = normalize_shard(pairs)
+
+        # final DataFrame with all data
+        if len(list_of_dfs) == 0 and len(list_of_parts) == 0:
+            return
+
+        if self.vectorized:
+            df_final = CryptoTransformer._build_frame(
+                list_of_parts,
+                categories=(
+                    CryptoTransformer._get_categories(coins_data)
+                    if self.compact
+                    else None
+                ),
             )
+        else:
+            df_final = pd.concat(list_of_dfs)
 
-            # check if column is empty
-            if df_prices.empty or df_total_volumes.empty or df_market_caps.empty:
-                print(f"One or more columns are absent for pair {coin_name}/{currency}")
-                continue
+        df_final = CryptoTransformer._finalize(
+            df_final, aggregate_daily=self.aggregate_daily
+        )
 
-            df_data = df_prices.merge(
-                on="timestamp", how="inner", right=df_total_volumes
+        if self.compact:
+            df_final = CryptoTransformer._compact(
+                df_final, float32_measures=self.float32_measures
             )
-            df_data = df_data.merge(on="timestamp", how="inner", right=df_market_caps)
 
-            # change timestamp to INT type in YYYYMMDD format
-            df_data["date"] = pd.to_datetime(
-                df_data["timestamp"], unit="ms", errors="coerce"
-            ).dt.normalize()
-            df_data["date_key"] = df_data["date"].dt.strftime(("%Y%m%d")).astype(int)
+        self._normalized_df = df_final
+
+    @staticmethod
+    def aggregate_daily_ohlcv(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Reduce every pair to one row per day in a single groupby.
+        Rows of a day are expected in timestamp order, as returned by API.
 
-            # drop unnecesary columns
-            df_data.drop(columns=["timestamp", "date"], inplace=True)
+        :param df: normalized DataFrame with intraday points
+        :return: DataFrame with close price, open/high/low price,
+            last volume, last capitalization and amount of points per day
+        """
 
-            # rename columns
-            df_data.rename(
-                columns={"total_volumes": "volume", "market_caps": "capitalization"},
-                inplace=True,
+        df_daily = (
+            df.groupby(["coin_name", "currency", "date_key"], observed=True, sort=False)
+            .agg(
+                price=("price", "last"),
+                volume=("volume", "last"),
+                capitalization=("capitalization", "last"),
+                price_open=("price", "first"),
+                price_high=("price", "max"),
+                price_low=("price", "min"),
+                sample_count=("price", "size"),
             )
+            .reset_index()
+        )
 
-            # add coin name and currency
-            df_data["coin_name"] = coin_name
-            df_data["currency"] = currency
+        return df_daily[
+            [
+                "price",
+                "volume",
+                "capitalization",
+                "date_key",
+                "coin_name",
+                "currency",
+                "price_open",
+                "price_high",
+                "price_low",
+                "sample_count",
+            ]
+        ]
 
-            # append particular coin data to final result
-            list_of_dfs.append(df_data)
+    @staticmethod
+    def _normalize_parallel(
+        pairs: list[tuple[dict[str, any], str, str]], workers: int
+    ) -> list[dict[str, any]]:
+        """
+        Normalize pairs in a process pool. Pairs are split into contiguous shards
+        so parts come back in the same order as in serial path.
 
-        # final DataFrame with all data
-        if len(list_of_dfs) == 0:
-            return
-        df_final = pd.concat(list_of_dfs)
+        :param pairs: list of (coin_data, coin_name, currency)
+        :param workers: amount of worker processes
+        :return: normalized arrays of every pair
+        """
+
+        shard_size = -(-len(pairs) // workers)
+        shards = [
+            pairs[start : start + shard_size]
+            for start in range(0, len(pairs), shard_size)
+        ]
+
+        # workers return NumPy buffers which are pickled without per-row objects
+        with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+            return [
+                part
+                for shard_parts in executor.map(normalize_shard, shards)
+                for part in shard_parts
+            ]
+
+    @staticmethod
+    def _get_categories(coins_data: list[tuple[str, str]]) -> dict[str, list[str]]:
+        """
+        Get sorted coin_name and currency categories known before normalization
+
+        :param coins_data: (coin_name, currency) pairs
+        :return: categories by column
+        """
+
+        return {
+            "coin_name": sorted(
+                {coin_name or "Unknown" for coin_name, _ in coins_data}
+            ),
+            "currency": sorted({currency or "Unknown" for _, currency in coins_data}),
+        }
+
+    @staticmethod
+    def _compact(df: pd.DataFrame, float32_measures: bool) -> pd.DataFrame:
+        """
+        Convert normalized DataFrame to memory-lean schema.
+
+        float32 has 24 significant bits, so spacing of values from 2**17 = 131072
+        upward is 2**-6 = 1/64 > 0.01 and their cents are lost, only smaller values
+        keep the 2 decimal places of DECIMAL(30, 2) volume and DECIMAL(40, 2)
+        capitalization columns, e.g. capitalization of 1e12 has spacing 2**16 and
+        may be off by up to 32768 after round trip.
+        Price stays float64 to match DECIMAL(18, 2) exactly.
+
+        :param df: normalized DataFrame
+        :param float32_measures: store volume and capitalization as float32
+        :return: compact DataFrame
+        """
+
+        schema = {"date_key": np.int32}
+        if float32_measures:
+            schema.update({"volume": np.float32, "capitalization": np.float32})
+
+        return df.astype(schema)
+
+    @staticmethod
+    def _finalize(
+        df_final: pd.DataFrame, aggregate_daily: bool = False
+    ) -> pd.DataFrame:
+        """
+        Round values, convert pair columns to category and drop duplicates of raw points
+
+        :param df_final: concatenated data of every pair
+        :param aggregate_daily: reduce intraday points to one OHLCV row per day
+        :return: normalized DataFrame
+        """
 
         # round float values
         df_final = df_final.round(2)
 
+        if aggregate_daily:
+            # every intraday point is counted, identical points are not duplicates yet
+            df_final = CryptoTransformer.aggregate_daily_ohlcv(df_final)
+
         # change types
         df_final = df_final.astype({"coin_name": "category", "currency": "category"})
 
-        # drop duplicates
-        df_final = df_final.drop_duplicates()
+        # aggregated rows are already unique by their groupby key
+        if aggregate_daily:
+            return df_final
+        return df_final.drop_duplicates()
 
-        self._normalized_df = df_final
+    @staticmethod
+    def _normalize_pair_pandas(
+        coin_data: dict[str, any], coin_name: str, currency: str
+    ) -> pd.DataFrame | None:
+        """
+        Normalize data of one pair by merging DataFrames of every series on timestamp
+
+        :param coin_data: fetched data of pair
+        :param coin_name: coin name of pair
+        :param currency: currency of pair
+        :return: DataFrame of pair or None if any series is empty
+        """
+
+        df_prices = pd.DataFrame(coin_data["prices"], columns=["timestamp", "price"])
+        df_total_volumes = pd.DataFrame(
+            coin_data["total_volumes"], columns=["timestamp", "total_volumes"]
+        )
+        df_market_caps = pd.DataFrame(
+            coin_data["market_caps"], columns=["timestamp", "market_caps"]
+        )
+
+        # check if column is empty
+        if df_prices.empty or df_total_volumes.empty or df_market_caps.empty:
+            print(f"One or more columns are absent for pair {coin_name}/{currency}")
+            return None
+
+        df_data = df_prices.merge(on="timestamp", how="inner", right=df_total_volumes)
+        df_data = df_data.merge(on="timestamp", how="inner", right=df_market_caps)
+
+        # change timestamp to INT type in YYYYMMDD format
+        df_data["date"] = pd.to_datetime(
+            df_data["timestamp"], unit="ms", errors="coerce"
+        ).dt.normalize()
+        df_data["date_key"] = df_data["date"].dt.strftime(("%Y%m%d")).astype(int)
+
+        # drop unnecesary columns
+        df_data.drop(columns=["timestamp", "date"], inplace=True)
+
+        # rename columns
+        df_data.rename(
+            columns={"total_volumes": "volume", "market_caps": "capitalization"},
+            inplace=True,
+        )
+
+        # add coin name and currency
+        df_data["coin_name"] = coin_name
+        df_data["currency"] = currency
+
+        return df_data
+
+    @staticmethod
+    def _normalize_pair_numpy(
+        coin_data: dict[str, any], coin_name: str, currency: str
+    ) -> dict[str, any] | None:
+        """
+        Normalize data of one pair with NumPy arrays instead of DataFrame merges
+
+        :param coin_data: fetched data of pair
+        :param coin_name: coin name of pair
+        :param currency: currency of pair
+        :return: dictionary with index, column arrays, coin name and currency
+            or None if any series is empty
+        """
+
+        # stack raw lists into (n, 2) arrays, integer payloads stay int64 like in DataFrame
+        prices = CryptoTransformer._to_inferred_series_array(coin_data["prices"])
+        volumes = CryptoTransformer._to_inferred_series_array(
+            coin_data["total_volumes"]
+        )
+        caps = CryptoTransformer._to_inferred_series_array(coin_data["market_caps"])
+
+        # check if column is empty
+        if len(prices) == 0 or len(volumes) == 0 or len(caps) == 0:
+            print(f"One or more columns are absent for pair {coin_name}/{currency}")
+            return None
+
+        # align volumes and market caps on price timestamps keeping price order
+        volume_idx, volume_found = CryptoTransformer._match_timestamps(
+            prices[:, 0], volumes[:, 0]
+        )
+        caps_idx, caps_found = CryptoTransformer._match_timestamps(
+            prices[:, 0], caps[:, 0]
+        )
+
+        # merge produces every combination of duplicated timestamps, keep its semantics
+        if volume_idx is None or caps_idx is None:
+            df_data = CryptoTransformer._normalize_pair_pandas(
+                coin_data=coin_data, coin_name=coin_name, currency=currency
+            )
+            return {
+                "index": df_data.index.to_numpy(),
+                "price": df_data["price"].to_numpy(),
+                "volume": df_data["volume"].to_numpy(),
+                "capitalization": df_data["capitalization"].to_numpy(),
+                "date_key": df_data["date_key"].to_numpy(),
+                "coin_name": coin_name,
+                "currency": currency,
+            }
+
+        found = volume_found & caps_found
+
+        return {
+            "index": np.arange(np.count_nonzero(found), dtype=np.int64),
+            "price": prices[found, 1],
+            "volume": volumes[volume_idx[found], 1],
+            "capitalization": caps[caps_idx[found], 1],
+            "date_key": CryptoTransformer._timestamps_to_date_keys(prices[found, 0]),
+            "coin_name": coin_name,
+            "currency": currency,
+        }
+
+    @staticmethod
+    def _match_timestamps(
+        left: np.ndarray, right: np.ndarray
+    ) -> tuple[np.ndarray | None, np.ndarray | None]:
+        """
+        Find position of every left timestamp in right timestamps with sorted-array search
+
+        :param left: timestamps to look up
+        :param right: timestamps to look in
+        :return: positions in right and mask of found timestamps,
+            (None, None) if right timestamps are not unique
+        """
+
+        order = np.argsort(right, kind="stable")
+        right_sorted = right[order]
+
+        if np.any(right_sorted[1:] == right_sorted[:-1]):
+            return None, None
+
+        positions = np.searchsorted(right_sorted, left)
+        positions = np.minimum(positions, len(right_sorted) - 1)
+        found = right_sorted[positions] == left
+
+        return order[positions], found
+
+    @staticmethod
+    def _timestamps_to_date_keys(timestamps: np.ndarray) -> np.ndarray:
+        """
+        Convert millisecond timestamps into YYYYMMDD integers arithmetically from epoch days
+
+        :param timestamps: UNIX timestamps in milliseconds
+        :return: date keys
+        """
+
+        days = (
+            timestamps.astype(np.int64).astype("datetime64[ms]").astype("datetime64[D]")
+        )
+        months = days.astype("datetime64[M]")
+
+        year = days.astype("datetime64[Y]").astype(np.int64) + 1970
+        month = months.astype(np.int64) % 12 + 1
+        day = (days - months).astype(np.int64) + 1
+
+        return year * 10000 + month * 100 + day
+
+    @staticmethod
+    def _build_frame(
+        parts: list[dict[str, any]], categories: dict[str, list[str]] | None = None
+    ) -> pd.DataFrame:
+        """
+        Build DataFrame of every pair once from preallocated columns
+
+        :param parts: normalized arrays of every pair
+        :param categories: known coin_name and currency values, when given pair
+            columns are built as categoricals up front with int32 date_key
+        :return: concatenated data of every pair
+        """
+
+        total = sum(len(part["index"]) for part in parts)
+
+        # like concat, column is int64 only if it is int64 in every pair
+        measure_dtypes = {
+            column: (
+                np.int64
+                if all(np.issubdtype(part[column].dtype, np.integer) for part in parts)
+                else np.float64
+            )
+            for column in ("price", "volume", "capitalization")
+        }
+
+        index = np.empty(total, dtype=np.int64)
+        columns = {
+            **{
+                column: np.empty(total, dtype=dtype)
+                for column, dtype in measure_dtypes.items()
+            },
+            "date_key": np.empty(
+                total, dtype=np.int64 if categories is None else np.int32
+            ),
+            "coin_name": np.empty(
+                total, dtype=object if categories is None else np.int32
+            ),
+            "currency": np.empty(
+                total, dtype=object if categories is None else np.int32
+            ),
+        }
+
+        # category codes of pair columns
+        codes = (
+            {
+                column: {value: code for code, value in enumerate(values)}
+                for column, values in categories.items()
+            }
+            if categories is not None
+            else None
+        )
+
+        # fill columns pair by pair
+        offset = 0
+        for part in parts:
+            end = offset + len(part["index"])
+            index[offset:end] = part["index"]
+            for column, values in columns.items():
+                if codes is not None and column in codes:
+                    values[offset:end] = codes[column][part[column]]
+                else:
+                    values[offset:end] = part[column]
+            offset = end
+
+        if categories is not None:
+            for column, values in categories.items():
+                columns[column] = pd.Categorical.from_codes(
+                    columns[column], categories=values
+                )
+
+        # concat keeps RangeIndex of the only frame
+        if len(parts) == 1:
+            return pd.DataFrame(columns, index=pd.RangeIndex(total))
+
+        return pd.DataFrame(columns, index=index)
+
+    @staticmethod
+    def concat_normalized(frames: list[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Combine normalized frames of separate batches into one frame
+
+        :param frames: normalized DataFrames
+        :return: combined DataFrame with categorical coin_name and currency
+        """
+
+        frames = [df for df in frames if not df.empty]
+        if len(frames) == 0:
+            return pd.DataFrame([])
+
+        # categories differ between batches so concat falls back to object dtype
+        df_final = pd.concat(frames)
+        df_final = df_final.astype({"coin_name": "category", "currency": "category"})
+
+        return df_final.drop_duplicates()
+
+    @staticmethod
+    def get_fx_rates(
+        fx_data: dict[str, dict[str, any]], base_currency: str
+    ) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+        """
+        Build historical FX table from prices of one reference coin in every currency
+
+        :param fx_data: fetched reference coin data by currency, base currency included
+        :param base_currency: currency other currencies are converted from
+        :return: dictionary with currency as key and (timestamps, rates) arrays as value
+        """
+
+        base_prices = CryptoTransformer._to_series_array(
+            fx_data.get(base_currency, {}).get("prices", [])
+        )
+        base_prices = base_prices[np.argsort(base_prices[:, 0], kind="stable")]
+
+        fx_rates = {}
+        for currency, currency_data in fx_data.items():
+            if currency == base_currency or not currency_data:
+                continue
+
+            prices = CryptoTransformer._to_series_array(currency_data.get("prices", []))
+
+            # series of currencies are sampled at different moments, so base price
+            # is interpolated at timestamps of currency series instead of matched exactly
+            prices = prices[np.argsort(prices[:, 0], kind="stable")]
+            if len(base_prices):
+                prices = prices[
+                    (prices[:, 0] >= base_prices[0, 0] - MAX_FX_GAP_MS)
+                    & (prices[:, 0] <= base_prices[-1, 0] + MAX_FX_GAP_MS)
+                ]
+            if len(base_prices) == 0 or len(prices) == 0:
+                print(f"Unable to build FX rates for {base_currency}/{currency}")
+                continue
+
+            fx_rates[currency] = (
+                prices[:, 0],
+                prices[:, 1]
+                / np.interp(prices[:, 0], base_prices[:, 0], base_prices[:, 1]),
+            )
+
+        return fx_rates
+
+    @staticmethod
+    def derive_currency_data(
+        data: list[dict[str, any]],
+        coins_data: list[tuple[str, str]],
+        fx_rates: dict[str, tuple[np.ndarray, np.ndarray]],
+        base_currency: str,
+        currencies: list[str],
+        native_pairs: list[tuple[str, str]] | None = None,
+    ) -> tuple[list[dict[str, any]], list[tuple[str, str]]]:
+        """
+        Derive data of other currencies from data fetched in base currency
+
+        :param data: fetched data aligned with coins_data
+        :param coins_data: (coin_name, currency) pairs of fetched data
+        :param fx_rates: FX table returned by get_fx_rates()
+        :param base_currency: currency data was fetched in
+        :param currencies: currencies to derive
+        :param native_pairs: pairs fetched natively which must not be derived
+        :return: fetched data extended with derived data and matching coins_data
+        """
+
+        native_pairs = set(native_pairs or [])
+        derived_data = list(data)
+        derived_coins_data = list(coins_data)
+
+        for coin_data, (coin_name, currency) in zip(data, coins_data):
+            if currency != base_currency or len(coin_data) == 0:
+                continue
+
+            for target_currency in currencies:
+                if (
+                    target_currency == base_currency
+                    or (coin_name, target_currency) in native_pairs
+                ):
+                    continue
+
+                if target_currency not in fx_rates:
+                    print(f"No FX rates for pair {coin_name}/{target_currency}")
+                    continue
+
+                fx_timestamps, rates = fx_rates[target_currency]
+                converted = {}
+
+                # convert every series with rate interpolated at its timestamps
+                for key in SERIES_KEYS:
+                    series = CryptoTransformer._to_series_array(coin_data.get(key, []))
+                    series_rates = np.interp(series[:, 0], fx_timestamps, rates)
+                    converted[key] = np.column_stack(
+                        (series[:, 0], series[:, 1] * series_rates)
+                    )
+
+                derived_data.append(converted)
+                derived_coins_data.append((coin_name, target_currency))
+
+        return derived_data, derived_coins_data
+
+    @staticmethod
+    def _to_series_array(series: list[list] | np.ndarray) -> np.ndarray:
+        return np.asarray(series, dtype=np.float64).reshape(-1, 2)
+
+    @staticmethod
+    def _to_inferred_series_array(series: list[list] | np.ndarray) -> np.ndarray:
+        """
+        Stack series into (n, 2) array of int64 if every point is integer, else of float64
+        """
+
+        array = np.asarray(series)
+        if not np.issubdtype(array.dtype, np.integer):
+            # null values and mixed points are read as float like DataFrame does
+            array = np.asarray(series, dtype=np.float64)
+
+        return array.astype(
+            np.int64 if np.issubdtype(array.dtype, np.integer) else np.float64,
+            copy=False,
+        ).reshape(-1, 2)
+
+
+def normalize_shard(
+    pairs: list[tuple[dict[str, any], str, str]],
+) -> list[dict[str, any]]:
+    """
+    Normalize shard of pairs with NumPy fast path.
+    Defined on module level so it can be sent to process pool.
+
+    :param pairs: list of (coin_data, coin_name, currency)
+    :return: normalized arrays of every pair with data
+    """
+
+    parts = []
+    for coin_data, coin_name, currency in pairs:
+        part = CryptoTransformer._normalize_pair_numpy(
+            coin_data=coin_data, coin_name=coin_name, currency=currency
+        )
+        if part is not None:
+            parts.append(part)
+
+    return parts
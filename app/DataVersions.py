@@ -0,0 +1,147 @@
+import random
+
+from sqlalchemy import Connection
+
+from app.SqlDialect import (
+    DATA_VERSIONS_COLUMNS,
+    DATA_VERSIONS_KEY_COLUMNS,
+    SqlDialect,
+)
+from app.consts import DATA_VERSIONS_TABLE
+
+
+class DataVersions:
+    """
+    Version tokens of (coin_name, currency) pairs of data tables.
+
+    Token of pair is replaced with a new random one every time load inserts or
+    updates its rows, so cached query results of pair are valid as long as
+    token is the same. Random tokens don't repeat across databases, e.g. new
+    in-memory database never matches results cached for another one.
+
+    Tokens of table are read once and kept until the next bump, pairs loaded
+    before versions were tracked get tokens when they are read first.
+    """
+
+    def __init__(
+        self, dialect: SqlDialect | None = None, table_name: str = DATA_VERSIONS_TABLE
+    ):
+        """
+        :param dialect: SQL dialect of backend, MySQL if None
+        :param table_name: table of version tokens, created on first use
+        """
+
+        self.dialect = dialect or SqlDialect()
+        self.table_name = table_name
+        self._is_table_created = False
+        # version tokens of data tables read since their last bump
+        self._versions: dict[str, dict[tuple[str, str], int]] = {}
+
+    def get_cached_versions(self, table_name: str) -> dict[tuple[str, str], int] | None:
+        """
+        Get version tokens of data table read before, None if they have to be read
+
+        :param table_name: data table name
+        :return: dictionary with (coin_name, currency) as key and token as value
+        """
+
+        versions = self._versions.get(table_name)
+        return dict(versions) if versions is not None else None
+
+    def get_versions(
+        self, conn: Connection, table_name: str
+    ) -> dict[tuple[str, str], int]:
+        """
+        Get version token of every loaded pair of data table
+
+        :param conn: open connection
+        :param table_name: data table name
+        :return: dictionary with (coin_name, currency) as key and token as value
+        """
+
+        versions = self.get_cached_versions(table_name=table_name)
+        if versions is not None:
+            return versions
+
+        self._create_table(conn=conn)
+        versions = self._read_versions(conn=conn, table_name=table_name)
+
+        # pairs without token would share the same missing token in every database
+        quote = self.dialect.quote
+        rows = conn.exec_driver_sql(
+            f"SELECT DISTINCT {quote('coin_name')}, {quote('currency')} "
+            f"FROM {quote(table_name)}"
+        ).fetchall()
+        missing_pairs = {(row[0], row[1]) for row in rows} - set(versions)
+        if missing_pairs:
+            self.bump(conn=conn, table_name=table_name, pairs=missing_pairs)
+            versions = self._read_versions(conn=conn, table_name=table_name)
+
+        self._versions[table_name] = versions
+        return dict(versions)
+
+    def bump(self, conn: Connection, table_name: str, pairs: set[tuple[str, str]]):
+        """
+        Replace version tokens of pairs with new ones
+
+        :param conn: open connection
+        :param table_name: data table name
+        :param pairs: (coin_name, currency) pairs with inserted or updated rows
+        """
+
+        if not pairs:
+            return
+
+        self._create_table(conn=conn)
+        quote = self.dialect.quote
+        placeholder = self.dialect.placeholder
+        cols = ", ".join(quote(name) for name, *_ in DATA_VERSIONS_COLUMNS)
+        keys = " AND ".join(
+            f"{quote(k)} = {placeholder}" for k in DATA_VERSIONS_KEY_COLUMNS
+        )
+        pairs = sorted(pairs)
+
+        # add missing pairs first, then every token is replaced by UPDATE
+        conn.exec_driver_sql(
+            f"{self.dialect.insert_ignore} {quote(self.table_name)} ({cols}) "
+            f"VALUES ({', '.join([placeholder] * len(DATA_VERSIONS_COLUMNS))})",
+            [(table_name, coin_name, currency, 0) for coin_name, currency in pairs],
+        )
+        conn.exec_driver_sql(
+            f"UPDATE {quote(self.table_name)} "
+            f"SET {quote('version')} = {placeholder} WHERE {keys}",
+            [
+                (random.getrandbits(62), table_name, coin_name, currency)
+                for coin_name, currency in pairs
+            ],
+        )
+        conn.commit()
+        # tokens are read again after load
+        self._versions.pop(table_name, None)
+
+    def _read_versions(
+        self, conn: Connection, table_name: str
+    ) -> dict[tuple[str, str], int]:
+        quote = self.dialect.quote
+        rows = conn.exec_driver_sql(
+            f"SELECT {quote('coin_name')}, {quote('currency')}, {quote('version')} "
+            f"FROM {quote(self.table_name)} "
+            f"WHERE {quote('table_name')} = {self.dialect.placeholder}",
+            (table_name,),
+        ).fetchall()
+
+        return {(row[0], row[1]): int(row[2]) for row in rows}
+
+    def _create_table(self, conn: Connection):
+        if self._is_table_created:
+            return
+
+        conn.exec_driver_sql(
+            self.dialect.create_table_sql(
+                table_name=self.table_name,
+                columns=DATA_VERSIONS_COLUMNS,
+                key_columns=DATA_VERSIONS_KEY_COLUMNS,
+            )
+        )
+        conn.commit()
+        self._is_table_created = True
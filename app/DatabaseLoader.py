@@ -1,31 +1,63 @@
-import os
-from dotenv import load_dotenv
+from collections.abc import Iterator
+from functools import partial
 
 from sqlalchemy import Engine, create_engine, text
+import pandas as pd
 from pandas import DataFrame
 
+from app.BaseDatabaseLoader import BaseDatabaseLoader
+from app.BulkLoader import BulkLoader
+from app.ParallelLoader import ParallelLoader
+from app.ResultFrame import make_dataframe
+from app.SqlDialect import CRYPTO_DATA_COLUMNS
+from app.enums.BackendEnum import BackendEnum
 
-load_dotenv()
+try:
+    import duckdb_engine
+except ImportError:
+    duckdb_engine = None
 
 
-class DatabaseLoader:
+class DatabaseLoader(BaseDatabaseLoader):
     """
-    Base class for managing MySQL connection and data Loading
+    Class for managing database connection and data Loading.
+    MySQL server is used by default, embedded DuckDB and SQLite backends run in-process.
     """
 
-    def __init__(self):
-        user = os.getenv("DB_USER")
-        password = os.getenv("DB_PASSWORD")
-        host = os.getenv("DB_HOST")
-        port = os.getenv("INTERNAL_DB_PORT")
-        name = os.getenv("DB_NAME")
+    def __init__(
+        self,
+        pool_size: int = 5,
+        backend: str = BackendEnum.mysql.value,
+        database: str | None = None,
+        track_versions: bool = False,
+        maintain_rollups: bool = False,
+    ):
+        """
+        :param pool_size: number of pooled connections, it limits parallel load workers
+        :param backend: value of BackendEnum
+        :param database: file of embedded database, in-memory database if None
+        :param track_versions: give new version tokens to pairs changed by loads
+        :param maintain_rollups: update prepared rollups from changed rows of loads
+        """
 
-        # define connection string for db
-        self.connection_string: str = (
-            f"mysql+pymysql://{user}:{password}@{host}:{port}/{name}"
+        # DuckDB driver is optional, SQLite is always available
+        if backend == BackendEnum.duckdb.value and duckdb_engine is None:
+            print("DuckDB driver is not installed, falling back to SQLite")
+            backend = BackendEnum.sqlite.value
+
+        super().__init__(
+            pool_size=pool_size,
+            backend=backend,
+            database=database,
+            track_versions=track_versions,
+            maintain_rollups=maintain_rollups,
         )
+
+        # define connection string for db
+        self.connection_string: str = self._get_connection_string()
         # define engine for db
         self.engine: Engine | None = None
+        self.parallel_loader: ParallelLoader | None = None
         self._init_engine()
 
     def _init_engine(self):
@@ -33,7 +65,20 @@ class DatabaseLoader:
         Initialize SQLAlchemy engine
         """
         try:
-            self.engine = create_engine(self.connection_string)
+            self.engine = create_engine(
+                self.connection_string, **self._get_engine_options()
+            )
+            # keys of changed rows feed rollups and version tokens only
+            track_changes = self.track_versions or self.maintain_rollups
+            self.bulk_loader = BulkLoader(
+                engine=self.engine, dialect=self.dialect, track_changes=track_changes
+            )
+            self.parallel_loader = ParallelLoader(
+                engine=self.engine,
+                dialect=self.dialect,
+                workers=self.pool_size,
+                track_changes=track_changes,
+            )
 
             self._test_db_initialization()
             print("Success. DB engine has been created.")
@@ -50,9 +95,38 @@ class DatabaseLoader:
         with self.engine.connect() as connection:
             result = connection.execute(text("SELECT 1 + 1")).fetchone()
             if result and result[0] == 2:
-                print(
-                    f"Success. MySQL is working correctly. {self.engine.url.host}:{self.engine.url.port}"
-                )
+                self._print_db_working(engine=self.engine)
+
+    def create_table(self, table_name: str):
+        """
+        Create crypto data table if it doesn't exist and add nullable columns missing in existing one,
+        MySQL table is usually created by sql/init_db.sql
+
+        :param table_name: table name to create
+        """
+
+        with self.engine.connect() as connection:
+            connection.exec_driver_sql(self.dialect.create_table_sql(table_name))
+
+            # tables created by older versions lack later columns, every later column is nullable
+            existing_columns = set(
+                connection.exec_driver_sql(
+                    f"SELECT * FROM {self.dialect.quote(table_name)} LIMIT 0"
+                ).keys()
+            )
+            for name, type_name, precision, scale, nullable in CRYPTO_DATA_COLUMNS:
+                if name not in existing_columns and nullable:
+                    connection.exec_driver_sql(
+                        self.dialect.add_column_sql(
+                            table_name=table_name,
+                            name=name,
+                            type_name=type_name,
+                            precision=precision,
+                            scale=scale,
+                        )
+                    )
+                    print(f"Success. Column {name} has been added to {table_name}.")
+            connection.commit()
 
     def execute_query(self, query: str):
         """
@@ -71,40 +145,152 @@ class DatabaseLoader:
             print(f"Error. Unable to execute SQL query: {e}")
             return []
 
+    def fetch_dataframe(
+        self, query: str, schema: dict[str, str] | None = None, chunk_size: int = 10000
+    ) -> DataFrame:
+        """
+        Execute query and return typed DataFrame, also with columns of zero-row result
+
+        :param query: query to execute
+        :param schema: dtype of columns, e.g. {"price": "float64"}, inferred if missing
+        :param chunk_size: rows fetched from server-side cursor at once
+        :return: DataFrame
+        """
+
+        try:
+            frames = list(
+                self.iter_dataframe(query=query, schema=schema, chunk_size=chunk_size)
+            )
+        except Exception:
+            # result broken mid-stream is not returned partially, empty frame is never cached
+            return self._make_empty_frame(schema=schema)
+
+        if len(frames) == 1:
+            return frames[0]
+
+        # typed empty frames of later chunks keep dtypes of concatenated frame
+        return pd.concat(frames, ignore_index=True)
+
+    def iter_dataframe(
+        self, query: str, schema: dict[str, str] | None = None, chunk_size: int = 10000
+    ) -> Iterator[DataFrame]:
+        """
+        Execute query streaming rows with server-side cursor and yield typed DataFrame of every chunk
+
+        :param query: query to execute
+        :param schema: dtype of columns, e.g. {"price": "float64"}, inferred if missing
+        :param chunk_size: rows in one DataFrame
+        :return: iterator of DataFrames, one empty typed DataFrame for zero-row result
+        """
+
+        is_empty = True
+        try:
+            with self.engine.connect() as connection:
+                result = connection.execution_options(
+                    stream_results=True, yield_per=chunk_size
+                ).execute(text(query))
+                columns = list(result.keys())
+
+                for rows in result.partitions(chunk_size):
+                    is_empty = False
+                    yield make_dataframe(rows=rows, columns=columns, schema=schema)
+
+                if is_empty:
+                    yield make_dataframe(rows=[], columns=columns, schema=schema)
+
+        except Exception as e:
+            print(f"Error. Unable to execute SQL query: {e}")
+            # yielded chunks can't be taken back, consumer must not take them for whole result
+            if not is_empty:
+                raise
+            yield self._make_empty_frame(schema=schema)
+
+    def get_watermarks(self, table_name: str) -> dict[tuple[str, str], int]:
+        """
+        Get latest loaded date_key for every (coin_name, currency) pair in one grouped query
+
+        :param table_name: table name to get watermarks from.
+        :return: dictionary with (coin_name, currency) as key and MAX(date_key) as value
+        """
+
+        rows = self.execute_query(query=self._make_watermarks_query(table_name)) or []
+        return self._to_watermarks(rows)
+
+    def get_data_versions(self, table_name: str) -> dict[tuple[str, str], int]:
+        """
+        Get version token of every loaded (coin_name, currency) pair of table
+
+        :param table_name: data table name
+        :return: dictionary with (coin_name, currency) as key and token as value
+        """
+
+        # tokens read before are reused without connection until the next load
+        versions = self.data_versions.get_cached_versions(table_name=table_name)
+        if versions is not None:
+            return versions
+
+        with self.engine.connect() as connection:
+            return self.data_versions.get_versions(
+                conn=connection, table_name=table_name
+            )
+
+    def prepare_rollups(self, table_name: str):
+        """
+        Create rollup tables of table if they don't exist yet and fill them from its rows
+
+        :param table_name: data table name
+        """
+
+        with self.engine.connect() as connection:
+            self.rollups.prepare(conn=connection, table_name=table_name)
+
     def load_dataframe(
         self,
         df: DataFrame,
         table_name: str,
-    ):
+        strategy: str | None = None,
+        mode: str = "ignore",
+        workers: int = 1,
+    ) -> dict[str, any] | None:
         """
-        Load Pandas DataFrame into MySQL table
+        Load Pandas DataFrame into MySQL table in chunks
 
         :param df: DataFrame to load.
         :param table_name: table name where to load.
-        :param if_exists: action when table already exists.
+        :param strategy: bulk load strategy "insert", "infile" or "auto", loader default if None
+        :param mode: "ignore" keeps existing rows, "upsert" updates them,
+            "merge" updates them through staging table and counts changed rows
+        :param workers: number of (coin_name, currency) partitions loaded in parallel
+        :return: load statistics or None on error, errors of partitions
+            which failed to load with workers are listed in "errors"
         """
 
         if not self.engine:
             print("Engine is not initialized")
             return
 
-        data_to_insert = df.to_dict(orient="records")
-        keys = list(df.columns)
+        if workers > 1 and not self.dialect.parallel_load:
+            print(f"{self.dialect.backend} has one writer, loading without workers")
+            workers = 1
 
-        cols = ", ".join(f"`{k}`" for k in keys)
-        placeholders = ", ".join([f":{k}" for k in keys])
+        if workers > 1:
+            load = partial(
+                self.parallel_loader.load,
+                df=df,
+                table_name=table_name,
+                mode=mode,
+                workers=workers,
+                strategy=strategy,
+            )
+        else:
+            load = partial(
+                self.bulk_loader.load,
+                df=df,
+                table_name=table_name,
+                strategy=strategy,
+                mode=mode,
+            )
 
-        sql = f"""
-            INSERT IGNORE INTO `{table_name}` ({cols}) 
-            VALUES ({placeholders})
-        """
-
-        try:
-            with self.engine.connect() as conn:
-                conn.execute(text(sql), data_to_insert)
-                conn.commit()
-
-            print(f"Success. Loaded {len(df)} records into {table_name}")
-
-        except Exception as e:
-            print(f"Error while loading DataFrame into table. {e}")
+        return self._load_tracked(
+            connect=self.engine.connect, table_name=table_name, load=load
+        )
@@ -0,0 +1,521 @@
+from decimal import ROUND_HALF_UP, Decimal
+from fractions import Fraction
+
+import numpy as np
+import pandas as pd
+
+from app.SqlDialect import (
+    CRYPTO_DATA_COLUMNS,
+    CRYPTO_DATA_KEY_COLUMNS,
+    CRYPTO_DATA_PAIR_COLUMNS,
+    SqlDialect,
+)
+from app.enums.ColumnsToAnalyzeEnum import ColumnsToAnalyzeEnum
+from app.enums.OrderEnum import OrderEnum
+
+# growth is rounded to 2 digits of percent
+GROWTH_SCALE = 2
+# integers above it are computed with Python ints to avoid int64 overflow
+INT64_LIMIT = 2**62
+
+
+class FrameAnalyzer:
+    """
+    In-process implementation of CryptoAnalyzer queries on normalized DataFrame,
+    it runs the same analytics without database round trips.
+
+    Values are rounded to scale of their DECIMAL column like MySQL rounds them
+    on insert and every computation is done on integers of that scale, so ties
+    and rounding follow database exactly: MySQL averages are rounded half away
+    from zero to scale + div_precision_increment digits, DOUBLE averages of
+    embedded backends are the nearest float of exact mean and growth is
+    rounded from exact quotient.
+    """
+
+    def __init__(self, df: pd.DataFrame, dialect: SqlDialect | None = None):
+        """
+        :param df: normalized crypto data in format loaded into table
+        :param dialect: SQL dialect of backend whose results are reproduced, MySQL if None
+        """
+
+        self.dialect = dialect or SqlDialect()
+
+        analyzed_columns = [c.value for c in ColumnsToAnalyzeEnum]
+        # rows violating NOT NULL or duplicating primary key are never loaded
+        df = df.dropna(subset=analyzed_columns).drop_duplicates(
+            subset=list(CRYPTO_DATA_KEY_COLUMNS), keep="first"
+        )
+
+        df = pd.DataFrame(
+            {
+                "coin_name": df["coin_name"].astype(object),
+                "currency": df["currency"].astype(object),
+                "date_key": df["date_key"].astype(np.int64),
+                **{c: df[c].astype(np.float64) for c in analyzed_columns},
+            }
+        )
+
+        # rows of every pair are kept together and ordered by date_key like window frames
+        group_ids = df.groupby(
+            list(CRYPTO_DATA_PAIR_COLUMNS), sort=False, dropna=False
+        ).ngroup()
+        order = np.lexsort((df["date_key"].to_numpy(), group_ids.to_numpy()))
+        self._df = df.iloc[order].reset_index(drop=True)
+        self._group_ids = group_ids.to_numpy()[order]
+
+        # first row of group and position of row inside its group
+        is_start = np.r_[True, self._group_ids[1:] != self._group_ids[:-1]]
+        starts = np.flatnonzero(is_start)
+        sizes = np.diff(np.r_[starts, len(self._df)])
+        self._group_starts = np.repeat(starts, sizes)
+        self._group_ends = np.repeat(starts + sizes - 1, sizes)
+        self._positions = np.arange(len(self._df)) - self._group_starts
+
+        self._units: dict[str, np.ndarray] = {}
+
+    def get_spikes(
+        self,
+        up_to_rank: int,
+        column: ColumnsToAnalyzeEnum,
+        order: OrderEnum,
+        pairs: list[tuple[str, str]] | None,
+        start_date_key: str,
+        end_date_key: str,
+    ) -> pd.DataFrame:
+        """
+        DENSE_RANK of column values of every pair inside date range, ties share rank
+
+        :param up_to_rank: max rank to keep
+        :param column: column to rank
+        :param order: ranking order
+        :param pairs: (coin_name, currency) pairs, every pair if None
+        :param start_date_key: YYYYMMDD first day of range
+        :param end_date_key: YYYYMMDD last day of range
+        :return: DataFrame with coin_name, date_key, currency, column and its rank
+        """
+
+        mask = self._get_rows_mask(
+            pairs=pairs, start_date_key=start_date_key, end_date_key=end_date_key
+        )
+        df = self._df.loc[mask, ["coin_name", "date_key", "currency"]]
+        units = pd.Series(self._get_units(column)[mask], index=df.index)
+
+        ranks = units.groupby(self._group_ids[mask]).rank(
+            method="dense", ascending=order == OrderEnum.ascending.value
+        )
+        keep = (ranks <= up_to_rank).to_numpy()
+
+        df = df[keep].assign(
+            **{
+                column: self._to_float(units[keep].to_numpy(), self._get_scale(column)),
+                f"{column}_rank": ranks[keep].astype(np.int64).to_numpy(),
+            }
+        )
+        return df.sort_values(
+            by=["coin_name", "currency", f"{column}_rank", "date_key"], kind="stable"
+        ).reset_index(drop=True)
+
+    def get_moving_average(
+        self,
+        column: ColumnsToAnalyzeEnum,
+        preceding_days: int,
+        following_days: int,
+        pairs: list[tuple[str, str]] | None,
+        start_date_key: str | None = None,
+        end_date_key: str | None = None,
+    ) -> pd.DataFrame:
+        """
+        AVG over ROWS BETWEEN preceding PRECEDING AND following FOLLOWING frame,
+        frame is cut at the first and last row of every pair
+
+        :param column: column to average
+        :param preceding_days: rows before current one
+        :param following_days: rows after current one
+        :param pairs: (coin_name, currency) pairs, every pair if None
+        :param start_date_key: YYYYMMDD first day of returned rows, earlier rows still fill frames, no limit if None
+        :param end_date_key: YYYYMMDD last day of returned rows, later rows still fill frames, no limit if None
+        :return: DataFrame with coin_name, currency, date_key, column and its moving average
+        """
+
+        df = self.get_moving_averages(
+            column=column,
+            windows=[(preceding_days, following_days)],
+            pairs=pairs,
+            start_date_key=start_date_key,
+            end_date_key=end_date_key,
+        )
+        return df.rename(
+            columns={
+                f"moving_avg_{column}_{preceding_days}_{following_days}": f"moving_avg_{column}"
+            }
+        )
+
+    def get_moving_averages(
+        self,
+        column: ColumnsToAnalyzeEnum,
+        windows: list[tuple[int, int]],
+        pairs: list[tuple[str, str]] | None,
+        start_date_key: str | None = None,
+        end_date_key: str | None = None,
+    ) -> pd.DataFrame:
+        """
+        AVG over every ROWS BETWEEN preceding PRECEDING AND following FOLLOWING frame,
+        all windows are O(n) differences of one cumulative sum
+
+        :param column: column to average
+        :param windows: (preceding_days, following_days) of every moving average
+        :param pairs: (coin_name, currency) pairs, every pair if None
+        :param start_date_key: YYYYMMDD first day of returned rows, earlier rows still fill frames, no limit if None
+        :param end_date_key: YYYYMMDD last day of returned rows, later rows still fill frames, no limit if None
+        :return: DataFrame with coin_name, currency, date_key, column and moving_avg_{column}_{preceding}_{following} of every window
+        """
+
+        units = self._get_units(column)
+        scale = self._get_scale(column)
+
+        # window sums from cumulative sum, pairs are contiguous so frames never cross them
+        sums = FrameAnalyzer._fit(units, limit=FrameAnalyzer._get_sum_limit(units))
+        cumulative = np.r_[sums[:0], [0], np.cumsum(sums)]
+        mask = self._get_rows_mask(
+            pairs=pairs, start_date_key=start_date_key, end_date_key=end_date_key
+        )
+        rows = np.flatnonzero(mask)
+
+        averages = {}
+        for preceding_days, following_days in windows:
+            lo = np.maximum(rows - preceding_days, self._group_starts[rows])
+            hi = np.minimum(rows + following_days, self._group_ends[rows])
+            averages[f"moving_avg_{column}_{preceding_days}_{following_days}"] = (
+                self._get_average(
+                    sums=cumulative[hi + 1] - cumulative[lo],
+                    counts=hi - lo + 1,
+                    scale=scale,
+                )
+            )
+
+        df = self._df.loc[mask, ["coin_name", "currency", "date_key"]]
+        return df.assign(
+            **{column: self._to_float(units[mask], scale)}, **averages
+        ).reset_index(drop=True)
+
+    def get_volatility(
+        self,
+        column: ColumnsToAnalyzeEnum,
+        lag_to_row: int,
+        pairs: list[tuple[str, str]] | None,
+        start_date_key: str | None = None,
+        end_date_key: str | None = None,
+    ) -> pd.DataFrame:
+        """
+        ROUND((value - LAG(value)) / LAG(value) * 100, 2) of every row having lagged row
+
+        :param column: column to analyze
+        :param lag_to_row: how many rows to LAG back
+        :param pairs: (coin_name, currency) pairs, every pair if None
+        :param start_date_key: YYYYMMDD first day of returned rows, earlier rows still fill frames, no limit if None
+        :param end_date_key: YYYYMMDD last day of returned rows, later rows still fill frames, no limit if None
+        :return: DataFrame with column growth, coin_name, date_key and currency
+        """
+
+        mask = self._get_rows_mask(
+            pairs=pairs, start_date_key=start_date_key, end_date_key=end_date_key
+        ) & (self._positions >= lag_to_row)
+        growth = self._get_growth(
+            column=column, lag=lag_to_row, rows=np.flatnonzero(mask)
+        )
+
+        df = self._df.loc[mask, ["coin_name", "date_key", "currency"]]
+        return df.assign(**{f"{column}_growth": growth}).reset_index(drop=True)
+
+    def get_growth(
+        self,
+        column: ColumnsToAnalyzeEnum,
+        lags: list[int],
+        pairs: list[tuple[str, str]] | None,
+        start_date_key: str | None = None,
+        end_date_key: str | None = None,
+    ) -> pd.DataFrame:
+        """
+        Growth of every row over every lag, NaN where row has no lagged row
+
+        :param column: column to analyze
+        :param lags: how many rows to LAG back for every growth
+        :param pairs: (coin_name, currency) pairs, every pair if None
+        :param start_date_key: YYYYMMDD first day of returned rows, earlier rows still fill frames, no limit if None
+        :param end_date_key: YYYYMMDD last day of returned rows, later rows still fill frames, no limit if None
+        :return: DataFrame with coin_name, currency, date_key and {column}_growth_{lag} of every lag
+        """
+
+        mask = self._get_rows_mask(
+            pairs=pairs, start_date_key=start_date_key, end_date_key=end_date_key
+        )
+
+        growth = {}
+        for lag in lags:
+            growth_of_lag = np.full(np.count_nonzero(mask), np.nan)
+            has_lag = self._positions[mask] >= lag
+            growth_of_lag[has_lag] = self._get_growth(
+                column=column, lag=lag, rows=np.flatnonzero(mask)[has_lag]
+            )
+            growth[f"{column}_growth_{lag}"] = growth_of_lag
+
+        df = self._df.loc[mask, ["coin_name", "currency", "date_key"]]
+        return df.assign(**growth).reset_index(drop=True)
+
+    def get_monthly_analysis(self, pairs: list[tuple[str, str]] | None) -> pd.DataFrame:
+        """
+        Average price, volume and capitalization of every month of every pair
+
+        :param pairs: (coin_name, currency) pairs, every pair if None
+        :return: DataFrame with averages, year_month_key, coin_name and currency
+        """
+
+        mask = self._get_pairs_mask(pairs=pairs)
+        year_months = self._df["date_key"].to_numpy()[mask] // 100
+        df = self._df.loc[mask, ["coin_name", "currency"]].assign(
+            year_month=year_months
+        )
+
+        # months of every pair are contiguous because rows are ordered by date_key
+        group_ids = self._group_ids[mask]
+        is_start = np.r_[
+            True,
+            (group_ids[1:] != group_ids[:-1]) | (year_months[1:] != year_months[:-1]),
+        ]
+        starts = np.flatnonzero(is_start)
+        counts = np.diff(np.r_[starts, len(group_ids)])
+
+        df_monthly = df.iloc[starts].reset_index(drop=True)
+        averages = {}
+        for name, column in (
+            ("avg_price", ColumnsToAnalyzeEnum.price.value),
+            ("avg_volume", ColumnsToAnalyzeEnum.volume.value),
+            ("avg_capitalization", ColumnsToAnalyzeEnum.capitalization.value),
+        ):
+            units = self._get_units(column)
+            sums = FrameAnalyzer._fit(
+                units[mask], limit=FrameAnalyzer._get_sum_limit(units)
+            )
+            averages[name] = self._get_average(
+                sums=(np.add.reduceat(sums, starts) if len(starts) else sums[:0]),
+                counts=counts,
+                scale=self._get_scale(column),
+            )
+
+        return pd.DataFrame(
+            {
+                **averages,
+                "year_month_key": [
+                    f"{year_month // 100:04d}-{year_month % 100:02d}"
+                    for year_month in df_monthly["year_month"]
+                ],
+                "coin_name": df_monthly["coin_name"],
+                "currency": df_monthly["currency"],
+            }
+        )
+
+    def _get_growth(self, column: str, lag: int, rows: np.ndarray) -> np.ndarray:
+        """
+        ROUND((value - LAG(value)) / LAG(value) * 100, 2) of rows having lagged row
+
+        :param column: analyzed column
+        :param lag: how many rows to LAG back
+        :param rows: positions of rows, lagged row has to be in the same pair
+        :return: float growth, NaN where lagged value is zero
+        """
+
+        units = self._get_units(column)
+        current = units[rows]
+        previous = units[rows - lag]
+
+        # growth in hundredths of percent is 10^4 * (current - previous) / previous
+        numerators = FrameAnalyzer._fit(
+            current - previous,
+            limit=FrameAnalyzer._get_max_abs(units) * 2 * 10 ** (GROWTH_SCALE + 2),
+        ) * 10 ** (GROWTH_SCALE + 2)
+
+        # division by zero is NULL like in query
+        is_zero = previous == 0
+        denominators = np.where(is_zero, 1, previous)
+        growth = FrameAnalyzer._to_float(
+            FrameAnalyzer._divide_round(
+                numerators=np.where(denominators < 0, -numerators, numerators),
+                denominators=np.abs(denominators),
+            ),
+            GROWTH_SCALE,
+        )
+        growth[is_zero] = np.nan
+
+        return growth
+
+    def _get_rows_mask(
+        self,
+        pairs: list[tuple[str, str]] | None,
+        start_date_key: str | None = None,
+        end_date_key: str | None = None,
+    ) -> np.ndarray:
+        # mask only selects returned rows, windows and lags still read rows outside it
+        mask = self._get_pairs_mask(pairs=pairs)
+        date_keys = self._df["date_key"].to_numpy()
+        if start_date_key is not None:
+            mask &= date_keys >= int(start_date_key)
+        if end_date_key is not None:
+            mask &= date_keys <= int(end_date_key)
+
+        return mask
+
+    def _get_pairs_mask(self, pairs: list[tuple[str, str]] | None) -> np.ndarray:
+        if pairs is None:
+            return np.ones(len(self._df), dtype=bool)
+
+        return pd.MultiIndex.from_frame(self._df[list(CRYPTO_DATA_PAIR_COLUMNS)]).isin(
+            list(pairs)
+        )
+
+    def _get_units(self, column: str) -> np.ndarray:
+        """
+        Get column values as integers in units of column scale rounded like
+        MySQL rounds DOUBLE literals on insert into DECIMAL column
+
+        :param column: analyzed column
+        :return: int64 array, array of Python ints if values don't fit
+        """
+
+        if column not in self._units:
+            self._units[column] = FrameAnalyzer._to_units(
+                values=self._df[column].to_numpy(), scale=self._get_scale(column)
+            )
+
+        return self._units[column]
+
+    @staticmethod
+    def _get_scale(column: str) -> int:
+        return next(
+            scale for name, _, _, scale, _ in CRYPTO_DATA_COLUMNS if name == column
+        )
+
+    @staticmethod
+    def _to_units(values: np.ndarray, scale: int) -> np.ndarray:
+        """
+        Round values to scale half away from zero as decimal literals of their shortest repr
+
+        :param values: float values
+        :param scale: digits after decimal point
+        :return: int64 array, array of Python ints if values don't fit
+        """
+
+        scaled = values * 10**scale
+        units = np.round(scaled)
+
+        # float error of product matters only near half and for huge values
+        distance = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5)
+        inexact = (distance <= np.abs(scaled) * 1e-15 + 1e-9) | (
+            np.abs(scaled) >= 2**52
+        )
+        exact_units = [
+            int(
+                (Decimal(repr(float(value))) * 10**scale).quantize(
+                    Decimal(1), rounding=ROUND_HALF_UP
+                )
+            )
+            for value in values[inexact]
+        ]
+
+        if any(abs(value) >= INT64_LIMIT for value in exact_units):
+            units = np.array([int(value) for value in units], dtype=object)
+        else:
+            units = units.astype(np.int64)
+        units[inexact] = exact_units
+
+        return units
+
+    def _get_average(
+        self, sums: np.ndarray, counts: np.ndarray, scale: int
+    ) -> np.ndarray:
+        """
+        Get AVG like backend computes it from sums in units of scale
+
+        :param sums: sums of values in units of scale
+        :param counts: numbers of summed values
+        :param scale: digits after decimal point of values
+        :return: float averages
+        """
+
+        increment = self.dialect.div_precision_increment
+        if increment is None:
+            # DOUBLE average is the nearest float of exact mean
+            return FrameAnalyzer._divide_float(
+                numerators=sums, denominators=counts * 10**scale
+            )
+
+        numerators = FrameAnalyzer._fit(
+            sums, limit=FrameAnalyzer._get_max_abs(sums) * 2 * 10**increment
+        )
+        return FrameAnalyzer._to_float(
+            FrameAnalyzer._divide_round(
+                numerators=numerators * 10**increment, denominators=counts
+            ),
+            scale + increment,
+        )
+
+    @staticmethod
+    def _to_float(units: np.ndarray, scale: int) -> np.ndarray:
+        """
+        Get nearest float of every decimal value given in units of scale, like driver converts DECIMAL
+        """
+
+        return FrameAnalyzer._divide_float(
+            numerators=units, denominators=np.full(len(units), 10**scale)
+        )
+
+    @staticmethod
+    def _divide_float(numerators: np.ndarray, denominators: np.ndarray) -> np.ndarray:
+        """
+        Get nearest float of exact quotient of every pair of integers
+        """
+
+        if (
+            numerators.dtype != object
+            and FrameAnalyzer._get_max_abs(numerators) < 2**53
+            and FrameAnalyzer._get_max_abs(denominators) < 2**53
+        ):
+            # both operands are exact, so division is correctly rounded
+            return numerators.astype(np.float64) / denominators.astype(np.float64)
+
+        return np.array(
+            [
+                float(Fraction(int(numerator), int(denominator)))
+                for numerator, denominator in zip(numerators, denominators)
+            ],
+            dtype=np.float64,
+        )
+
+    @staticmethod
+    def _divide_round(numerators: np.ndarray, denominators: np.ndarray) -> np.ndarray:
+        """
+        Divide integers rounding half away from zero like MySQL DECIMAL arithmetic
+
+        :param numerators: integers
+        :param denominators: positive integers
+        :return: rounded quotients
+        """
+
+        quotients = (2 * np.abs(numerators) + denominators) // (2 * denominators)
+        return np.where(numerators < 0, -quotients, quotients)
+
+    @staticmethod
+    def _fit(units: np.ndarray, limit: int) -> np.ndarray:
+        # switch to Python ints before computation can overflow int64
+        if units.dtype != object and limit >= INT64_LIMIT:
+            return np.array([int(value) for value in units], dtype=object)
+        return units
+
+    @staticmethod
+    def _get_sum_limit(units: np.ndarray) -> int:
+        return FrameAnalyzer._get_max_abs(units) * max(len(units), 1)
+
+    @staticmethod
+    def _get_max_abs(units: np.ndarray) -> int:
+        return (
+            int(max(abs(int(units.max())), abs(int(units.min())))) if len(units) else 0
+        )
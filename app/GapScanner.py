@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta, timezone
+
+from app.DatabaseLoader import DatabaseLoader
+
+
+class GapScanner:
+    """Class for finding missing days in date_key series of every (coin, currency) pair"""
+
+    def __init__(self, db: DatabaseLoader, table_name: str):
+        self.db = db
+        self._table_name = table_name
+
+    def find_gaps(self) -> list[tuple[str, str, int, int]]:
+        """
+        Find ranges of missing days of every (coin, currency) pair with a single window function query
+
+        :return: list of (coin_name, currency, first_missing_date_key, last_missing_date_key)
+        """
+
+        SQL_QUERY = f"""
+            WITH OrderedData AS (
+                SELECT coin_name, currency, date_key,
+                LAG(date_key) OVER (
+                    PARTITION BY coin_name, currency
+                    ORDER BY date_key
+                ) AS previous_date_key
+                FROM {self._table_name}
+            )
+            SELECT coin_name, currency, previous_date_key, date_key
+            FROM OrderedData
+            WHERE previous_date_key IS NOT NULL
+            AND {self.db.dialect.days_between("date_key", "previous_date_key")} > 1
+            ORDER BY coin_name, currency, date_key;
+        """
+
+        rows = self.db.execute_query(query=SQL_QUERY) or []
+
+        gaps = []
+        for coin_name, currency, previous_date_key, date_key in rows:
+            # gap lasts from the day after previous present day up to the day before next present day
+            first_missing = GapScanner._shift_date_key(previous_date_key, days=1)
+            last_missing = GapScanner._shift_date_key(date_key, days=-1)
+            gaps.append((coin_name, currency, first_missing, last_missing))
+
+        return gaps
+
+    def get_gap_ranges(
+        self, merge_within_days: int = 7
+    ) -> list[tuple[str, str, int, int]]:
+        """
+        Get the smallest set of time ranges covering every gap
+
+        :param merge_within_days: gaps of one pair separated by no more than this
+            amount of present days are fetched with one request
+        :return: list of (coin_name, currency, from_timestamp, to_timestamp)
+        """
+
+        return GapScanner.merge_gaps(
+            gaps=self.find_gaps(), merge_within_days=merge_within_days
+        )
+
+    @staticmethod
+    def merge_gaps(
+        gaps: list[tuple[str, str, int, int]], merge_within_days: int = 7
+    ) -> list[tuple[str, str, int, int]]:
+        """
+        Merge close gaps of the same pair and convert them into UNIX timestamp ranges
+
+        :param gaps: list of (coin_name, currency, first_missing_date_key, last_missing_date_key)
+        :param merge_within_days: maximum amount of present days between gaps to merge them
+        :return: list of (coin_name, currency, from_timestamp, to_timestamp)
+        """
+
+        merged: list[list] = []
+
+        for coin_name, currency, first_missing, last_missing in sorted(gaps):
+            start = GapScanner._date_key_to_datetime(first_missing)
+            end = GapScanner._date_key_to_datetime(last_missing)
+
+            # extend previous range of the same pair if gap is close enough
+            if merged and merged[-1][:2] == [coin_name, currency]:
+                present_days = (start - merged[-1][3]).days - 1
+                if present_days <= merge_within_days:
+                    merged[-1][3] = max(merged[-1][3], end)
+                    continue
+
+            merged.append([coin_name, currency, start, end])
+
+        # range covers every second of first and last missing days
+        return [
+            (
+                coin_name,
+                currency,
+                int(start.timestamp()),
+                int((end + timedelta(days=1)).timestamp()) - 1,
+            )
+            for coin_name, currency, start, end in merged
+        ]
+
+    @staticmethod
+    def _date_key_to_datetime(date_key: int) -> datetime:
+        """
+        Convert YYYYMMDD date key into UTC datetime
+
+        :param date_key: date key in YYYYMMDD format
+        :return: datetime of the start of the day
+        """
+
+        return datetime.strptime(str(date_key), "%Y%m%d").replace(tzinfo=timezone.utc)
+
+    @staticmethod
+    def _shift_date_key(date_key: int, days: int) -> int:
+        """
+        Shift YYYYMMDD date key by given amount of days
+
+        :param date_key: date key in YYYYMMDD format
+        :param days: amount of days to shift by
+        :return: shifted date key
+        """
+
+        date = GapScanner._date_key_to_datetime(date_key) + timedelta(days=days)
+        return int(date.strftime("%Y%m%d"))
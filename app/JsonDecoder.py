@@ -0,0 +1,82 @@
+import asyncio
+import json
+from concurrent.futures import Executor
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# series of market_chart responses made of [timestamp, value] pairs
+SERIES_KEYS = ("prices", "total_volumes", "market_caps")
+
+
+def decode_json(body: bytes, to_numpy: bool = False) -> any:
+    """
+    Decode JSON body using orjson when it is installed.
+    Defined on module level so it can be sent to process pool.
+
+    :param body: raw response body
+    :param to_numpy: convert market_chart series into (n, 2) float64 NumPy arrays
+    :return: decoded data
+    """
+
+    data = orjson.loads(body) if orjson is not None else json.loads(body)
+
+    if to_numpy and isinstance(data, dict):
+        for key in SERIES_KEYS:
+            if key in data:
+                data[key] = np.asarray(data[key], dtype=np.float64).reshape(-1, 2)
+
+    return data
+
+
+class JsonDecoder:
+    """
+    Pluggable JSON decoder which decodes large bodies off the event loop.
+    """
+
+    def __init__(
+        self,
+        to_numpy: bool = False,
+        offload_threshold: int = 256 * 1024,
+        executor: Executor | None = None,
+    ):
+        """
+        :param to_numpy: convert market_chart series into NumPy arrays
+        :param offload_threshold: bodies of this size in bytes and bigger are
+            decoded in executor instead of the event loop
+        :param executor: thread or process pool executor, default thread pool if None
+        """
+
+        self.to_numpy = to_numpy
+        self.offload_threshold = offload_threshold
+        self.executor = executor
+
+    def decode(self, body: bytes) -> any:
+        """
+        Decode body on the calling thread.
+
+        :param body: raw response body
+        :return: decoded data
+        """
+
+        return decode_json(body, self.to_numpy)
+
+    async def decode_async(self, body: bytes) -> any:
+        """
+        Decode body, moving large bodies to executor.
+
+        :param body: raw response body
+        :return: decoded data
+        """
+
+        if len(body) < self.offload_threshold:
+            return self.decode(body)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, decode_json, body, self.to_numpy
+        )
@@ -0,0 +1,302 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Engine
+from sqlalchemy.exc import DBAPIError
+
+from app.BulkLoader import BulkLoader
+from app.SqlDialect import CRYPTO_DATA_PAIR_COLUMNS, SqlDialect
+
+# MySQL deadlock and lock wait timeout
+RETRYABLE_ERROR_CODES = (1213, 1205)
+
+
+class ParallelLoader:
+    """
+    Loader which splits DataFrame into partitions by (coin_name, currency) pair
+    or by date_key range and writes them concurrently, every worker through
+    its own connection from engine pool.
+    """
+
+    PARTITIONS = ("pair", "date")
+
+    def __init__(
+        self,
+        engine: Engine,
+        dialect: SqlDialect | None = None,
+        workers: int = 4,
+        partition_by: str = "pair",
+        strategy: str = "auto",
+        max_retries: int = 3,
+        backoff_base: float = 0.2,
+        track_changes: bool = False,
+    ):
+        """
+        :param engine: SQLAlchemy engine with pool of at least workers connections
+        :param dialect: SQL dialect of backend, MySQL if None
+        :param workers: number of partitions loaded at the same time
+        :param partition_by: "pair" or "date"
+        :param strategy: bulk load strategy of every partition
+        :param max_retries: retries of partition on deadlock or lock wait timeout
+        :param backoff_base: base delay of exponential backoff between retries in seconds
+        :param track_changes: report keys and pairs of changed rows, see BulkLoader
+        """
+
+        if partition_by not in self.PARTITIONS:
+            raise ValueError(f"Unknown partitioning: {partition_by}")
+
+        self.engine = engine
+        self.dialect = dialect or SqlDialect()
+        self.workers = ParallelLoader._get_pool_workers(engine=engine, workers=workers)
+        self.partition_by = partition_by
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        # one loader is shared by every worker, its learned strategy is guarded by lock
+        self.bulk_loader = BulkLoader(
+            engine=engine,
+            dialect=self.dialect,
+            strategy=strategy,
+            verbose=False,
+            track_changes=track_changes,
+        )
+
+    def load(
+        self,
+        df: pd.DataFrame,
+        table_name: str,
+        mode: str = "ignore",
+        workers: int | None = None,
+        strategy: str | None = None,
+    ) -> dict[str, any]:
+        """
+        Load partitions of DataFrame concurrently
+
+        :param df: DataFrame to load
+        :param table_name: table name where to load
+        :param mode: load mode of BulkLoader
+        :param workers: overrides number of workers given in constructor
+        :param strategy: overrides bulk load strategy given in constructor
+        :return: load statistics, errors of failed partitions are listed in "errors"
+        """
+
+        workers = ParallelLoader._get_pool_workers(
+            engine=self.engine, workers=workers or self.workers
+        )
+        partitions = self.split(df=df, partitions=workers)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(
+                executor.map(
+                    lambda df_partition: self._load_partition(
+                        df=df_partition,
+                        table_name=table_name,
+                        mode=mode,
+                        strategy=strategy,
+                    ),
+                    partitions,
+                )
+            )
+        seconds = time.perf_counter() - started
+
+        loaded = [result for result in results if result["error"] is None]
+        stats = {
+            "workers": workers,
+            "partitions": len(partitions),
+            "rows": sum(result["rows"] for result in loaded),
+            "seconds": seconds,
+            "rows_per_sec": 0.0,
+            "retries": sum(result["retries"] for result in results),
+            "failed": len(results) - len(loaded),
+            "errors": [result["error"] for result in results if result["error"]],
+            # failed partitions may have committed some chunks, so they count as changed
+            "changed_keys": [
+                df_keys for result in results for df_keys in result["changed_keys"]
+            ],
+            "changed_pairs": set().union(
+                *(result["changed_pairs"] for result in results)
+            ),
+        }
+        if seconds:
+            stats["rows_per_sec"] = stats["rows"] / seconds
+
+        for result in results:
+            if result["error"] is not None:
+                print(
+                    f"Error. Unable to load partition into {table_name}: {result['error']}"
+                )
+
+        print(
+            f"Success. Loaded {stats['rows']} records into {table_name} "
+            f"with {workers} workers in {seconds:.2f}s "
+            f"({stats['rows_per_sec']:.0f} rows/s, {stats['partitions']} partitions, "
+            f"{stats['retries']} retries, {stats['failed']} failed)"
+        )
+
+        return stats
+
+    def benchmark(
+        self,
+        df: pd.DataFrame,
+        table_name: str,
+        worker_counts: list[int] = (1, 2, 4, 8),
+    ) -> pd.DataFrame:
+        """
+        Measure throughput of loading DataFrame with different number of workers.
+        Rows are loaded into empty scratch copy of table which is dropped afterwards.
+
+        :param df: DataFrame to load
+        :param table_name: table whose structure is copied
+        :param worker_counts: numbers of workers to measure
+        :return: DataFrame with workers, seconds and rows_per_sec columns
+        """
+
+        scratch_table = f"{table_name}_benchmark"
+        results = []
+
+        with self.engine.connect() as conn:
+            conn.exec_driver_sql(
+                self.dialect.copy_table_sql(
+                    new_table=scratch_table, table_name=table_name
+                )
+            )
+            conn.commit()
+
+        try:
+            for workers in worker_counts:
+                with self.engine.connect() as conn:
+                    conn.exec_driver_sql(self.dialect.truncate_table_sql(scratch_table))
+                    conn.commit()
+
+                stats = self.load(df=df, table_name=scratch_table, workers=workers)
+                results.append(
+                    {
+                        "workers": stats["workers"],
+                        "seconds": stats["seconds"],
+                        "rows_per_sec": stats["rows_per_sec"],
+                    }
+                )
+        finally:
+            with self.engine.connect() as conn:
+                conn.exec_driver_sql(self.dialect.drop_table_sql(scratch_table))
+                conn.commit()
+
+        return pd.DataFrame(results)
+
+    def split(self, df: pd.DataFrame, partitions: int) -> list[pd.DataFrame]:
+        """
+        Split DataFrame into partitions with disjoint primary key ranges
+
+        :param df: DataFrame to split
+        :param partitions: wanted number of partitions for date_key ranges
+        :return: list of non empty DataFrames
+        """
+
+        if df.empty:
+            return []
+
+        if self.partition_by == "pair":
+            return [
+                df_pair
+                for _, df_pair in df.groupby(
+                    ["coin_name", "currency"], observed=True, sort=False
+                )
+            ]
+
+        # date_key ranges with about the same number of rows, one day never spans two ranges
+        date_keys = df["date_key"].to_numpy()
+        bounds = np.unique(
+            np.quantile(date_keys, np.linspace(0, 1, partitions + 1)[1:-1])
+        )
+        range_ids = np.searchsorted(bounds, date_keys, side="right")
+
+        return [df_range for _, df_range in df.groupby(range_ids, sort=True)]
+
+    def _load_partition(
+        self, df: pd.DataFrame, table_name: str, mode: str, strategy: str | None
+    ) -> dict[str, any]:
+        """
+        Load partition retrying it on deadlock or lock wait timeout.
+        Every load mode skips or overwrites rows committed by failed attempt.
+
+        :param df: partition to load
+        :param table_name: table name where to load
+        :param mode: load mode of BulkLoader
+        :param strategy: bulk load strategy, BulkLoader default if None
+        :return: loaded rows, retries, error, changed keys and (coin_name, currency) pairs
+        """
+
+        # keys of rows which may have been committed by failed attempt
+        partition_keys = {"changed_keys": [], "changed_pairs": set()}
+        if self.bulk_loader.track_changes:
+            partition_keys = {
+                "changed_keys": [df[list(self.bulk_loader.key_columns)]],
+                "changed_pairs": set(
+                    df[list(CRYPTO_DATA_PAIR_COLUMNS)]
+                    .drop_duplicates()
+                    .itertuples(index=False, name=None)
+                ),
+            }
+
+        retries = 0
+        while True:
+            try:
+                stats = self.bulk_loader.load(
+                    df=df, table_name=table_name, strategy=strategy, mode=mode
+                )
+                # rows committed by failed attempts look unchanged to the last one
+                if retries:
+                    return {
+                        "rows": stats["rows"],
+                        "retries": retries,
+                        "error": None,
+                        **partition_keys,
+                    }
+
+                return {
+                    "rows": stats["rows"],
+                    "retries": retries,
+                    "error": None,
+                    "changed_keys": stats["changed_keys"],
+                    "changed_pairs": stats["changed_pairs"],
+                }
+
+            except DBAPIError as e:
+                if (
+                    ParallelLoader._get_error_code(e) not in RETRYABLE_ERROR_CODES
+                    or retries >= self.max_retries
+                ):
+                    return {"rows": 0, "retries": retries, "error": e, **partition_keys}
+
+                # full jitter so conflicting workers don't retry at the same time
+                time.sleep(random.uniform(0, self.backoff_base * 2**retries))
+                retries += 1
+
+            except Exception as e:
+                return {"rows": 0, "retries": retries, "error": e, **partition_keys}
+
+    @staticmethod
+    def _get_error_code(error: DBAPIError) -> int | None:
+        args = getattr(error.orig, "args", None)
+        if args and isinstance(args[0], int):
+            return args[0]
+
+        return None
+
+    @staticmethod
+    def _get_pool_workers(engine: Engine, workers: int) -> int:
+        """
+        Limit workers to size of engine pool so they don't wait for connections
+        """
+
+        pool_size = getattr(engine.pool, "size", None)
+        if callable(pool_size):
+            size = pool_size()
+            if isinstance(size, int) and 0 < size < workers:
+                print(f"Workers are limited to pool size {size}")
+                return size
+
+        return max(1, workers)
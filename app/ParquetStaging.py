@@ -0,0 +1,327 @@
+import os
+import uuid
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.consts import STAGING_DIR
+from app.JsonDecoder import SERIES_KEYS
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+
+class ParquetStaging:
+    """
+    Staging lake keeping raw API payloads and normalized data of every run
+    as Parquet files partitioned by coin_name/currency/month.
+    """
+
+    RAW_DIR = "raw"
+    NORMALIZED_DIR = "normalized"
+
+    def __init__(self, root_dir: str = STAGING_DIR):
+        if pa is None:
+            raise ImportError(
+                "pyarrow is required for Parquet staging. Install it with `pip install pyarrow`."
+            )
+
+        self.root_dir = Path(root_dir)
+        self._partitioning = ds.partitioning(
+            pa.schema(
+                [
+                    ("coin_name", pa.string()),
+                    ("currency", pa.string()),
+                    ("month", pa.int32()),
+                ]
+            ),
+            flavor="hive",
+        )
+
+    def write_raw(
+        self,
+        data: list[dict[str, any]],
+        coins_data: list[tuple[str, str]],
+        run_id: str | None = None,
+    ) -> str:
+        """
+        Write raw API payloads as long table of (series, timestamp, value)
+
+        :param data: fetched data aligned with coins_data
+        :param coins_data: (coin_name, currency) pairs of fetched data
+        :param run_id: identifier of the run, generated if None
+        :return: run identifier
+        """
+
+        run_id = run_id or ParquetStaging._make_run_id()
+        frames = []
+
+        for coin_data, (coin_name, currency) in zip(data, coins_data):
+            for series in SERIES_KEYS:
+                values = np.asarray(
+                    coin_data.get(series, []) if coin_data else [], dtype=np.float64
+                ).reshape(-1, 2)
+                if len(values) == 0:
+                    continue
+
+                timestamps = values[:, 0].astype(np.int64)
+                frames.append(
+                    pd.DataFrame(
+                        {
+                            "series": series,
+                            "timestamp": timestamps,
+                            "value": values[:, 1],
+                            "run_id": run_id,
+                            "coin_name": coin_name,
+                            "currency": currency,
+                            "month": ParquetStaging._timestamps_to_months(timestamps),
+                        }
+                    )
+                )
+
+        if frames:
+            self._write(pd.concat(frames), directory=self.RAW_DIR, run_id=run_id)
+
+        return run_id
+
+    def write_normalized(self, df: pd.DataFrame, run_id: str | None = None) -> str:
+        """
+        Write normalized DataFrame returned by CryptoTransformer
+
+        :param df: normalized DataFrame
+        :param run_id: identifier of the run, generated if None
+        :return: run identifier
+        """
+
+        run_id = run_id or ParquetStaging._make_run_id()
+        if df.empty:
+            return run_id
+
+        df = df.astype({"coin_name": str, "currency": str}).assign(
+            run_id=run_id, month=(df["date_key"] // 100).astype(np.int32)
+        )
+        self._write(df, directory=self.NORMALIZED_DIR, run_id=run_id)
+
+        return run_id
+
+    def read_normalized(
+        self,
+        coins: list[str] | None = None,
+        currencies: list[str] | None = None,
+        months: list[int] | None = None,
+        run_id: str | None = None,
+    ) -> pd.DataFrame:
+        """
+        Read normalized data loading only partitions matching filters
+
+        :param coins: coin names to read, every coin if None
+        :param currencies: currencies to read, every currency if None
+        :param months: YYYYMM months to read, every month if None
+        :param run_id: run to read, every run if None
+        :return: normalized DataFrame
+        """
+
+        frames = list(
+            self.iter_normalized(
+                coins=coins, currencies=currencies, months=months, run_id=run_id
+            )
+        )
+        if not frames:
+            return pd.DataFrame([])
+
+        df = pd.concat(frames, ignore_index=True)
+        return df.astype({"coin_name": "category", "currency": "category"})
+
+    def iter_normalized(
+        self,
+        coins: list[str] | None = None,
+        currencies: list[str] | None = None,
+        months: list[int] | None = None,
+        run_id: str | None = None,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Lazily iterate over record batches of normalized data matching filters
+
+        :param coins: coin names to read, every coin if None
+        :param currencies: currencies to read, every currency if None
+        :param months: YYYYMM months to read, every month if None
+        :param run_id: run to read, every run if None
+        :return: iterator of DataFrames
+        """
+
+        dataset = self._get_dataset(self.NORMALIZED_DIR)
+        if dataset is None:
+            return
+
+        scan_filter = ParquetStaging._make_filter(coins, currencies, months, run_id)
+        for batch in dataset.to_batches(filter=scan_filter):
+            if batch.num_rows:
+                yield batch.to_pandas().drop(columns=["month", "run_id"])
+
+    def read_raw(
+        self,
+        coins: list[str] | None = None,
+        currencies: list[str] | None = None,
+        months: list[int] | None = None,
+        run_id: str | None = None,
+    ) -> tuple[list[dict[str, np.ndarray]], list[tuple[str, str]]]:
+        """
+        Read raw payloads matching filters back in the shape returned by API,
+        so they can be replayed through CryptoTransformer
+
+        :param coins: coin names to read, every coin if None
+        :param currencies: currencies to read, every currency if None
+        :param months: YYYYMM months to read, every month if None
+        :param run_id: run to read, every run if None, then point fetched
+            by several runs gets value of the latest written one
+        :return: payloads with (n, 2) series arrays and matching coins_data
+        """
+
+        dataset = self._get_dataset(self.RAW_DIR)
+        if dataset is None:
+            return [], []
+
+        # every run writes its own files, so later file holds later value of point
+        file_ranks = {
+            path: rank
+            for rank, path in enumerate(
+                sorted(dataset.files, key=lambda f: (os.stat(f).st_mtime_ns, f))
+            )
+        }
+
+        # points of every (coin_name, currency, series) are collected batch by batch
+        points: dict[tuple[str, str], dict[str, list[tuple]]] = {}
+        scan_filter = ParquetStaging._make_filter(coins, currencies, months, run_id)
+        for fragment in dataset.get_fragments(filter=scan_filter):
+            for batch in fragment.to_batches(
+                schema=dataset.schema,
+                columns=["coin_name", "currency", "series", "timestamp", "value"],
+                filter=scan_filter,
+            ):
+                if not batch.num_rows:
+                    continue
+
+                df = batch.to_pandas()
+                for (coin_name, currency, series), df_group in df.groupby(
+                    ["coin_name", "currency", "series"], observed=True, sort=False
+                ):
+                    points.setdefault((coin_name, currency), {}).setdefault(
+                        series, []
+                    ).append(
+                        (
+                            df_group["timestamp"].to_numpy(dtype=np.int64),
+                            df_group["value"].to_numpy(),
+                            file_ranks[fragment.path],
+                        )
+                    )
+
+        data, coins_data = [], []
+        for pair in sorted(points):
+            data.append(
+                {
+                    series: ParquetStaging._make_series(points[pair].get(series, []))
+                    for series in SERIES_KEYS
+                }
+            )
+            coins_data.append(pair)
+
+        return data, coins_data
+
+    def _write(self, df: pd.DataFrame, directory: str, run_id: str):
+        """
+        Write DataFrame into partitioned dataset
+
+        :param df: DataFrame with partition columns
+        :param directory: dataset directory inside root directory
+        :param run_id: identifier of the run used in file names
+        """
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_to_dataset(
+            table,
+            root_path=str(self.root_dir / directory),
+            partitioning=self._partitioning,
+            basename_template=f"part-{run_id}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+
+    def _get_dataset(self, directory: str):
+        path = self.root_dir / directory
+        if not path.exists():
+            return None
+
+        return ds.dataset(str(path), format="parquet", partitioning=self._partitioning)
+
+    @staticmethod
+    def _make_filter(
+        coins: list[str] | None,
+        currencies: list[str] | None,
+        months: list[int] | None,
+        run_id: str | None,
+    ):
+        """
+        Build dataset filter, conditions on partition columns prune whole directories
+        """
+
+        conditions = []
+        if coins is not None:
+            conditions.append(ds.field("coin_name").isin(coins))
+        if currencies is not None:
+            conditions.append(ds.field("currency").isin(currencies))
+        if months is not None:
+            conditions.append(ds.field("month").isin(months))
+        if run_id is not None:
+            conditions.append(ds.field("run_id") == run_id)
+
+        scan_filter = None
+        for condition in conditions:
+            scan_filter = condition if scan_filter is None else scan_filter & condition
+
+        return scan_filter
+
+    @staticmethod
+    def _make_series(parts: list[tuple[np.ndarray, np.ndarray, int]]) -> np.ndarray:
+        """
+        Build (n, 2) series array ordered by timestamp keeping the latest written value of every point
+
+        :param parts: timestamps, values and file rank of every read part
+        :return: series array
+        """
+
+        if not parts:
+            return np.empty((0, 2), dtype=np.float64)
+
+        timestamps = np.concatenate([part[0] for part in parts])
+        values = np.concatenate([part[1] for part in parts])
+        ranks = np.concatenate(
+            [np.full(len(part[0]), part[2], dtype=np.int64) for part in parts]
+        )
+
+        order = np.lexsort((ranks, timestamps))
+        timestamps, values = timestamps[order], values[order]
+        is_last = np.r_[timestamps[1:] != timestamps[:-1], True]
+
+        return np.column_stack(
+            (timestamps[is_last].astype(np.float64), values[is_last])
+        )
+
+    @staticmethod
+    def _timestamps_to_months(timestamps: np.ndarray) -> np.ndarray:
+        """
+        Convert millisecond timestamps into YYYYMM integers
+        """
+
+        months = timestamps.astype("datetime64[ms]").astype("datetime64[M]")
+        months = months.astype(np.int64)
+
+        return (months // 12 + 1970) * 100 + months % 12 + 1
+
+    @staticmethod
+    def _make_run_id() -> str:
+        return uuid.uuid4().hex
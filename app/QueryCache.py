@@ -0,0 +1,232 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+
+class QueryCache:
+    """
+    Cache of analytic query results with LRU eviction by total size.
+
+    Frames are kept in memory and, if cache_dir is given, pickled to disk so
+    following runs reuse them. Key contains data version token of queried
+    pairs, so results are never returned after their rows have been reloaded.
+    Files missing from the saved index (e.g. written before a crash) are
+    adopted on start.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(
+        self,
+        max_bytes: int = 256 * 1024 * 1024,
+        cache_dir: str | None = None,
+        max_disk_bytes: int = 1024 * 1024 * 1024,
+    ):
+        """
+        :param max_bytes: memory limit of cached frames
+        :param cache_dir: directory of on-disk store, memory only if None
+        :param max_disk_bytes: size limit of on-disk store
+        """
+
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, tuple[pd.DataFrame, int]] = OrderedDict()
+        self._memory_bytes = 0
+        self._index: dict[str, dict[str, float | int]] = self._load_index()
+
+    def get(self, query: str, version: any) -> pd.DataFrame | None:
+        """
+        Get cached query result
+
+        :param query: executed query
+        :param version: data version token of queried pairs
+        :return: copy of cached DataFrame or None if it is absent
+        """
+
+        key = QueryCache.make_key(query=query, version=version)
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key][0].copy()
+
+            df = self._read(key)
+            if df is None:
+                self.misses += 1
+                return None
+
+            # keep frame read from disk in memory for following requests
+            self._set_memory(key=key, df=df)
+            self.hits += 1
+            return df.copy()
+
+    def set(self, query: str, version: any, df: pd.DataFrame):
+        """
+        Save query result and evict least recently used entries above size limits
+
+        :param query: executed query
+        :param version: data version token of queried pairs
+        :param df: query result
+        """
+
+        key = QueryCache.make_key(query=query, version=version)
+        df = df.copy()
+
+        with self._lock:
+            self._set_memory(key=key, df=df)
+            self._write(key=key, df=df)
+
+    def flush(self):
+        """
+        Save index of on-disk store
+        """
+
+        if self.cache_dir is None:
+            return
+
+        with self._lock:
+            (self.cache_dir / self.INDEX_FILE).write_text(json.dumps(self._index))
+
+    def get_report(self) -> dict[str, int | float]:
+        """
+        Get cache statistics
+
+        :return: dictionary with hits, misses, hit ratio, evictions, entries and sizes in bytes
+        """
+
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / requests if requests else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_entries": len(self._index),
+            "disk_bytes": self._get_disk_bytes(),
+        }
+
+    @staticmethod
+    def make_key(query: str, version: any) -> str:
+        """
+        Make cache key from query with normalized whitespace and data version token
+
+        :param query: executed query
+        :param version: JSON serializable data version token
+        :return: hex digest of key
+        """
+
+        raw_key = json.dumps([" ".join(query.split()), version])
+        return hashlib.sha256(raw_key.encode()).hexdigest()
+
+    def _set_memory(self, key: str, df: pd.DataFrame):
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        # frame bigger than the whole cache would evict everything else
+        if size > self.max_bytes:
+            return
+
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key)[1]
+        self._memory[key] = (df, size)
+        self._memory_bytes += size
+
+        while self._memory_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+            self.evictions += 1
+
+    def _read(self, key: str) -> pd.DataFrame | None:
+        if self.cache_dir is None or key not in self._index:
+            return None
+
+        try:
+            df = pd.read_pickle(self._get_path(key))
+        except (OSError, ValueError, EOFError):
+            self._remove(key)
+            return None
+
+        self._index[key]["last_access"] = time.time()
+        return df
+
+    def _write(self, key: str, df: pd.DataFrame):
+        if self.cache_dir is None:
+            return
+
+        # file is renamed into place, so a crash never leaves a truncated pickle
+        path = self._get_path(key)
+        tmp_path = path.with_suffix(".tmp")
+        df.to_pickle(tmp_path)
+        tmp_path.replace(path)
+        self._index[key] = {"size": path.stat().st_size, "last_access": time.time()}
+        self._evict_disk()
+
+    def _evict_disk(self):
+        """
+        Remove least recently used files until total size fits max_disk_bytes
+        """
+
+        total_bytes = self._get_disk_bytes()
+        if total_bytes <= self.max_disk_bytes:
+            return
+
+        for key in sorted(self._index, key=lambda k: self._index[k]["last_access"]):
+            if total_bytes <= self.max_disk_bytes:
+                break
+            total_bytes -= self._index[key]["size"]
+            self._remove(key)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        self._index.pop(key, None)
+        self._get_path(key).unlink(missing_ok=True)
+
+    def _get_disk_bytes(self) -> int:
+        return sum(entry["size"] for entry in self._index.values())
+
+    def _get_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pkl"
+
+    def _load_index(self) -> dict[str, dict[str, float | int]]:
+        """
+        Load index of on-disk store dropping entries without files and adopting files without entries
+        """
+
+        if self.cache_dir is None:
+            return {}
+
+        try:
+            index = json.loads((self.cache_dir / self.INDEX_FILE).read_text())
+        except (OSError, ValueError):
+            index = {}
+
+        # writes interrupted before rename
+        for tmp_path in self.cache_dir.glob("*.tmp"):
+            tmp_path.unlink(missing_ok=True)
+
+        loaded_index = {}
+        for path in self.cache_dir.glob("*.pkl"):
+            key = path.stem
+            if key in index:
+                loaded_index[key] = index[key]
+                continue
+
+            stat = path.stat()
+            loaded_index[key] = {"size": stat.st_size, "last_access": stat.st_mtime}
+
+        return loaded_index
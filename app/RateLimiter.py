@@ -0,0 +1,139 @@
+import asyncio
+import time
+
+
+class RateLimiter:
+    """
+    Requests-per-minute token bucket combined with AIMD-adjusted concurrency.
+
+    Concurrency starts at max_concurrent, is halved (multiplicative decrease) on
+    every rate limit response and grows back by roughly one slot per window of
+    successful requests (additive increase).
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int | None = None,
+        burst: int | None = None,
+        max_concurrent: int = 3,
+        min_concurrent: int = 1,
+        decrease_factor: float = 0.5,
+    ):
+        # token bucket settings, None means that request rate is not limited
+        self._rate: float | None = (
+            requests_per_minute / 60 if requests_per_minute else None
+        )
+        self._capacity = float(burst or max_concurrent)
+        self._tokens = self._capacity
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._bucket_lock = asyncio.Lock()
+
+        # AIMD concurrency settings
+        self.max_concurrent = max_concurrent
+        self.min_concurrent = min(min_concurrent, max_concurrent)
+        self.concurrency_limit = float(max_concurrent)
+        self._decrease_factor = decrease_factor
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> float:
+        """
+        Wait for a free concurrency slot and a token.
+
+        :return: seconds spent waiting
+        """
+
+        started = time.monotonic()
+
+        # wait for a free slot under current concurrency limit
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: self._in_flight < int(self.concurrency_limit)
+            )
+            self._in_flight += 1
+
+        try:
+            await self._take_token()
+        except BaseException:
+            await self.release()
+            raise
+
+        return time.monotonic() - started
+
+    async def release(self):
+        """
+        Free concurrency slot taken by acquire().
+        """
+
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        """
+        Additively increase concurrency after successful request.
+        """
+
+        self.concurrency_limit = min(
+            self.max_concurrent,
+            self.concurrency_limit + 1 / self.concurrency_limit,
+        )
+
+    def on_rate_limited(self, retry_after: float | None = None):
+        """
+        Multiplicatively decrease concurrency and pause all requests.
+
+        :param retry_after: seconds to pause requests for, taken from Retry-After header
+        """
+
+        now = time.monotonic()
+
+        # decrease only once per rate limit window not to collapse on burst of 429
+        if now >= self._paused_until:
+            self.concurrency_limit = max(
+                self.min_concurrent, self.concurrency_limit * self._decrease_factor
+            )
+
+        # drop accumulated tokens and pause bucket
+        self._tokens = 0.0
+        self._last_refill = now
+        if retry_after:
+            self._paused_until = max(self._paused_until, now + retry_after)
+
+    async def _take_token(self):
+        """
+        Wait until token bucket has a token and take it.
+        """
+
+        async with self._bucket_lock:
+            while True:
+                now = time.monotonic()
+
+                # respect pause requested by server
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                # rate is not limited
+                if self._rate is None:
+                    return
+
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                # sleep until next token is available
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+    def _refill(self, now: float):
+        """
+        Add tokens accumulated since the last refill.
+
+        :param now: current monotonic time
+        """
+
+        elapsed = now - self._last_refill
+        self._tokens = min(self._capacity, self._tokens + elapsed * self._rate)
+        self._last_refill = now
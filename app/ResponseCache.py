@@ -0,0 +1,246 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+
+from app.consts import CACHE_DIR
+
+SECONDS_IN_DAY = 86400
+
+
+class ResponseCache:
+    """
+    Persistent on-disk cache of API responses with LRU eviction by total size.
+
+    Responses of ranges ending exactly at the start of a past day are kept forever,
+    other responses may still change and expire after open_day_ttl seconds. Files missing
+    from the saved index (e.g. written before a crash) are adopted on start.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(
+        self,
+        cache_dir: str = CACHE_DIR,
+        max_bytes: int = 512 * 1024 * 1024,
+        open_day_ttl: int = 3600,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.open_day_ttl = open_day_ttl
+
+        # statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._index: dict[str, dict[str, float | int | None]] = self._load_index()
+
+    def get(self, url: str, params: dict) -> bytes | None:
+        """
+        Get cached response body
+
+        :param url: base url
+        :param params: dictionary with keys and values of url params
+        :return: cached raw response body or None if it is absent or expired
+        """
+
+        key = ResponseCache.make_key(url=url, params=params)
+
+        with self._lock:
+            entry = self._index.get(key)
+
+            # check if entry exists and is not expired
+            if entry is None or (
+                entry["expires_at"] is not None and entry["expires_at"] < time.time()
+            ):
+                self.misses += 1
+                return None
+
+            try:
+                body = self._get_path(key).read_bytes()
+            except OSError:
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            entry["last_access"] = time.time()
+            self.hits += 1
+            return body
+
+    def set(self, url: str, params: dict, body: bytes):
+        """
+        Save response body into cache and evict least recently used entries above size limit
+
+        :param url: base url
+        :param params: dictionary with keys and values of url params
+        :param body: raw response body to cache
+        """
+
+        key = ResponseCache.make_key(url=url, params=params)
+
+        # closed days never change, only the open day gets TTL
+        now = time.time()
+        expires_at = (
+            None
+            if ResponseCache._is_closed_range(params=params, now=now)
+            else now + self.open_day_ttl
+        )
+
+        with self._lock:
+            # file is renamed into place, so a crash never leaves a truncated body
+            path = self._get_path(key)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(body)
+            tmp_path.replace(path)
+            self._index[key] = {
+                "size": len(body),
+                "last_access": now,
+                "expires_at": expires_at,
+            }
+            self._evict()
+
+    def flush(self):
+        """
+        Save cache index to disk
+        """
+
+        with self._lock:
+            (self.cache_dir / self.INDEX_FILE).write_text(json.dumps(self._index))
+
+    def get_report(self) -> dict[str, int | float]:
+        """
+        Get cache statistics
+
+        :return: dictionary with hits, misses, hit ratio, entries and total size in bytes
+        """
+
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / requests if requests else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._index),
+            "total_bytes": self._get_total_bytes(),
+        }
+
+    @staticmethod
+    def make_key(url: str, params: dict) -> str:
+        """
+        Make cache key from normalized url and params, time range is kept exact
+
+        :param url: base url
+        :param params: dictionary with keys and values of url params
+        :return: hex digest of normalized request
+        """
+
+        # normalize url
+        parts = urlsplit(url)
+        normalized_url = urlunsplit(
+            (parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), "", "")
+        )
+
+        # responses of different bounds differ even inside one day
+        normalized_params = {str(k): str(v) for k, v in params.items()}
+        for bound in ("from", "to"):
+            if bound in params:
+                normalized_params[bound] = str(int(params[bound]))
+
+        raw_key = json.dumps([normalized_url, sorted(normalized_params.items())])
+        return hashlib.sha256(raw_key.encode()).hexdigest()
+
+    @staticmethod
+    def _is_closed_range(params: dict, now: float) -> bool:
+        """
+        Check if requested time range ends at the start of a day before the current (open) day
+
+        :param params: dictionary with keys and values of url params
+        :param now: current UNIX timestamp
+        :return: True if response can't change anymore
+        """
+
+        if "to" not in params:
+            return False
+
+        # range ending inside a day may get later points of that day on the next request
+        to = int(params["to"])
+        if to % SECONDS_IN_DAY:
+            return False
+
+        today_start = datetime.fromtimestamp(now, tz=timezone.utc).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        return to <= today_start.timestamp()
+
+    def _evict(self):
+        """
+        Remove least recently used entries until total size fits max_bytes
+        """
+
+        total_bytes = self._get_total_bytes()
+        if total_bytes <= self.max_bytes:
+            return
+
+        for key in sorted(self._index, key=lambda k: self._index[k]["last_access"]):
+            if total_bytes <= self.max_bytes:
+                break
+            total_bytes -= self._index[key]["size"]
+            self._remove(key)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        """
+        Remove cache entry and its file
+
+        :param key: cache key
+        """
+
+        self._index.pop(key, None)
+        self._get_path(key).unlink(missing_ok=True)
+
+    def _get_total_bytes(self) -> int:
+        return sum(entry["size"] for entry in self._index.values())
+
+    def _get_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _load_index(self) -> dict[str, dict[str, float | int | None]]:
+        """
+        Load cache index from disk dropping entries without files and adopting files without entries
+        """
+
+        index_path = self.cache_dir / self.INDEX_FILE
+        try:
+            index = json.loads(index_path.read_text())
+        except (OSError, ValueError):
+            index = {}
+
+        # writes interrupted before rename
+        for tmp_path in self.cache_dir.glob("*.tmp"):
+            tmp_path.unlink(missing_ok=True)
+
+        loaded_index = {}
+        for path in self.cache_dir.glob("*.json"):
+            if path.name == self.INDEX_FILE:
+                continue
+
+            key = path.stem
+            if key in index:
+                loaded_index[key] = index[key]
+                continue
+
+            # params of adopted file are unknown, so it is treated as open day response
+            stat = path.stat()
+            loaded_index[key] = {
+                "size": stat.st_size,
+                "last_access": stat.st_mtime,
+                "expires_at": stat.st_mtime + self.open_day_ttl,
+            }
+
+        return loaded_index
@@ -0,0 +1,75 @@
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+
+def infer_schema(rows: list, columns: list[str]) -> dict[str, str]:
+    """
+    Infer dtype of every column from its first non-null value.
+    DECIMAL and float values become float64, integers become int64.
+
+    :param rows: result rows
+    :param columns: column names
+    :return: dictionary of column name and dtype
+    """
+
+    schema = {}
+    for index, column in enumerate(columns):
+        value = next((row[index] for row in rows if row[index] is not None), None)
+
+        if isinstance(value, bool):
+            schema[column] = "bool"
+        elif isinstance(value, (int, np.integer)):
+            schema[column] = "int64"
+        elif isinstance(value, (float, Decimal, np.floating)):
+            schema[column] = "float64"
+        elif isinstance(value, str):
+            schema[column] = "str"
+        else:
+            schema[column] = "object"
+
+    return schema
+
+
+def make_dataframe(
+    rows: list, columns: list[str], schema: dict[str, str] | None = None
+) -> pd.DataFrame:
+    """
+    Build typed DataFrame from result rows, numeric columns are converted
+    straight into NumPy arrays without object-dtype intermediate frame
+
+    :param rows: result rows
+    :param columns: column names in order of row values
+    :param schema: dtype of columns, inferred from values of missing columns
+    :return: DataFrame with dtypes of schema, also for zero rows
+    """
+
+    schema = {**infer_schema(rows, columns), **(schema or {})}
+
+    data = {}
+    for index, column in enumerate(columns):
+        dtype = schema.get(column, "object")
+        values = [row[index] for row in rows]
+        has_missing = any(value is None for value in values)
+
+        if dtype == "float64":
+            data[column] = np.fromiter(
+                (np.nan if value is None else value for value in values),
+                dtype=np.float64,
+                count=len(values),
+            )
+        elif dtype == "int64" and not has_missing:
+            data[column] = np.fromiter(
+                (int(value) for value in values), dtype=np.int64, count=len(values)
+            )
+        elif dtype == "int64":
+            # missing integers need nullable integer dtype
+            data[column] = pd.array(
+                [None if value is None else int(value) for value in values],
+                dtype="Int64",
+            )
+        else:
+            data[column] = pd.array(values, dtype=dtype)
+
+    return pd.DataFrame(data, columns=columns)
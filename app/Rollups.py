@@ -0,0 +1,467 @@
+import pandas as pd
+from sqlalchemy import Connection, inspect
+
+from app.SqlDialect import (
+    CRYPTO_DATA_PAIR_COLUMNS,
+    MONTHLY_ROLLUP_COLUMNS,
+    MONTHLY_ROLLUP_KEY_COLUMNS,
+    PREFIX_ROLLUP_COLUMNS,
+    PREFIX_ROLLUP_KEY_COLUMNS,
+    PREFIX_ROLLUP_UNIQUE_COLUMNS,
+    ROLLUP_STATE_COLUMNS,
+    ROLLUP_STATE_KEY_COLUMNS,
+    SqlDialect,
+)
+from app.consts import ROLLUP_STATE_TABLE
+from app.enums.ColumnsToAnalyzeEnum import ColumnsToAnalyzeEnum
+
+
+class Rollups:
+    """
+    Rollup tables of data table maintained from rows of every load.
+
+    Monthly rollup keeps sums and row count of every (pair, month), prefix
+    rollup keeps row index and cumulative sums of every row of pair, so
+    monthly averages, ROWS-window averages and LAG growth are read without
+    window scans of the whole history. Load recomputes only months of inserted
+    or updated rows and prefixes between the earliest and the latest changed
+    day of every pair, later prefixes of pair are shifted in place.
+
+    Rollups are marked stale before rows are loaded and marked fresh together
+    with their update. Only rollups prepared in this process are updated by
+    loads, other ones, e.g. left behind by failed or interrupted load, are
+    rebuilt when they are prepared next time, never inside load.
+    """
+
+    def __init__(
+        self, dialect: SqlDialect | None = None, state_table: str = ROLLUP_STATE_TABLE
+    ):
+        """
+        :param dialect: SQL dialect of backend, MySQL if None
+        :param state_table: table of stale flags of data tables, created on first use
+        """
+
+        self.dialect = dialect or SqlDialect()
+        self.state_table = state_table
+        self._is_state_table_created = False
+        # fresh rollups and rollups of loads which are updated once load is done
+        self._prepared_tables: set[str] = set()
+        self._updated_tables: set[str] = set()
+
+    @staticmethod
+    def get_monthly_table(table_name: str) -> str:
+        return f"{table_name}_monthly_rollup"
+
+    @staticmethod
+    def get_prefix_table(table_name: str) -> str:
+        return f"{table_name}_prefix_rollup"
+
+    def prepare(self, conn: Connection, table_name: str) -> bool:
+        """
+        Create rollup tables of data table if they don't exist or are stale and fill them from its rows
+
+        :param conn: open connection
+        :param table_name: data table name
+        :return: True if rollups have been rebuilt from the whole data table
+        """
+
+        if table_name in self._prepared_tables:
+            return False
+
+        monthly_table = Rollups.get_monthly_table(table_name)
+        prefix_table = Rollups.get_prefix_table(table_name)
+        inspector = inspect(conn)
+        is_missing = not (
+            inspector.has_table(monthly_table) and inspector.has_table(prefix_table)
+        )
+        self._create_state_table(conn=conn)
+        # rows loaded before rollups existed are added once
+        is_rebuilt = inspector.has_table(table_name) and (
+            is_missing or self._is_stale(conn=conn, table_name=table_name)
+        )
+
+        if is_missing:
+            conn.exec_driver_sql(
+                self.dialect.create_table_sql(
+                    table_name=monthly_table,
+                    columns=MONTHLY_ROLLUP_COLUMNS,
+                    key_columns=MONTHLY_ROLLUP_KEY_COLUMNS,
+                )
+            )
+            conn.exec_driver_sql(
+                self.dialect.create_table_sql(
+                    table_name=prefix_table,
+                    columns=PREFIX_ROLLUP_COLUMNS,
+                    key_columns=PREFIX_ROLLUP_KEY_COLUMNS,
+                    unique_columns=PREFIX_ROLLUP_UNIQUE_COLUMNS,
+                )
+            )
+
+        if is_rebuilt:
+            quote = self.dialect.quote
+            conn.exec_driver_sql(f"DELETE FROM {quote(monthly_table)}")
+            conn.exec_driver_sql(f"DELETE FROM {quote(prefix_table)}")
+            conn.exec_driver_sql(
+                self._make_insert_months_sql(table_name, by_pair=False)
+            )
+            conn.exec_driver_sql(
+                self._make_insert_prefixes_sql(table_name, by_pair=False)
+            )
+            self._set_stale(conn=conn, table_name=table_name, is_stale=False)
+
+        conn.commit()
+        self._prepared_tables.add(table_name)
+        return is_rebuilt
+
+    def mark_stale(self, conn: Connection, table_name: str):
+        """
+        Mark rollups of data table stale before its rows are loaded
+
+        :param conn: open connection
+        :param table_name: data table name
+        """
+
+        self._create_state_table(conn=conn)
+        # rollups fresh since they were prepared can be updated from changed rows of load,
+        # rollups marked stale by load of another loader are rebuilt when they are prepared
+        if table_name in self._prepared_tables:
+            self._prepared_tables.discard(table_name)
+            if not self._is_stale(conn=conn, table_name=table_name):
+                self._updated_tables.add(table_name)
+
+        self._set_stale(conn=conn, table_name=table_name, is_stale=True)
+        conn.commit()
+
+    def invalidate(self, table_name: str):
+        """
+        Forget that rollups of data table are prepared, so next prepare checks if they are stale
+
+        :param table_name: data table name
+        """
+
+        self._prepared_tables.discard(table_name)
+        self._updated_tables.discard(table_name)
+
+    def update(self, conn: Connection, table_name: str, keys: list[pd.DataFrame]):
+        """
+        Recompute rollups of months and days of inserted or updated rows and mark them fresh,
+        rollups which were not prepared before load stay stale
+
+        :param conn: open connection
+        :param table_name: data table name
+        :param keys: frames with keys of inserted or updated rows, changed_keys of load statistics
+        """
+
+        if table_name not in self._updated_tables:
+            return
+
+        pair_columns = list(CRYPTO_DATA_PAIR_COLUMNS)
+        df = (
+            pd.concat([df_keys[pair_columns + ["date_key"]] for df_keys in keys])
+            if keys
+            else pd.DataFrame(columns=pair_columns + ["date_key"])
+        ).astype({"coin_name": object, "currency": object, "date_key": "int64"})
+
+        if not df.empty:
+            self._refresh(conn=conn, table_name=table_name, df=df)
+
+        # rollups and their flag are committed together
+        self._set_stale(conn=conn, table_name=table_name, is_stale=False)
+        conn.commit()
+        self._updated_tables.discard(table_name)
+        self._prepared_tables.add(table_name)
+
+    def _refresh(self, conn: Connection, table_name: str, df: pd.DataFrame):
+        """
+        Recompute rollups of months and days of keys
+
+        :param conn: open connection
+        :param table_name: data table name
+        :param df: coin_name, currency and date_key of changed rows
+        """
+
+        pair_columns = list(CRYPTO_DATA_PAIR_COLUMNS)
+
+        months = (
+            df.assign(year_month=df["date_key"] // 100)[pair_columns + ["year_month"]]
+            .drop_duplicates()
+            .itertuples(index=False)
+        )
+        ranges = df.groupby(pair_columns, sort=True)["date_key"].agg(["min", "max"])
+        self._refresh_months(
+            conn=conn,
+            table_name=table_name,
+            months=[
+                (coin_name, currency, int(year_month))
+                for coin_name, currency, year_month in months
+            ],
+        )
+        for (coin_name, currency), first, last in ranges.itertuples(name=None):
+            self._refresh_prefixes(
+                conn=conn,
+                table_name=table_name,
+                pair=(coin_name, currency),
+                first=int(first),
+                last=int(last),
+            )
+
+    def _create_state_table(self, conn: Connection):
+        if self._is_state_table_created:
+            return
+
+        conn.exec_driver_sql(
+            self.dialect.create_table_sql(
+                table_name=self.state_table,
+                columns=ROLLUP_STATE_COLUMNS,
+                key_columns=ROLLUP_STATE_KEY_COLUMNS,
+            )
+        )
+        conn.commit()
+        self._is_state_table_created = True
+
+    def _is_stale(self, conn: Connection, table_name: str) -> bool:
+        quote = self.dialect.quote
+        row = conn.exec_driver_sql(
+            f"SELECT {quote('is_stale')} FROM {quote(self.state_table)} "
+            f"WHERE {quote('table_name')} = {self.dialect.placeholder}",
+            (table_name,),
+        ).fetchone()
+
+        return bool(row and row[0])
+
+    def _set_stale(self, conn: Connection, table_name: str, is_stale: bool):
+        quote = self.dialect.quote
+        placeholder = self.dialect.placeholder
+
+        # add missing row first, then flag is replaced by UPDATE
+        conn.exec_driver_sql(
+            f"{self.dialect.insert_ignore} {quote(self.state_table)} "
+            f"({quote('table_name')}, {quote('is_stale')}) "
+            f"VALUES ({placeholder}, {placeholder})",
+            (table_name, int(is_stale)),
+        )
+        conn.exec_driver_sql(
+            f"UPDATE {quote(self.state_table)} SET {quote('is_stale')} = {placeholder} "
+            f"WHERE {quote('table_name')} = {placeholder}",
+            (int(is_stale), table_name),
+        )
+
+    def _refresh_months(
+        self,
+        conn: Connection,
+        table_name: str,
+        months: list[tuple[str, str, int]],
+    ):
+        """
+        Replace rollup of every (coin_name, currency, YYYYMM) month with sums of its rows
+        """
+
+        quote = self.dialect.quote
+        placeholder = self.dialect.placeholder
+        keys = " AND ".join(
+            f"{quote(k)} = {placeholder}" for k in MONTHLY_ROLLUP_KEY_COLUMNS
+        )
+
+        conn.exec_driver_sql(
+            f"DELETE FROM {quote(Rollups.get_monthly_table(table_name))} WHERE {keys}",
+            [
+                (coin_name, currency, f"{year_month // 100:04d}-{year_month % 100:02d}")
+                for coin_name, currency, year_month in months
+            ],
+        )
+        conn.exec_driver_sql(
+            self._make_insert_months_sql(table_name=table_name, by_pair=True),
+            [
+                (coin_name, currency, year_month * 100, year_month * 100 + 99)
+                for coin_name, currency, year_month in months
+            ],
+        )
+
+    def _refresh_prefixes(
+        self,
+        conn: Connection,
+        table_name: str,
+        pair: tuple[str, str],
+        first: int,
+        last: int,
+    ):
+        """
+        Replace prefix rollup of (coin_name, currency) pair between two date_keys with rows
+        of data table and shift later prefixes of pair by change of row count and sums of range
+
+        :param conn: open connection
+        :param table_name: data table name
+        :param pair: (coin_name, currency) pair
+        :param first: earliest changed date_key
+        :param last: latest changed date_key
+        """
+
+        quote = self.dialect.quote
+        placeholder = self.dialect.placeholder
+        prefix_table = quote(Rollups.get_prefix_table(table_name))
+        columns = [c.value for c in ColumnsToAnalyzeEnum]
+        pair_condition = " AND ".join(
+            f"{quote(k)} = {placeholder}" for k in CRYPTO_DATA_PAIR_COLUMNS
+        )
+
+        # row index and cumulative sums at the end of range before and after refresh
+        old_end = self._get_last_prefix(conn, table_name, pair, last, "<=")
+        base = self._get_last_prefix(conn, table_name, pair, first, "<")
+        row = conn.exec_driver_sql(
+            f"SELECT COUNT(*), {', '.join(f'SUM({quote(c)})' for c in columns)} "
+            f"FROM {quote(table_name)} WHERE {pair_condition} "
+            f"AND {quote('date_key')} BETWEEN {placeholder} AND {placeholder}",
+            (*pair, first, last),
+        ).fetchone()
+        deltas = [
+            start + (value or 0) - end for start, value, end in zip(base, row, old_end)
+        ]
+
+        conn.exec_driver_sql(
+            f"DELETE FROM {prefix_table} WHERE {pair_condition} "
+            f"AND {quote('date_key')} BETWEEN {placeholder} AND {placeholder}",
+            (*pair, first, last),
+        )
+
+        if any(deltas):
+            sums = ", ".join(
+                f"{quote(f'{c}_cum')} = {quote(f'{c}_cum')} + {placeholder}"
+                for c in columns
+            )
+            # row index is negated first, so shifted rows never collide in unique index
+            conn.exec_driver_sql(
+                f"UPDATE {prefix_table} "
+                f"SET {quote('row_index')} = -({quote('row_index')} + {placeholder}), "
+                f"{sums} WHERE {pair_condition} AND {quote('date_key')} > {placeholder}",
+                (*deltas, *pair, last),
+            )
+            conn.exec_driver_sql(
+                f"UPDATE {prefix_table} SET {quote('row_index')} = -{quote('row_index')} "
+                f"WHERE {pair_condition} AND {quote('row_index')} < 0",
+                pair,
+            )
+
+        # pair is bound twice, by lookup of the last kept row and by selected rows
+        conn.exec_driver_sql(
+            self._make_insert_prefixes_sql(table_name=table_name, by_pair=True),
+            (*pair, first, *pair, first, last),
+        )
+
+    def _get_last_prefix(
+        self,
+        conn: Connection,
+        table_name: str,
+        pair: tuple[str, str],
+        date_key: int,
+        operator: str,
+    ) -> list:
+        """
+        Get row index and cumulative sums of the last prefix of pair compared to date_key by operator,
+        zeros if there is none
+        """
+
+        quote = self.dialect.quote
+        placeholder = self.dialect.placeholder
+        cols = [quote("row_index")] + [
+            quote(f"{c.value}_cum") for c in ColumnsToAnalyzeEnum
+        ]
+
+        row = conn.exec_driver_sql(
+            f"SELECT {', '.join(cols)} FROM {quote(Rollups.get_prefix_table(table_name))} "
+            f"WHERE {quote('coin_name')} = {placeholder} "
+            f"AND {quote('currency')} = {placeholder} "
+            f"AND {quote('date_key')} {operator} {placeholder} "
+            f"ORDER BY {quote('date_key')} DESC LIMIT 1",
+            (*pair, date_key),
+        ).fetchone()
+
+        return [value or 0 for value in row] if row else [0] * len(cols)
+
+    def _make_insert_months_sql(self, table_name: str, by_pair: bool) -> str:
+        """
+        Get INSERT ... SELECT of monthly sums, of one pair between two date_keys if by_pair
+        """
+
+        quote = self.dialect.quote
+        placeholder = self.dialect.placeholder
+        year_month = self.dialect.year_month(quote("date_key"))
+        # columns are listed in order of selected values
+        cols = ", ".join(
+            quote(name)
+            for name in ["coin_name", "currency", "year_month_key"]
+            + [f"{c.value}_sum" for c in ColumnsToAnalyzeEnum]
+            + ["row_count"]
+        )
+        sums = ", ".join(f"SUM({quote(c.value)})" for c in ColumnsToAnalyzeEnum)
+        condition = (
+            f" WHERE {quote('coin_name')} = {placeholder} "
+            f"AND {quote('currency')} = {placeholder} "
+            f"AND {quote('date_key')} BETWEEN {placeholder} AND {placeholder}"
+            if by_pair
+            else ""
+        )
+
+        return (
+            f"INSERT INTO {quote(Rollups.get_monthly_table(table_name))} ({cols}) "
+            f"SELECT {quote('coin_name')}, {quote('currency')}, {year_month}, "
+            f"{sums}, COUNT(*) FROM {quote(table_name)}{condition} "
+            f"GROUP BY {quote('coin_name')}, {quote('currency')}, {year_month}"
+        )
+
+    def _make_insert_prefixes_sql(self, table_name: str, by_pair: bool) -> str:
+        """
+        Get INSERT ... SELECT of prefixes, of one pair between two date_keys if by_pair
+        """
+
+        quote = self.dialect.quote
+        placeholder = self.dialect.placeholder
+        prefix_table = quote(Rollups.get_prefix_table(table_name))
+        # columns are listed in order of selected values
+        cols = ", ".join(
+            quote(name)
+            for name in ["coin_name", "currency", "date_key", "row_index"]
+            + [c.value for c in ColumnsToAnalyzeEnum]
+            + [f"{c.value}_cum" for c in ColumnsToAnalyzeEnum]
+        )
+        cum_columns = [quote(f"{c.value}_cum") for c in ColumnsToAnalyzeEnum]
+        window = (
+            f"PARTITION BY d.{quote('coin_name')}, d.{quote('currency')} "
+            f"ORDER BY d.{quote('date_key')}"
+        )
+
+        def pair_condition(alias: str, operator: str) -> str:
+            return (
+                f"{alias}{quote('coin_name')} = {placeholder} "
+                f"AND {alias}{quote('currency')} = {placeholder} "
+                f"AND {alias}{quote('date_key')} {operator} {placeholder}"
+            )
+
+        if by_pair:
+            # prefixes continue from the last kept row before start, if there is one
+            offsets = [
+                f"COALESCE(b.{name}, 0) + "
+                for name in [quote("row_index")] + cum_columns
+            ]
+            base = (
+                f" LEFT JOIN (SELECT {quote('row_index')}, {', '.join(cum_columns)} "
+                f"FROM {prefix_table} WHERE {pair_condition('', '<')} "
+                f"ORDER BY {quote('date_key')} DESC LIMIT 1) AS b ON 1 = 1 "
+                f"WHERE {pair_condition('d.', 'BETWEEN')} AND {placeholder}"
+            )
+        else:
+            offsets = [""] * (len(cum_columns) + 1)
+            base = ""
+
+        row_index = f"{offsets[0]}ROW_NUMBER() OVER ({window})"
+        values = [f"d.{quote(c.value)}" for c in ColumnsToAnalyzeEnum]
+        sums = [
+            f"{offset}SUM(d.{quote(c.value)}) OVER ({window} ROWS UNBOUNDED PRECEDING)"
+            for offset, c in zip(offsets[1:], ColumnsToAnalyzeEnum)
+        ]
+
+        return (
+            f"INSERT INTO {prefix_table} ({cols}) "
+            f"SELECT d.{quote('coin_name')}, d.{quote('currency')}, "
+            f"d.{quote('date_key')}, {', '.join([row_index] + values + sums)} "
+            f"FROM {quote(table_name)} AS d{base}"
+        )
@@ -0,0 +1,411 @@
+import sqlite3
+
+from sqlalchemy import CursorResult
+
+from app.enums.BackendEnum import BackendEnum
+
+# (name, type, precision, scale, nullable) of crypto_data table columns, see sql/init_db.sql
+CRYPTO_DATA_COLUMNS = [
+    ("coin_name", "VARCHAR", 50, None, False),
+    ("date_key", "INT", None, None, False),
+    ("currency", "VARCHAR", 10, None, True),
+    ("price", "DECIMAL", 18, 2, False),
+    ("volume", "DECIMAL", 30, 2, False),
+    ("capitalization", "DECIMAL", 40, 2, False),
+    ("price_open", "DECIMAL", 18, 2, True),
+    ("price_high", "DECIMAL", 18, 2, True),
+    ("price_low", "DECIMAL", 18, 2, True),
+    ("sample_count", "INT", None, None, True),
+]
+CRYPTO_DATA_KEY_COLUMNS = ("coin_name", "date_key", "currency")
+CRYPTO_DATA_PAIR_COLUMNS = ("coin_name", "currency")
+
+# version token of every (coin_name, currency) pair of data tables, see DataVersions
+DATA_VERSIONS_COLUMNS = [
+    ("table_name", "VARCHAR", 64, None, False),
+    ("coin_name", "VARCHAR", 50, None, False),
+    ("currency", "VARCHAR", 10, None, False),
+    ("version", "BIGINT", None, None, False),
+]
+DATA_VERSIONS_KEY_COLUMNS = ("table_name", "coin_name", "currency")
+
+# sums and row count of every (coin_name, currency) pair and month, see Rollups
+MONTHLY_ROLLUP_COLUMNS = [
+    ("coin_name", "VARCHAR", 50, None, False),
+    ("currency", "VARCHAR", 10, None, False),
+    ("year_month_key", "VARCHAR", 7, None, False),
+    ("price_sum", "DECIMAL", 30, 2, False),
+    ("volume_sum", "DECIMAL", 42, 2, False),
+    ("capitalization_sum", "DECIMAL", 52, 2, False),
+    ("row_count", "INT", None, None, False),
+]
+MONTHLY_ROLLUP_KEY_COLUMNS = ("coin_name", "currency", "year_month_key")
+
+# row index and cumulative sums of every row of (coin_name, currency) pair, see Rollups
+PREFIX_ROLLUP_COLUMNS = [
+    ("coin_name", "VARCHAR", 50, None, False),
+    ("currency", "VARCHAR", 10, None, False),
+    ("date_key", "INT", None, None, False),
+    ("row_index", "INT", None, None, False),
+    ("price", "DECIMAL", 18, 2, False),
+    ("volume", "DECIMAL", 30, 2, False),
+    ("capitalization", "DECIMAL", 40, 2, False),
+    ("price_cum", "DECIMAL", 38, 2, False),
+    ("volume_cum", "DECIMAL", 50, 2, False),
+    ("capitalization_cum", "DECIMAL", 60, 2, False),
+]
+PREFIX_ROLLUP_KEY_COLUMNS = ("coin_name", "currency", "date_key")
+PREFIX_ROLLUP_UNIQUE_COLUMNS = ("coin_name", "currency", "row_index")
+
+# rollups of data table are stale from start of load until they are updated, see Rollups
+ROLLUP_STATE_COLUMNS = [
+    ("table_name", "VARCHAR", 64, None, False),
+    ("is_stale", "INT", None, None, False),
+]
+ROLLUP_STATE_KEY_COLUMNS = ("table_name",)
+
+
+class SqlDialect:
+    """
+    SQL differences between supported backends. Defaults follow MySQL.
+    """
+
+    backend = BackendEnum.mysql.value
+    placeholder = "%s"
+    insert_ignore = "INSERT IGNORE INTO"
+    # bulk load strategies supported by backend
+    bulk_strategies = ("insert", "infile")
+    # max parameters of one statement, MySQL is limited by max_allowed_packet instead
+    max_statement_params: int | None = None
+    # several connections may write at the same time
+    parallel_load = True
+    # digits added to DECIMAL scale of AVG and division results, None if they are DOUBLE
+    div_precision_increment: int | None = 4
+
+    def quote(self, name: str) -> str:
+        return f"`{name}`"
+
+    def column_type(
+        self, type_name: str, precision: int | None, scale: int | None
+    ) -> str:
+        if precision is None:
+            return type_name
+        if scale is None:
+            return f"{type_name}({precision})"
+        return f"{type_name}({precision}, {scale})"
+
+    def create_table_sql(
+        self,
+        table_name: str,
+        temporary: bool = False,
+        if_not_exists: bool = True,
+        columns: list[tuple] = CRYPTO_DATA_COLUMNS,
+        key_columns: tuple[str, ...] = CRYPTO_DATA_KEY_COLUMNS,
+        unique_columns: tuple[str, ...] | None = None,
+    ) -> str:
+        """
+        Get CREATE TABLE statement of crypto_data table
+
+        :param table_name: table name
+        :param temporary: create temporary table living only in current connection
+        :param if_not_exists: don't fail if table already exists
+        :param columns: (name, type, precision, scale, nullable) of every column
+        :param key_columns: primary key columns
+        :param unique_columns: columns of additional unique key
+        :return: SQL statement
+        """
+
+        definitions = [
+            f"{self.quote(name)} {self.column_type(type_name, precision, scale)}"
+            + ("" if nullable else " NOT NULL")
+            for name, type_name, precision, scale, nullable in columns
+        ]
+        definitions.append(
+            f"PRIMARY KEY ({', '.join(self.quote(k) for k in key_columns)})"
+        )
+        if unique_columns:
+            definitions.append(
+                f"UNIQUE ({', '.join(self.quote(k) for k in unique_columns)})"
+            )
+
+        return (
+            f"CREATE {'TEMPORARY ' if temporary else ''}TABLE "
+            f"{'IF NOT EXISTS ' if if_not_exists else ''}{self.quote(table_name)} ("
+            + ", ".join(definitions)
+            + ")"
+        )
+
+    def add_column_sql(
+        self,
+        table_name: str,
+        name: str,
+        type_name: str,
+        precision: int | None,
+        scale: int | None,
+    ) -> str:
+        """
+        Get ALTER TABLE statement adding nullable column to existing table
+        """
+
+        return (
+            f"ALTER TABLE {self.quote(table_name)} ADD COLUMN {self.quote(name)} "
+            f"{self.column_type(type_name, precision, scale)} NULL"
+        )
+
+    def create_staging_table_sql(self, staging_table: str, table_name: str) -> str:
+        return (
+            f"CREATE TEMPORARY TABLE {self.quote(staging_table)} "
+            f"LIKE {self.quote(table_name)}"
+        )
+
+    def drop_staging_table_sql(self, staging_table: str) -> str:
+        return f"DROP TEMPORARY TABLE IF EXISTS {self.quote(staging_table)}"
+
+    def copy_table_sql(self, new_table: str, table_name: str) -> str:
+        return (
+            f"CREATE TABLE IF NOT EXISTS {self.quote(new_table)} "
+            f"LIKE {self.quote(table_name)}"
+        )
+
+    def truncate_table_sql(self, table_name: str) -> str:
+        return f"TRUNCATE TABLE {self.quote(table_name)}"
+
+    def drop_table_sql(self, table_name: str) -> str:
+        return f"DROP TABLE IF EXISTS {self.quote(table_name)}"
+
+    def upsert_clause(
+        self,
+        key_columns: list[str],
+        value_columns: list[str],
+        source_alias: str | None = None,
+    ) -> str:
+        """
+        Get clause updating value columns of rows with existing primary key
+
+        :param key_columns: primary key columns
+        :param value_columns: columns to update
+        :param source_alias: alias of selected table in INSERT ... SELECT,
+            inserted VALUES are used if None
+        :return: SQL clause starting with space
+        """
+
+        # with nothing to update duplicated keys are kept as they are
+        if not value_columns:
+            key = self.quote(key_columns[0])
+            return f" ON DUPLICATE KEY UPDATE {key} = {key}"
+
+        updates = ", ".join(
+            f"{self.quote(k)} = "
+            + (
+                f"{source_alias}.{self.quote(k)}"
+                if source_alias
+                else f"VALUES({self.quote(k)})"
+            )
+            for k in value_columns
+        )
+        return f" ON DUPLICATE KEY UPDATE {updates}"
+
+    def merge_sql(
+        self,
+        staging_table: str,
+        table_name: str,
+        columns: list[str],
+        key_columns: list[str],
+        value_columns: list[str],
+    ) -> str:
+        cols = ", ".join(self.quote(k) for k in columns)
+        return (
+            f"INSERT INTO {self.quote(table_name)} ({cols}) "
+            f"SELECT {cols} FROM {self.quote(staging_table)} AS s"
+            + self.upsert_clause(key_columns, value_columns, source_alias="s")
+        )
+
+    def null_safe_equal(self, left: str, right: str) -> str:
+        return f"{left} <=> {right}"
+
+    def affected_rows(self, result: CursorResult) -> int:
+        """
+        Get number of rows inserted or updated by statement, -1 if unknown
+        """
+
+        return result.rowcount
+
+    def year_month(self, date_key_column: str) -> str:
+        """
+        Get expression converting YYYYMMDD date_key into YYYY-MM string
+        """
+
+        return f"DATE_FORMAT(STR_TO_DATE({date_key_column}, '%Y%m%d'), '%Y-%m')"
+
+    def least(self, *expressions: str) -> str:
+        """
+        Get expression of the smallest of several values
+        """
+
+        return f"LEAST({', '.join(expressions)})"
+
+    def days_between(self, later_date_key: str, earlier_date_key: str) -> str:
+        """
+        Get expression of number of days between two YYYYMMDD date_keys
+        """
+
+        return (
+            f"DATEDIFF(STR_TO_DATE({later_date_key}, '%Y%m%d'), "
+            f"STR_TO_DATE({earlier_date_key}, '%Y%m%d'))"
+        )
+
+
+class EmbeddedSqlDialect(SqlDialect):
+    """
+    Common SQL of embedded SQLite and DuckDB backends
+    """
+
+    placeholder = "?"
+    insert_ignore = "INSERT OR IGNORE INTO"
+    bulk_strategies = ("insert",)
+    parallel_load = False
+    div_precision_increment = None
+
+    def quote(self, name: str) -> str:
+        return f'"{name}"'
+
+    def create_staging_table_sql(self, staging_table: str, table_name: str) -> str:
+        # there is no CREATE TABLE ... LIKE, staging table gets the same primary key
+        return self.create_table_sql(
+            table_name=staging_table, temporary=True, if_not_exists=False
+        )
+
+    def drop_staging_table_sql(self, staging_table: str) -> str:
+        return f"DROP TABLE IF EXISTS {self.quote(staging_table)}"
+
+    def copy_table_sql(self, new_table: str, table_name: str) -> str:
+        # there is no CREATE TABLE ... LIKE, copy gets crypto_data structure
+        return self.create_table_sql(table_name=new_table)
+
+    def truncate_table_sql(self, table_name: str) -> str:
+        return f"DELETE FROM {self.quote(table_name)}"
+
+    def upsert_clause(
+        self,
+        key_columns: list[str],
+        value_columns: list[str],
+        source_alias: str | None = None,
+    ) -> str:
+        keys = ", ".join(self.quote(k) for k in key_columns)
+        if not value_columns:
+            return f" ON CONFLICT ({keys}) DO NOTHING"
+
+        updates = ", ".join(
+            f"{self.quote(k)} = excluded.{self.quote(k)}" for k in value_columns
+        )
+        # rows equal to inserted ones are not updated, so they are not counted as changed
+        is_equal = " AND ".join(
+            self.null_safe_equal(self.quote(k), f"excluded.{self.quote(k)}")
+            for k in value_columns
+        )
+        return f" ON CONFLICT ({keys}) DO UPDATE SET {updates} WHERE NOT ({is_equal})"
+
+    def merge_sql(
+        self,
+        staging_table: str,
+        table_name: str,
+        columns: list[str],
+        key_columns: list[str],
+        value_columns: list[str],
+    ) -> str:
+        cols = ", ".join(self.quote(k) for k in columns)
+        # WHERE TRUE keeps SQLite from parsing ON CONFLICT as join constraint
+        return (
+            f"INSERT INTO {self.quote(table_name)} ({cols}) "
+            f"SELECT {cols} FROM {self.quote(staging_table)} AS s WHERE TRUE"
+            + self.upsert_clause(key_columns, value_columns)
+        )
+
+    def _iso_date(self, date_key_column: str) -> str:
+        date_key = f"CAST({date_key_column} AS TEXT)"
+        return (
+            f"substr({date_key}, 1, 4) || '-' || substr({date_key}, 5, 2) "
+            f"|| '-' || substr({date_key}, 7, 2)"
+        )
+
+    def year_month(self, date_key_column: str) -> str:
+        date_key = f"CAST({date_key_column} AS TEXT)"
+        return f"substr({date_key}, 1, 4) || '-' || substr({date_key}, 5, 2)"
+
+
+class SqliteDialect(EmbeddedSqlDialect):
+    backend = BackendEnum.sqlite.value
+    # SQLITE_MAX_VARIABLE_NUMBER was raised from 999 in 3.32
+    max_statement_params = 32766 if sqlite3.sqlite_version_info >= (3, 32) else 999
+
+    def column_type(
+        self, type_name: str, precision: int | None, scale: int | None
+    ) -> str:
+        # NUMERIC affinity would store whole prices as integers and break division
+        if type_name == "DECIMAL":
+            return "REAL"
+        return super().column_type(type_name, precision, scale)
+
+    def null_safe_equal(self, left: str, right: str) -> str:
+        return f"{left} IS {right}"
+
+    def least(self, *expressions: str) -> str:
+        # scalar MIN with several arguments is not an aggregate
+        return f"MIN({', '.join(expressions)})"
+
+    def days_between(self, later_date_key: str, earlier_date_key: str) -> str:
+        return (
+            f"CAST(julianday({self._iso_date(later_date_key)}) "
+            f"- julianday({self._iso_date(earlier_date_key)}) AS INTEGER)"
+        )
+
+
+class DuckDbDialect(EmbeddedSqlDialect):
+    backend = BackendEnum.duckdb.value
+    # DataFrame chunks are scanned by DuckDB directly
+    bulk_strategies = ("frame", "insert")
+    max_statement_params = 65535
+
+    def column_type(
+        self, type_name: str, precision: int | None, scale: int | None
+    ) -> str:
+        # DuckDB DECIMAL precision is limited to 38 digits
+        if type_name == "DECIMAL":
+            precision = min(precision, 38)
+        return super().column_type(type_name, precision, scale)
+
+    def null_safe_equal(self, left: str, right: str) -> str:
+        return f"{left} IS NOT DISTINCT FROM {right}"
+
+    def affected_rows(self, result: CursorResult) -> int:
+        # DuckDB returns number of changed rows as result row instead of rowcount
+        if result.rowcount >= 0 or not result.returns_rows:
+            return result.rowcount
+
+        row = result.fetchone()
+        return int(row[0]) if row else -1
+
+    def days_between(self, later_date_key: str, earlier_date_key: str) -> str:
+        return (
+            f"(CAST({self._iso_date(later_date_key)} AS DATE) "
+            f"- CAST({self._iso_date(earlier_date_key)} AS DATE))"
+        )
+
+
+def get_dialect(backend: str) -> SqlDialect:
+    """
+    Get SQL dialect of backend
+
+    :param backend: value of BackendEnum
+    :return: dialect instance
+    """
+
+    dialects = {
+        BackendEnum.mysql.value: SqlDialect,
+        BackendEnum.sqlite.value: SqliteDialect,
+        BackendEnum.duckdb.value: DuckDbDialect,
+    }
+    if backend not in dialects:
+        raise ValueError(f"Unknown database backend: {backend}")
+
+    return dialects[backend]()
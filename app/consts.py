@@ -1,2 +1,10 @@
 BASE_URL = "https://api.coingecko.com/api/v3"
 OUTPUT_DIR = "crypto_analysis_images"
+REQUESTS_PER_MINUTE = 30
+CACHE_DIR = ".http_cache"
+FX_BASE_CURRENCY = "usd"
+FX_REFERENCE_COIN = "bitcoin"
+STAGING_DIR = "staging"
+DATA_VERSIONS_TABLE = "data_versions"
+ROLLUP_STATE_TABLE = "rollup_state"
+QUERY_CACHE_DIR = ".query_cache"
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class AnalyticsEngineEnum(Enum):
+    sql = "sql"
+    frame = "frame"
+    rollup = "rollup"
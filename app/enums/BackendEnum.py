@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class BackendEnum(Enum):
+    mysql = "mysql"
+    sqlite = "sqlite"
+    duckdb = "duckdb"
@@ -1,22 +1,40 @@
 import asyncio
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 import time
 import os
 from dotenv import load_dotenv
+import pandas as pd
 
 from app.CryptoExtracter import CryptoExtracter
 from app.CryptoTransformer import CryptoTransformer
 from app.CryptoVisualizer import CryptoVisualizer
 from app.DatabaseLoader import DatabaseLoader
+from app.AsyncDatabaseLoader import AsyncDatabaseLoader
 from app.CryptoAnalyzer import CryptoAnalyzer
+from app.CryptoPipeline import CryptoPipeline
+from app.GapScanner import GapScanner
+from app.ResponseCache import ResponseCache
+from app.QueryCache import QueryCache
+from app.ParquetStaging import ParquetStaging
 from app.enums.ColumnsToVisualizeEnum import ColumnsToVisualizeEnum
 from app.enums.OrderEnum import OrderEnum
+from app.enums.BackendEnum import BackendEnum
+from app.enums.AnalyticsEngineEnum import AnalyticsEngineEnum
 from app.enums.ColumnsToAnalyzeEnum import ColumnsToAnalyzeEnum
+from app.consts import REQUESTS_PER_MINUTE, FX_BASE_CURRENCY, QUERY_CACHE_DIR
 
 load_dotenv()
 
 TABLE_NAME = os.getenv("TABLE_NAME")
 
+# analysis settings
+SPIKES_START_DATE_KEY = "20251110"
+SPIKES_END_DATE_KEY = "20251125"
+PRECEDING_DAYS = 3
+FOLLOWING_DAYS = 3
+DAYS_TO_LAG = 3
+
 
 def get_coins_data(
     coins_list: list[str], currency_list: list[str]
@@ -25,118 +43,419 @@ def get_coins_data(
     return [(coin, currency) for coin in coins_list for currency in currency_list]
 
 
-async def main(days_of_history: int, coins: list[str], currency: list[str]):
-    # get coins data for extracting and transforming data correctly
-    coins_data = get_coins_data(coins_list=coins, currency_list=currency)
-    end_point_timestamp = int(time.time())
-    start_date = datetime.now() - timedelta(days=days_of_history)
-    start_timestamp = int(start_date.timestamp())
+async def fill_data_gaps(
+    extracter: CryptoExtracter, db_loader: DatabaseLoader, aggregate_daily: bool
+):
+    # find missing day ranges and fetch only them
+    scanner = GapScanner(db=db_loader, table_name=TABLE_NAME)
+    gap_ranges = await asyncio.to_thread(scanner.get_gap_ranges)
+    if not gap_ranges:
+        print("No gaps found")
+        return
+
+    gap_data = await extracter.get_range_data(ranges=gap_ranges)
+    gap_coins_data = [(coin, currency) for coin, currency, _, _ in gap_ranges]
+
+    # transform and load fetched gaps
+    transformer = CryptoTransformer(aggregate_daily=aggregate_daily)
+    transformer.normalize_crypto_data(data=gap_data, coins_data=gap_coins_data)
+    df_gaps = transformer.get_normalized_crypto()
+    if df_gaps.empty:
+        print("Unable to fetch data for gaps")
+        return
 
-    # extract data using API
-    extracter = CryptoExtracter()
-    crypto_data = await extracter.get_retrospective_data(
+    await asyncio.to_thread(db_loader.load_dataframe, df=df_gaps, table_name=TABLE_NAME)
+
+
+async def extract_with_fx(
+    extracter: CryptoExtracter,
+    coins_data: list[tuple[str, str]],
+    start_timestamp: int,
+    end_point_timestamp: int,
+    watermarks: dict[tuple[str, str], int] | None,
+    native_pairs: list[tuple[str, str]] | None,
+) -> tuple[list[dict[str, any]], list[tuple[str, str]]]:
+    # fetch every coin once in base currency plus reference coin in every currency
+    base_coins_data = CryptoExtracter.get_base_currency_coins_data(
+        coins_data=coins_data,
+        base_currency=FX_BASE_CURRENCY,
+        native_pairs=native_pairs,
+    )
+    # watermarks belong to requested pairs, not to fetched base currency pairs
+    base_watermarks = CryptoExtracter.get_base_currency_watermarks(
+        coins_data=coins_data,
+        watermarks=watermarks or {},
+        base_currency=FX_BASE_CURRENCY,
+        native_pairs=native_pairs,
+    )
+    base_data = await extracter.get_retrospective_data(
         starting_from_timestamp=start_timestamp,
         up_to_timestamp=end_point_timestamp,
-        coins_data=coins_data,
+        coins_data=base_coins_data,
+        watermarks=base_watermarks,
     )
 
-    # check if every requested dataset is empty
-    if all(not d for d in crypto_data):
-        print("No data to analyse")
-        return
+    # FX rates cover the window of every fetched base currency pair
+    fx_start_timestamp = min(
+        (
+            CryptoExtracter.date_key_to_timestamp(base_watermarks[pair])
+            if pair in base_watermarks
+            else start_timestamp
+        )
+        for pair in base_coins_data
+    )
+    currencies = list(dict.fromkeys(currency for _, currency in coins_data))
+    fx_data = await extracter.get_fx_data(
+        starting_from_timestamp=fx_start_timestamp,
+        up_to_timestamp=end_point_timestamp,
+        currencies=list(dict.fromkeys([FX_BASE_CURRENCY, *currencies])),
+    )
+    fx_rates = CryptoTransformer.get_fx_rates(
+        fx_data=fx_data, base_currency=FX_BASE_CURRENCY
+    )
 
-    # transform data to DataFrame
-    transformer = CryptoTransformer()
-    transformer.normalize_crypto_data(data=crypto_data, coins_data=coins_data)
-    df_crypto = transformer.get_normalized_crypto()
+    # compute other currencies from base currency data
+    data, derived_coins_data = CryptoTransformer.derive_currency_data(
+        data=base_data,
+        coins_data=base_coins_data,
+        fx_rates=fx_rates,
+        base_currency=FX_BASE_CURRENCY,
+        currencies=currencies,
+        native_pairs=native_pairs,
+    )
 
-    # initialize database
-    db_loader = DatabaseLoader()
+    # keep only requested pairs
+    requested = set(coins_data)
+    pairs = [
+        (coin_data, pair)
+        for coin_data, pair in zip(data, derived_coins_data)
+        if pair in requested
+    ]
 
-    # save data to database
-    await asyncio.to_thread(
-        db_loader.load_dataframe, df=df_crypto, table_name=TABLE_NAME
-    )
+    return [coin_data for coin_data, _ in pairs], [pair for _, pair in pairs]
 
-    # analyse data
-    analyzer = CryptoAnalyzer(db=db_loader, table_name=TABLE_NAME)
 
-    # go through every (coin_name, currency) pair and save visualised data as images
-    for coin, currency in coins_data:
+def get_analysis_queries(pairs: list[tuple[str, str]]) -> dict[str, dict[str, any]]:
+    # arguments of every analyzer query, results are split by pair
+    return {
+        "spikes": {
+            "up_to_rank": 5,
+            "order": OrderEnum.descending.value,
+            "column": ColumnsToAnalyzeEnum.capitalization.value,
+            "start_date_key": SPIKES_START_DATE_KEY,
+            "end_date_key": SPIKES_END_DATE_KEY,
+            "pairs": pairs,
+            "by_pair": True,
+        },
+        "monthly_analysis": {"pairs": pairs, "by_pair": True},
+        "moving_average": {
+            "preceding_days": PRECEDING_DAYS,
+            "following_days": FOLLOWING_DAYS,
+            "column": ColumnsToAnalyzeEnum.price.value,
+            "pairs": pairs,
+            "by_pair": True,
+        },
+        "volatility": {
+            "column": ColumnsToAnalyzeEnum.price.value,
+            "lag_to_row": DAYS_TO_LAG,
+            "pairs": pairs,
+            "by_pair": True,
+        },
+    }
 
-        # visualize spikes
-        start_date_key = "20251110"
-        end_date_key = "20251125"
-        df_spikes_data = analyzer.get_spikes(
-            up_to_rank=5,
-            order=OrderEnum.descending.value,
-            column=ColumnsToAnalyzeEnum.capitalization.value,
-            coin_name=coin,
-            currency=currency,
-            start_date_key=start_date_key,
-            end_date_key=end_date_key,
-        )
-        CryptoVisualizer.plot_spikes(
-            df=df_spikes_data,
-            column=ColumnsToVisualizeEnum.capitalization.value,
-            start_date_key=start_date_key,
-            end_date_key=end_date_key,
-        )
 
-        # visualize general information about price and volume
-        CryptoVisualizer.plot_general_info(
-            df=df_crypto, coin_name=coin, currency=currency
-        )
+def group_analysis(
+    results: dict[str, dict[tuple[str, str], pd.DataFrame]],
+    pairs: list[tuple[str, str]],
+) -> dict[tuple[str, str], dict[str, pd.DataFrame]]:
+    # regroup results of every query into analysis of every pair
+    return {
+        pair: {name: result[pair] for name, result in results.items()} for pair in pairs
+    }
 
-        # visualize monthly statistics for price and volume
-        df_monthly_data = analyzer.get_monthly_analysis(
-            coin_name=coin, currency=currency
-        )
-        CryptoVisualizer.plot_monthly_analysis(
-            df=df_monthly_data, column=ColumnsToVisualizeEnum.average_price.value
-        )
-        CryptoVisualizer.plot_monthly_analysis(
-            df=df_monthly_data, column=ColumnsToVisualizeEnum.average_volume.value
+
+def get_batch_analysis(
+    analyzer: CryptoAnalyzer, pairs: list[tuple[str, str]]
+) -> dict[tuple[str, str], dict[str, pd.DataFrame]]:
+    # run every analyzer query once for all pairs
+    results = {
+        name: getattr(analyzer, f"get_{name}")(**kwargs)
+        for name, kwargs in get_analysis_queries(pairs=pairs).items()
+    }
+    return group_analysis(results=results, pairs=pairs)
+
+
+async def get_batch_analysis_async(
+    analyzer: CryptoAnalyzer, pairs: list[tuple[str, str]]
+) -> dict[tuple[str, str], dict[str, pd.DataFrame]]:
+    # run every analyzer query concurrently
+    queries = get_analysis_queries(pairs=pairs)
+    results = await asyncio.gather(
+        *(
+            analyzer.analyze_async(name=name, **kwargs)
+            for name, kwargs in queries.items()
         )
-        CryptoVisualizer.plot_monthly_analysis(
-            df=df_monthly_data,
-            column=ColumnsToVisualizeEnum.average_capitalization.value,
+    )
+    return group_analysis(results=dict(zip(queries, results)), pairs=pairs)
+
+
+def visualize_pair_analysis(
+    analysis: dict[str, pd.DataFrame], df_crypto: pd.DataFrame, coin: str, currency: str
+):
+    # visualize spikes
+    CryptoVisualizer.plot_spikes(
+        df=analysis["spikes"],
+        column=ColumnsToVisualizeEnum.capitalization.value,
+        start_date_key=SPIKES_START_DATE_KEY,
+        end_date_key=SPIKES_END_DATE_KEY,
+    )
+
+    # visualize general information about price and volume
+    CryptoVisualizer.plot_general_info(df=df_crypto, coin_name=coin, currency=currency)
+
+    # visualize monthly statistics for price and volume
+    df_monthly_data = analysis["monthly_analysis"]
+    CryptoVisualizer.plot_monthly_analysis(
+        df=df_monthly_data, column=ColumnsToVisualizeEnum.average_price.value
+    )
+    CryptoVisualizer.plot_monthly_analysis(
+        df=df_monthly_data, column=ColumnsToVisualizeEnum.average_volume.value
+    )
+    CryptoVisualizer.plot_monthly_analysis(
+        df=df_monthly_data,
+        column=ColumnsToVisualizeEnum.average_capitalization.value,
+    )
+
+    # visualize monthly share of volume
+    CryptoVisualizer.plot_monthly_volume_share(df=df_monthly_data, total_months=12)
+
+    # visualize moving average
+    CryptoVisualizer.plot_moving_average(
+        df=analysis["moving_average"],
+        column=ColumnsToVisualizeEnum.price.value,
+        total_day_span=PRECEDING_DAYS + FOLLOWING_DAYS + 1,
+    )
+
+    # visualize growth
+    CryptoVisualizer.plot_volatility(
+        df=analysis["volatility"],
+        column=ColumnsToVisualizeEnum.price.value,
+        days_to_lag=DAYS_TO_LAG,
+    )
+
+
+async def main(
+    days_of_history: int,
+    coins: list[str],
+    currency: list[str],
+    incremental: bool = False,
+    backfill: bool = True,
+    fill_gaps: bool = False,
+    use_cache: bool = True,
+    streaming: bool = False,
+    derive_fx: bool = False,
+    native_pairs: list[tuple[str, str]] | None = None,
+    aggregate_daily: bool = False,
+    staging: bool = False,
+    load_workers: int = 1,
+    async_db: bool = False,
+    backend: str = BackendEnum.mysql.value,
+    database: str | None = None,
+    use_query_cache: bool = False,
+    analytics_engine: str = AnalyticsEngineEnum.sql.value,
+):
+    if streaming and (derive_fx or staging):
+        raise ValueError("Streaming mode supports neither derive_fx nor staging")
+
+    # get coins data for extracting and transforming data correctly
+    coins_data = get_coins_data(coins_list=coins, currency_list=currency)
+    end_point_timestamp = int(time.time())
+    start_date = datetime.now() - timedelta(days=days_of_history)
+    start_timestamp = int(start_date.timestamp())
+
+    # initialize database
+    # results cached on disk by earlier runs are checked against versions of later loads
+    track_versions = use_query_cache or os.path.isdir(QUERY_CACHE_DIR)
+    # rollups are kept up to date by loads only when rollup engine reads them
+    maintain_rollups = analytics_engine == AnalyticsEngineEnum.rollup.value
+    db_loader = DatabaseLoader(
+        pool_size=max(5, load_workers),
+        backend=backend,
+        database=database,
+        track_versions=track_versions,
+        maintain_rollups=maintain_rollups,
+    )
+    # embedded database has no init script, table of older MySQL init script lacks later columns
+    db_loader.create_table(table_name=TABLE_NAME)
+    # missing or stale rollups are rebuilt here, so loads only update changed days
+    if maintain_rollups:
+        db_loader.prepare_rollups(table_name=TABLE_NAME)
+    if db_loader.dialect.backend != BackendEnum.mysql.value:
+        # async driver is available for MySQL only
+        async_db = False
+
+    # in incremental mode fetch every pair starting from its latest loaded day
+    watermarks = None
+    coins_to_fetch = coins_data
+    # refetched latest days are merged so revised values replace partial ones
+    load_mode = "merge" if incremental else "ignore"
+    if incremental:
+        watermarks = db_loader.get_watermarks(table_name=TABLE_NAME)
+        coins_to_fetch = CryptoExtracter.get_incremental_coins_data(
+            coins_data=coins_data, watermarks=watermarks, backfill=backfill
         )
 
-        # visualize monthly share of volume
-        CryptoVisualizer.plot_monthly_volume_share(df=df_monthly_data, total_months=12)
-
-        # visualize moving average
-        preceding_days = 3
-        following_days = 3
-        total_day_span = preceding_days + following_days + 1
-        df_moving_average_data = analyzer.get_moving_average(
-            preceding_days=preceding_days,
-            following_days=following_days,
-            column=ColumnsToAnalyzeEnum.price.value,
-            coin_name=coin,
-            currency=currency,
+    # one async loader serves loads and queries of the run
+    async with (
+        AsyncDatabaseLoader(
+            track_versions=track_versions, maintain_rollups=maintain_rollups
         )
-        CryptoVisualizer.plot_moving_average(
-            df=df_moving_average_data,
-            column=ColumnsToVisualizeEnum.price.value,
-            total_day_span=total_day_span,
+        if async_db
+        else nullcontext()
+    ) as async_db_loader:
+        if async_db and maintain_rollups:
+            await async_db_loader.prepare_rollups_async(table_name=TABLE_NAME)
+
+        # extract data using API, one session is shared by every request of the run
+        async with CryptoExtracter(
+            requests_per_minute=REQUESTS_PER_MINUTE,
+            cache=ResponseCache() if use_cache else None,
+        ) as extracter:
+            if streaming:
+                # fetch, transform and load every pair as soon as it arrives
+                urls = CryptoExtracter.calculate_retrospective_url_params(
+                    coins_data=coins_to_fetch,
+                    starting_from=start_timestamp,
+                    up_to=end_point_timestamp,
+                    watermarks=watermarks,
+                )
+                pipeline = CryptoPipeline(
+                    extracter=extracter,
+                    db_loader=db_loader,
+                    table_name=TABLE_NAME,
+                    aggregate_daily=aggregate_daily,
+                    load_mode=load_mode,
+                    # charts read stored history, loaded batches are not kept
+                    keep_frames=False,
+                )
+                await pipeline.run(urls=urls, coins_data=coins_to_fetch)
+
+                if pipeline.loaded_rows == 0:
+                    print("No data to analyse")
+                    return
+            else:
+                if derive_fx:
+                    # derive non-base currencies from one base currency fetch and FX rates
+                    crypto_data, coins_to_fetch = await extract_with_fx(
+                        extracter=extracter,
+                        coins_data=coins_to_fetch,
+                        start_timestamp=start_timestamp,
+                        end_point_timestamp=end_point_timestamp,
+                        watermarks=watermarks,
+                        native_pairs=native_pairs,
+                    )
+                else:
+                    crypto_data = await extracter.get_retrospective_data(
+                        starting_from_timestamp=start_timestamp,
+                        up_to_timestamp=end_point_timestamp,
+                        coins_data=coins_to_fetch,
+                        watermarks=watermarks,
+                    )
+
+                # check if every requested dataset is empty
+                if all(not d for d in crypto_data):
+                    print("No data to analyse")
+                    return
+
+                # transform data to DataFrame
+                transformer = CryptoTransformer(aggregate_daily=aggregate_daily)
+                transformer.normalize_crypto_data(
+                    data=crypto_data, coins_data=coins_to_fetch
+                )
+                df_crypto = transformer.get_normalized_crypto()
+
+                # keep raw and normalized data of the run for offline replay
+                if staging:
+                    parquet_staging = ParquetStaging()
+                    run_id = parquet_staging.write_raw(
+                        data=crypto_data, coins_data=coins_to_fetch
+                    )
+                    parquet_staging.write_normalized(df=df_crypto, run_id=run_id)
+
+                # save data to database
+                if async_db and load_workers == 1:
+                    await async_db_loader.load_dataframe_async(
+                        df=df_crypto, table_name=TABLE_NAME, mode=load_mode
+                    )
+                else:
+                    await asyncio.to_thread(
+                        db_loader.load_dataframe,
+                        df=df_crypto,
+                        table_name=TABLE_NAME,
+                        mode=load_mode,
+                        workers=load_workers,
+                    )
+
+            # repair missing days left by failed fetches with targeted requests
+            if fill_gaps:
+                await fill_data_gaps(
+                    extracter=extracter,
+                    db_loader=db_loader,
+                    aggregate_daily=aggregate_daily,
+                )
+
+        # analyse data, every query runs once for all pairs
+        # cached results are reused until rows of their pairs are reloaded
+        query_cache = QueryCache(cache_dir=QUERY_CACHE_DIR) if use_query_cache else None
+        # frame engine and charts get stored history of pairs, fetched rows may be only part of it
+        is_frame = analytics_engine == AnalyticsEngineEnum.frame.value
+        if async_db:
+            analyzer = CryptoAnalyzer(
+                db=async_db_loader,
+                table_name=TABLE_NAME,
+                cache=query_cache,
+                engine=analytics_engine,
+            )
+            df_history = await (
+                analyzer.load_frame_async(pairs=coins_data)
+                if is_frame
+                else analyzer.get_history_async(pairs=coins_data)
+            )
+            analyses = await get_batch_analysis_async(
+                analyzer=analyzer, pairs=coins_data
+            )
+        else:
+            analyzer = CryptoAnalyzer(
+                db=db_loader,
+                table_name=TABLE_NAME,
+                cache=query_cache,
+                engine=analytics_engine,
+            )
+            df_history = (
+                analyzer.load_frame(pairs=coins_data)
+                if is_frame
+                else analyzer.get_history(pairs=coins_data)
+            )
+            analyses = get_batch_analysis(analyzer=analyzer, pairs=coins_data)
+
+    if query_cache is not None:
+        query_cache.flush()
+        report = query_cache.get_report()
+        print(
+            f"Query cache stats. Hits: {report['hits']}, misses: {report['misses']}, "
+            f"hit ratio: {report['hit_ratio']:.2%}, entries: {report['entries']}, "
+            f"size: {report['memory_bytes']} bytes in memory, "
+            f"{report['disk_bytes']} bytes on disk."
         )
 
-        # visualize growth
-        days_to_lag = 3
-        df_volatility_data = analyzer.get_volatility(
-            column=ColumnsToAnalyzeEnum.price.value,
-            lag_to_row=days_to_lag,
-            coin_name=coin,
+    # go through every (coin_name, currency) pair and save visualised data as images
+    for coin, currency in coins_data:
+        visualize_pair_analysis(
+            analysis=analyses[(coin, currency)],
+            df_crypto=df_history,
+            coin=coin,
             currency=currency,
         )
-        CryptoVisualizer.plot_volatility(
-            df=df_volatility_data,
-            column=ColumnsToVisualizeEnum.price.value,
-            days_to_lag=days_to_lag,
-        )
-        continue
 
 
 if __name__ == "__main__":
@@ -12,6 +12,66 @@ CREATE TABLE `crypto_data` (
     `price` DECIMAL(18, 2) NOT NULL,
     `volume` DECIMAL(30, 2) NOT NULL,
     `capitalization` DECIMAL(40, 2) NOT NULL,
+    `price_open` DECIMAL(18, 2) NULL,
+    `price_high` DECIMAL(18, 2) NULL,
+    `price_low` DECIMAL(18, 2) NULL,
+    `sample_count` INT NULL,
 
     PRIMARY KEY (`coin_name`, `date_key`, `currency`)
+);
+
+-- version token of every (coin_name, currency) pair, replaced on every load changing its rows
+DROP TABLE IF EXISTS `data_versions`;
+
+CREATE TABLE `data_versions` (
+    `table_name` VARCHAR(64) NOT NULL,
+    `coin_name` VARCHAR(50) NOT NULL,
+    `currency` VARCHAR(10) NOT NULL,
+    `version` BIGINT NOT NULL,
+
+    PRIMARY KEY (`table_name`, `coin_name`, `currency`)
+);
+
+-- sums and row count of every (coin_name, currency) pair and month, kept by every load
+DROP TABLE IF EXISTS `crypto_data_monthly_rollup`;
+
+CREATE TABLE `crypto_data_monthly_rollup` (
+    `coin_name` VARCHAR(50) NOT NULL,
+    `currency` VARCHAR(10) NOT NULL,
+    `year_month_key` VARCHAR(7) NOT NULL,
+    `price_sum` DECIMAL(30, 2) NOT NULL,
+    `volume_sum` DECIMAL(42, 2) NOT NULL,
+    `capitalization_sum` DECIMAL(52, 2) NOT NULL,
+    `row_count` INT NOT NULL,
+
+    PRIMARY KEY (`coin_name`, `currency`, `year_month_key`)
+);
+
+-- row index and cumulative sums of every row of (coin_name, currency) pair, kept by every load
+DROP TABLE IF EXISTS `crypto_data_prefix_rollup`;
+
+CREATE TABLE `crypto_data_prefix_rollup` (
+    `coin_name` VARCHAR(50) NOT NULL,
+    `currency` VARCHAR(10) NOT NULL,
+    `date_key` INT NOT NULL,
+    `row_index` INT NOT NULL,
+    `price` DECIMAL(18, 2) NOT NULL,
+    `volume` DECIMAL(30, 2) NOT NULL,
+    `capitalization` DECIMAL(40, 2) NOT NULL,
+    `price_cum` DECIMAL(38, 2) NOT NULL,
+    `volume_cum` DECIMAL(50, 2) NOT NULL,
+    `capitalization_cum` DECIMAL(60, 2) NOT NULL,
+
+    PRIMARY KEY (`coin_name`, `currency`, `date_key`),
+    UNIQUE (`coin_name`, `currency`, `row_index`)
+);
+
+-- rollups of data table are stale from start of load until they are updated
+DROP TABLE IF EXISTS `rollup_state`;
+
+CREATE TABLE `rollup_state` (
+    `table_name` VARCHAR(64) NOT NULL,
+    `is_stale` INT NOT NULL,
+
+    PRIMARY KEY (`table_name`)
 );
\ No newline at end of file
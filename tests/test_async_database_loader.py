@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.AsyncDatabaseLoader import AsyncDatabaseLoader
+
+
+@pytest.fixture
+def async_db(monkeypatch):
+    """Get async loader with mocked engine"""
+
+    for key, value in {
+        "DB_USER": "user",
+        "DB_PASSWORD": "password",
+        "DB_HOST": "localhost",
+        "INTERNAL_DB_PORT": "3306",
+        "DB_NAME": "crypto",
+    }.items():
+        monkeypatch.setenv(key, value)
+
+    async_db = AsyncDatabaseLoader(track_versions=True, maintain_rollups=True)
+
+    connection = MagicMock()
+    connection.run_sync = AsyncMock(side_effect=lambda fn: fn("sync_connection"))
+    connection.execute = AsyncMock()
+    async_db.engine = MagicMock()
+    async_db.engine.connect.return_value.__aenter__.return_value = connection
+    async_db.bulk_loader = MagicMock()
+    return async_db
+
+
+def test_connection_string_uses_async_driver(async_db):
+    """Check that async loader connects through aiomysql"""
+
+    assert async_db.connection_string.startswith("mysql+aiomysql://user:")
+
+
+@pytest.mark.asyncio
+async def test_load_dataframe_runs_bulk_loader_on_connection(async_db):
+    """Check that bulk loader, versions and rollups run on one async connection through run_sync"""
+
+    stats = {"rows": 1, "changed_keys": [], "changed_pairs": {("bitcoin", "usd")}}
+    async_db.bulk_loader.load_with_connection.return_value = stats
+    async_db.data_versions = MagicMock()
+    async_db.rollups = MagicMock()
+    df = pd.DataFrame({"coin_name": ["bitcoin"], "date_key": [20240101]})
+
+    assert (
+        await async_db.load_dataframe_async(
+            df=df, table_name="crypto_data", mode="merge"
+        )
+        == stats
+    )
+    kwargs = async_db.bulk_loader.load_with_connection.call_args.kwargs
+    assert kwargs["conn"] == "sync_connection"
+    assert kwargs["mode"] == "merge"
+    async_db.data_versions.bump.assert_called_once_with(
+        conn="sync_connection", table_name="crypto_data", pairs={("bitcoin", "usd")}
+    )
+    async_db.rollups.mark_stale.assert_called_once_with(
+        conn="sync_connection", table_name="crypto_data"
+    )
+    async_db.rollups.update.assert_called_once_with(
+        conn="sync_connection", table_name="crypto_data", keys=[]
+    )
+
+
+@pytest.mark.asyncio
+async def test_watermarks(async_db):
+    """Check that watermarks are built from grouped query rows"""
+
+    connection = async_db.engine.connect.return_value.__aenter__.return_value
+    result = MagicMock()
+    result.fetchall.return_value = [("bitcoin", "usd", 20240105)]
+    connection.execute.return_value = result
+
+    assert await async_db.get_watermarks_async(table_name="crypto_data") == {
+        ("bitcoin", "usd"): 20240105
+    }
@@ -1,7 +1,9 @@
 import pytest
 import asyncio
+import time
 from unittest.mock import AsyncMock, MagicMock
 from app.BaseFetchClass import BaseFetchClass
+from app.ResponseCache import ResponseCache
 
 
 @pytest.mark.asyncio
@@ -10,7 +12,7 @@ async def test_fetch_data_success():
 
     mock_response = AsyncMock()
     mock_response.status = 200
-    mock_response.json.return_value = {"prices": [[123, 456]]}
+    mock_response.read.return_value = b'{"prices": [[123, 456]]}'
 
     mock_session = MagicMock()
     mock_session.get.return_value.__aenter__.return_value = mock_response
@@ -23,12 +25,13 @@ async def test_fetch_data_success():
 
 @pytest.mark.asyncio
 async def test_fetch_data_rate_limit_429():
-    """Check rate limit functionality"""
+    """Check that pair is dropped only after every retry hits rate limit"""
 
-    fetcher = BaseFetchClass()
+    fetcher = BaseFetchClass(max_retries=0)
 
     mock_response = AsyncMock()
     mock_response.status = 429
+    mock_response.headers = {}
     mock_response.text.return_value = "Rate limit exceeded"
 
     mock_session = MagicMock()
@@ -37,6 +40,129 @@ async def test_fetch_data_rate_limit_429():
     result = await fetcher._fetch_data(mock_session, "http://api.com", {})
 
     assert result == {}
+    assert fetcher.stats["rate_limited"] == 1
+    assert fetcher.stats["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_fetch_data_retries_after_rate_limit():
+    """Check that rate limited request is retried honoring Retry-After"""
+
+    fetcher = BaseFetchClass(max_concurrent=4)
+
+    limited_response = AsyncMock()
+    limited_response.status = 429
+    limited_response.headers = {"Retry-After": "0"}
+
+    ok_response = AsyncMock()
+    ok_response.status = 200
+    ok_response.read.return_value = b'{"prices": [[123, 456]]}'
+
+    mock_session = MagicMock()
+    mock_session.get.return_value.__aenter__.side_effect = [
+        limited_response,
+        ok_response,
+    ]
+
+    result = await fetcher._fetch_data(mock_session, "http://api.com", {})
+
+    assert result == {"prices": [[123, 456]]}
+    assert fetcher.stats["retries"] == 1
+    assert fetcher.stats["rate_limited"] == 1
+    assert fetcher.stats["failed"] == 0
+
+    # concurrency is decreased after rate limit
+    assert fetcher.limiter.concurrency_limit < 4
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_clamped_to_backoff_max():
+    """Check that long Retry-After doesn't sleep or pause requests longer than backoff_max"""
+
+    fetcher = BaseFetchClass(backoff_max=0.05)
+
+    limited_response = AsyncMock()
+    limited_response.status = 429
+    limited_response.headers = {"Retry-After": "3600"}
+
+    ok_response = AsyncMock()
+    ok_response.status = 200
+    ok_response.read.return_value = b'{"prices": []}'
+
+    mock_session = MagicMock()
+    mock_session.get.return_value.__aenter__.side_effect = [
+        limited_response,
+        ok_response,
+    ]
+
+    started = time.monotonic()
+    result = await fetcher._fetch_data(mock_session, "http://api.com", {})
+
+    assert result == {"prices": []}
+    assert fetcher.stats["backoff_time"] == 0.05
+    assert fetcher.limiter._paused_until <= started + 1
+    assert time.monotonic() - started < 1
+
+
+@pytest.mark.asyncio
+async def test_fetch_data_retries_server_error():
+    """Check that server errors are retried with backoff"""
+
+    fetcher = BaseFetchClass(backoff_base=0)
+
+    error_response = AsyncMock()
+    error_response.status = 503
+
+    ok_response = AsyncMock()
+    ok_response.status = 200
+    ok_response.read.return_value = b'{"prices": []}'
+
+    mock_session = MagicMock()
+    mock_session.get.return_value.__aenter__.side_effect = [
+        error_response,
+        error_response,
+        ok_response,
+    ]
+
+    result = await fetcher._fetch_data(mock_session, "http://api.com", {})
+
+    assert result == {"prices": []}
+    assert fetcher.stats["server_errors"] == 2
+    assert fetcher.stats["requests"] == 3
+
+
+def test_parse_retry_after():
+    """Check parsing of Retry-After header"""
+
+    assert BaseFetchClass._parse_retry_after("12") == 12.0
+    assert BaseFetchClass._parse_retry_after(None) is None
+    assert BaseFetchClass._parse_retry_after("garbage") is None
+    assert BaseFetchClass._parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_rate():
+    """Check that token bucket delays requests above requests per minute"""
+
+    fetcher = BaseFetchClass(max_concurrent=2, requests_per_minute=600, burst=1)
+
+    mock_response = AsyncMock()
+    mock_response.status = 200
+    mock_response.read.return_value = b"{}"
+
+    mock_session = MagicMock()
+    mock_session.get.return_value.__aenter__.return_value = mock_response
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await asyncio.gather(
+        *[fetcher._fetch_data(mock_session, f"url_{i}", {}) for i in range(3)]
+    )
+    elapsed = loop.time() - start
+
+    # 10 requests per second with burst of 1 token
+    assert elapsed >= 0.18
+    assert fetcher.stats["wait_time"] > 0
 
 
 @pytest.mark.asyncio
@@ -56,7 +182,7 @@ async def test_semaphore_limits_concurrency(monkeypatch):
 
         mock_res = AsyncMock()
         mock_res.status = 200
-        mock_res.json.return_value = {}
+        mock_res.read.return_value = b"{}"
         return mock_res
 
     mock_session = MagicMock()
@@ -74,7 +200,7 @@ async def test_fetch_data_api_internal_error():
     fetcher = BaseFetchClass()
     mock_response = AsyncMock()
     mock_response.status = 200
-    mock_response.json.return_value = {"error": "Invalid API Key"}
+    mock_response.read.return_value = b'{"error": "Invalid API Key"}'
 
     mock_session = MagicMock()
     mock_session.get.return_value.__aenter__.return_value = mock_response
@@ -86,10 +212,88 @@ async def test_fetch_data_api_internal_error():
 @pytest.mark.asyncio
 async def test_fetch_data_timeout():
     """Test that code correctly handles timeout error"""
-    fetcher = BaseFetchClass()
+    fetcher = BaseFetchClass(max_retries=0)
     mock_session = MagicMock()
 
     mock_session.get.side_effect = asyncio.TimeoutError()
 
     result = await fetcher._fetch_data(mock_session, "http://api.com", {})
     assert result == {}
+
+
+@pytest.mark.asyncio
+async def test_gather_data_uses_cache(tmp_path):
+    """Check that cached responses are returned without requests"""
+
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    params = {"vs_currency": "usd", "from": 0, "to": 86400}
+    cache.set("http://api.com", params, b'{"prices": [[123, 456]]}')
+
+    fetcher = BaseFetchClass(cache=cache)
+    result = await fetcher.gather_data([("http://api.com", params)])
+
+    assert result == [{"prices": [[123, 456]]}]
+    assert fetcher.stats["requests"] == 0
+    assert cache.get_report()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_long_lived_session_is_reused():
+    """Check that context manager owns one session for its whole lifetime"""
+
+    async with BaseFetchClass(limit_per_host=5, dns_cache_ttl=60) as fetcher:
+        session = fetcher._session
+
+        async with fetcher._session_scope() as first:
+            pass
+        async with fetcher._session_scope() as second:
+            pass
+
+        assert first is session
+        assert second is session
+        assert not session.closed
+        assert session.connector.limit_per_host == 5
+
+    assert session.closed
+    assert fetcher._session is None
+
+
+@pytest.mark.asyncio
+async def test_temporary_session_without_context_manager():
+    """Check that temporary session is closed after use"""
+
+    fetcher = BaseFetchClass()
+
+    async with fetcher._session_scope() as session:
+        assert not session.closed
+
+    assert session.closed
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_are_coalesced(monkeypatch):
+    """Check that concurrent callers of the same request share one fetch"""
+
+    fetcher = BaseFetchClass()
+    calls = 0
+
+    async def mocked_fetch(session, base_url, params):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"prices": [[123, 456]]}
+
+    monkeypatch.setattr(fetcher, "_fetch_data", mocked_fetch)
+
+    urls = [
+        ("http://api.com/coins/bitcoin", {"vs_currency": "usd", "from": 1}),
+        ("http://api.com/coins/Bitcoin/", {"from": 1, "vs_currency": "usd"}),
+        ("http://api.com/coins/bitcoin", {"vs_currency": "usd", "from": 1}),
+        ("http://api.com/coins/ethereum", {"vs_currency": "usd", "from": 1}),
+    ]
+    result = await fetcher.gather_data(urls)
+
+    assert calls == 2
+    assert fetcher.stats["coalesced"] == 2
+    assert result[0] is result[1]
+    assert fetcher._in_flight == {}
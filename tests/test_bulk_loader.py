@@ -0,0 +1,234 @@
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import MagicMock
+
+from app.BulkLoader import BulkLoader
+
+
+@pytest.fixture
+def mock_conn():
+    """Get mock connection returning max_allowed_packet"""
+
+    conn = MagicMock()
+    conn.exec_driver_sql.return_value.fetchone.return_value = (64 * 1024 * 1024,)
+    return conn
+
+
+@pytest.fixture
+def mock_engine(mock_conn):
+    """Get mock engine whose connect() yields mock connection"""
+
+    engine = MagicMock()
+    engine.connect.return_value.__enter__.return_value = mock_conn
+    return engine
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame(
+        {
+            "date_key": [20240101, 20240102, 20240103, 20240104, 20240105],
+            "coin_name": pd.Categorical(["bitcoin"] * 5),
+            "price": [1.5, np.nan, 3.0, 4.0, 5.0],
+        }
+    )
+
+
+def get_statements(mock_conn, prefix: str) -> list:
+    return [
+        c
+        for c in mock_conn.exec_driver_sql.call_args_list
+        if c.args[0].startswith(prefix)
+    ]
+
+
+def test_insert_is_chunked_and_committed(mock_engine, mock_conn, df):
+    """Check that every chunk is one multi-row INSERT committed separately"""
+
+    loader = BulkLoader(
+        engine=mock_engine, strategy="insert", rows_per_statement=2, verbose=False
+    )
+    stats = loader.load(df=df, table_name="crypto_data")
+
+    inserts = get_statements(mock_conn, "INSERT IGNORE INTO `crypto_data`")
+    assert len(inserts) == 3
+    assert inserts[0].args[0].count("(%s, %s, %s)") == 2
+    # values are flattened Python objects with None in place of NaN
+    assert inserts[0].args[1] == (20240101, "bitcoin", 1.5, 20240102, "bitcoin", None)
+    assert type(inserts[0].args[1][0]) is int
+    assert mock_conn.commit.call_count == 3
+
+    assert stats["rows"] == 5
+    assert len(stats["chunk_latencies"]) == 3
+
+
+def test_insert_chunk_is_bounded_by_max_allowed_packet(mock_engine, mock_conn, df):
+    """Check that rows per statement shrink to fit into max_allowed_packet"""
+
+    mock_conn.exec_driver_sql.return_value.fetchone.return_value = (100,)
+    loader = BulkLoader(engine=mock_engine, strategy="insert", verbose=False)
+    loader.load(df=df, table_name="crypto_data")
+
+    inserts = get_statements(mock_conn, "INSERT IGNORE")
+    assert len(inserts) > 1
+    assert all(len(c.args[1]) <= 6 for c in inserts)
+
+
+def test_infile_loads_tsv_chunks(mock_engine, mock_conn, df):
+    """Check that LOAD DATA reads TSV file with NULL markers"""
+
+    contents = []
+
+    def read_file(sql, *args):
+        if sql.startswith("LOAD DATA"):
+            path = sql.split("'")[1]
+            with open(path, encoding="utf-8") as file:
+                contents.append(file.read())
+        return MagicMock()
+
+    mock_conn.exec_driver_sql.side_effect = read_file
+    loader = BulkLoader(
+        engine=mock_engine, strategy="infile", rows_per_statement=3, verbose=False
+    )
+    stats = loader.load(df=df, table_name="crypto_data")
+
+    assert len(contents) == 2
+    assert contents[0].splitlines()[1] == "20240102\tbitcoin\t\\N"
+    assert stats["rows"] == 5
+    assert mock_conn.commit.call_count == 2
+
+
+def test_auto_picks_fastest_strategy(mock_engine, df):
+    """Check that probing remembers the fastest strategy for next loads"""
+
+    loader = BulkLoader(engine=mock_engine, sample_rows=2, verbose=False)
+    speeds = {"insert": 100.0, "infile": 1000.0}
+
+    def fake_load(strategy):
+        def load(conn, df, table_name, **kwargs):
+            stats = BulkLoader._make_stats(strategy=strategy)
+            BulkLoader._add_chunk(stats, len(df), len(df) / speeds[strategy])
+            return stats
+
+        return load
+
+    loader.load_insert = MagicMock(side_effect=fake_load("insert"))
+    loader.load_infile = MagicMock(side_effect=fake_load("infile"))
+
+    stats = loader.load(df=df, table_name="crypto_data")
+
+    assert stats["strategy"] == "infile"
+    assert stats["rows"] == 5
+    assert stats["probes"] == {"insert": 100.0, "infile": 1000.0}
+    # rest of frame after both probes is loaded with the winner
+    assert len(loader.load_infile.call_args_list[-1].kwargs["df"]) == 1
+
+    loader.load(df=df, table_name="crypto_data")
+    assert loader.load_insert.call_count == 1
+
+
+def test_auto_falls_back_when_infile_is_disabled(mock_engine, df):
+    """Check that rows of failed LOAD DATA probe are loaded with INSERT"""
+
+    loader = BulkLoader(engine=mock_engine, sample_rows=2, verbose=False)
+    loader.load_infile = MagicMock(side_effect=Exception("local infile disabled"))
+
+    stats = loader.load(df=df, table_name="crypto_data")
+
+    assert stats["strategy"] == "insert"
+    assert stats["rows"] == 5
+    assert loader._best_strategy == "insert"
+
+
+def test_upsert_updates_value_columns(mock_engine, mock_conn, df):
+    """Check that upsert always uses INSERT with ON DUPLICATE KEY UPDATE"""
+
+    loader = BulkLoader(engine=mock_engine, strategy="infile", verbose=False)
+    loader.load(df=df, table_name="crypto_data", mode="upsert")
+
+    inserts = get_statements(mock_conn, "INSERT INTO `crypto_data`")
+    assert len(inserts) == 1
+    assert (
+        inserts[0].args[0].endswith("ON DUPLICATE KEY UPDATE `price` = VALUES(`price`)")
+    )
+    assert not get_statements(mock_conn, "LOAD DATA")
+
+
+def test_merge_uses_staging_table(mock_engine, mock_conn, df):
+    """Check that merge loads staging table, counts changes and applies one statement"""
+
+    # keys of changed rows with inserted flag, then count of staged rows
+    mock_conn.exec_driver_sql.return_value.fetchall.return_value = [
+        ("bitcoin", 20240101, "usd", 1),
+        ("bitcoin", 20240102, "usd", 1),
+        ("bitcoin", 20240103, "usd", 0),
+    ]
+    mock_conn.exec_driver_sql.return_value.fetchone.return_value = (5,)
+    loader = BulkLoader(
+        engine=mock_engine, strategy="insert", verbose=False, track_changes=True
+    )
+    stats = loader.load(df=df, table_name="crypto_data", mode="merge")
+
+    statements = [c.args[0] for c in mock_conn.exec_driver_sql.call_args_list]
+    assert statements[1] == (
+        "CREATE TEMPORARY TABLE `crypto_data_staging` LIKE `crypto_data`"
+    )
+    assert get_statements(mock_conn, "INSERT IGNORE INTO `crypto_data_staging`")
+
+    merge = get_statements(mock_conn, "INSERT INTO `crypto_data`")
+    assert len(merge) == 1
+    assert "SELECT `date_key`, `coin_name`, `price` FROM `crypto_data_staging`" in (
+        merge[0].args[0]
+    )
+    assert merge[0].args[0].endswith("ON DUPLICATE KEY UPDATE `price` = s.`price`")
+    assert statements[-1] == "DROP TEMPORARY TABLE IF EXISTS `crypto_data_staging`"
+
+    assert stats["inserted"] == 2
+    assert stats["updated"] == 1
+    assert stats["unchanged"] == 2
+    assert stats["changed_pairs"] == {("bitcoin", "usd")}
+    assert stats["changed_keys"][0]["date_key"].tolist() == [
+        20240101,
+        20240102,
+        20240103,
+    ]
+
+
+def test_changed_keys_of_loaded_chunks(mock_engine, mock_conn, df):
+    """Check that keys of chunks which changed rows are tracked without reading target table"""
+
+    mock_conn.exec_driver_sql.return_value.rowcount = 2
+    df = df.assign(currency=pd.Categorical(["usd"] * 5))
+
+    loader = BulkLoader(
+        engine=mock_engine,
+        strategy="insert",
+        rows_per_statement=2,
+        verbose=False,
+        track_changes=True,
+    )
+    stats = loader.load(df=df, table_name="crypto_data", mode="upsert")
+
+    assert not get_statements(mock_conn, "SELECT `coin_name`")
+    assert stats["changed_pairs"] == {("bitcoin", "usd")}
+    assert (
+        pd.concat(stats["changed_keys"])["date_key"].tolist() == df["date_key"].tolist()
+    )
+
+    # chunks which changed nothing and loads without tracking report no keys
+    mock_conn.exec_driver_sql.return_value.rowcount = 0
+    stats = loader.load(df=df, table_name="crypto_data", mode="upsert")
+    assert stats["changed_keys"] == []
+    loader.track_changes = False
+    mock_conn.exec_driver_sql.return_value.rowcount = 2
+    stats = loader.load(df=df, table_name="crypto_data", mode="upsert")
+    assert stats["changed_pairs"] == set()
+
+
+def test_unknown_mode(mock_engine, df):
+    """Check that unknown mode is rejected"""
+
+    loader = BulkLoader(engine=mock_engine, verbose=False)
+    with pytest.raises(ValueError):
+        loader.load(df=df, table_name="crypto_data", mode="replace")
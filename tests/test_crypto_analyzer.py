@@ -1,7 +1,11 @@
+from decimal import Decimal
+
 import pytest
 import pandas as pd
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 from app.CryptoAnalyzer import CryptoAnalyzer
+from app.ResultFrame import make_dataframe
+from app.enums.AnalyticsEngineEnum import AnalyticsEngineEnum
 from app.enums.ColumnsToAnalyzeEnum import ColumnsToAnalyzeEnum
 from app.enums.OrderEnum import OrderEnum
 
@@ -12,6 +16,14 @@ def mock_db():
     return MagicMock()
 
 
+def returns_rows(rows: list[tuple]):
+    """Get fetch_dataframe side effect building typed frame like database loader"""
+
+    return lambda query, schema: make_dataframe(
+        rows=rows, columns=list(schema), schema=schema
+    )
+
+
 @pytest.fixture
 def analyzer(mock_db):
     """Get mock crypto analyzer"""
@@ -21,21 +33,20 @@ def analyzer(mock_db):
 def test_get_spikes_query_generation(analyzer, mock_db):
     """Test if SQL string is correct and pandas dataframe is created"""
 
-    mock_db.execute_query.return_value = [
-        {"coin_name": "bitcoin", "date_key": 20240101, "price": 42000, "price_rank": 1}
-    ]
+    mock_db.fetch_dataframe.side_effect = returns_rows(
+        [("bitcoin", 20240101, "usd", Decimal("42000.00"), 1)]
+    )
 
     df = analyzer.get_spikes(
         up_to_rank=3,
         column=ColumnsToAnalyzeEnum.price.value,
         order=OrderEnum.descending.value,
-        coin_name="bitcoin",
-        currency="usd",
+        pairs=[("bitcoin", "usd")],
         start_date_key="20240101",
         end_date_key="20240131",
     )
 
-    called_sql = mock_db.execute_query.call_args[1]["query"]
+    called_sql = mock_db.fetch_dataframe.call_args[1]["query"]
 
     assert "FROM test_crypto_table" in called_sql
     assert "WHERE coin_name = 'bitcoin'" in called_sql
@@ -44,19 +55,156 @@ def test_get_spikes_query_generation(analyzer, mock_db):
 
     assert isinstance(df, pd.DataFrame)
     assert df.iloc[0]["price"] == 42000
+    assert df["price"].dtype == "float64"
 
 
 def test_get_volatility_empty_result(analyzer, mock_db):
     """Test if result is correct if database is empty"""
 
-    mock_db.execute_query.return_value = []
+    mock_db.fetch_dataframe.side_effect = returns_rows([])
 
     df = analyzer.get_volatility(
         column=ColumnsToAnalyzeEnum.price.value,
         lag_to_row=1,
-        coin_name="unknown",
-        currency="usd",
+        pairs=[("unknown", "usd")],
     )
 
     assert isinstance(df, pd.DataFrame)
     assert df.empty
+    assert list(df.columns) == ["price_growth", "coin_name", "date_key", "currency"]
+    assert df["date_key"].dtype == "int64"
+
+
+@pytest.mark.asyncio
+async def test_async_methods_match_sync_queries(analyzer, mock_db):
+    """Test if async methods send the same SQL as sync ones"""
+
+    mock_db.fetch_dataframe.side_effect = returns_rows([])
+    mock_db.fetch_dataframe_async = AsyncMock(
+        side_effect=returns_rows([(1.0, "bitcoin", 20240101, "usd")])
+    )
+
+    kwargs = {
+        "column": ColumnsToAnalyzeEnum.price.value,
+        "lag_to_row": 3,
+        "pairs": [("bitcoin", "usd")],
+    }
+    analyzer.get_volatility(**kwargs)
+    df = await analyzer.analyze_async(name="volatility", **kwargs)
+
+    assert (
+        mock_db.fetch_dataframe_async.call_args[1]["query"]
+        == mock_db.fetch_dataframe.call_args[1]["query"]
+    )
+    assert df.iloc[0]["price_growth"] == 1.0
+
+    with pytest.raises(ValueError):
+        await analyzer.analyze_async(name="unknown")
+
+
+def test_batch_query_filters_every_pair(analyzer, mock_db):
+    """Test if batch query filters all pairs at once and result is split by pair"""
+
+    mock_db.fetch_dataframe.side_effect = returns_rows(
+        [
+            ("bitcoin", "usd", 20240101, 1.0, 1.0),
+            ("ethereum", "eur", 20240101, 2.0, 2.0),
+        ]
+    )
+
+    result = analyzer.get_moving_average(
+        column=ColumnsToAnalyzeEnum.price.value,
+        preceding_days=1,
+        following_days=1,
+        pairs=[("bitcoin", "usd"), ("ethereum", "eur"), ("solana", "usd")],
+        by_pair=True,
+    )
+
+    called_sql = mock_db.fetch_dataframe.call_args[1]["query"]
+
+    assert mock_db.fetch_dataframe.call_count == 1
+    assert (
+        "WHERE ((coin_name = 'bitcoin' AND currency = 'usd') "
+        "OR (coin_name = 'ethereum' AND currency = 'eur') "
+        "OR (coin_name = 'solana' AND currency = 'usd'))"
+    ) in called_sql
+    assert result[("ethereum", "eur")].iloc[0]["moving_avg_price"] == 2.0
+    assert result[("solana", "usd")].empty
+    assert list(result[("solana", "usd")].columns) == list(
+        result[("bitcoin", "usd")].columns
+    )
+
+
+def test_batch_query_of_all_pairs(analyzer, mock_db):
+    """Test if batch query without pairs has no pair filter"""
+
+    mock_db.fetch_dataframe.side_effect = returns_rows([])
+
+    analyzer.get_monthly_analysis()
+
+    assert "WHERE" not in mock_db.fetch_dataframe.call_args[1]["query"]
+
+
+def test_multi_window_query(analyzer, mock_db):
+    """Test if every window and lag is computed in one query with one column each"""
+
+    mock_db.fetch_dataframe.side_effect = returns_rows(
+        [("bitcoin", "usd", 20240101, 1.0, 1.0, 1.0)]
+    )
+
+    df = analyzer.get_moving_averages(
+        column=ColumnsToAnalyzeEnum.price.value,
+        windows=[(6, 0), (29, 0), (6, 0)],
+        pairs=[("bitcoin", "usd")],
+    )
+
+    called_sql = mock_db.fetch_dataframe.call_args[1]["query"]
+    assert mock_db.fetch_dataframe.call_count == 1
+    assert called_sql.count("AVG(price) OVER") == 2
+    assert list(df.columns) == [
+        "coin_name",
+        "currency",
+        "date_key",
+        "price",
+        "moving_avg_price_6_0",
+        "moving_avg_price_29_0",
+    ]
+
+    mock_db.fetch_dataframe.side_effect = returns_rows([])
+    df = analyzer.get_growth(column=ColumnsToAnalyzeEnum.price.value, lags=[1, 7])
+
+    called_sql = mock_db.fetch_dataframe.call_args[1]["query"]
+    assert "LAG(price, 1)" in called_sql and "LAG(price, 7)" in called_sql
+    assert list(df.columns)[-2:] == ["price_growth_1", "price_growth_7"]
+
+    with pytest.raises(ValueError):
+        analyzer.get_growth(column=ColumnsToAnalyzeEnum.price.value, lags=[])
+
+
+def test_rollup_engine_reads_rollup_tables(mock_db):
+    """Test if rollup engine prepares rollups and falls back to data table without rollup query"""
+
+    analyzer = CryptoAnalyzer(
+        db=mock_db,
+        table_name="test_crypto_table",
+        engine=AnalyticsEngineEnum.rollup.value,
+    )
+    mock_db.fetch_dataframe.side_effect = returns_rows([])
+
+    analyzer.get_monthly_analysis(pairs=[("bitcoin", "usd")])
+
+    called_sql = mock_db.fetch_dataframe.call_args[1]["query"]
+    assert "FROM test_crypto_table_monthly_rollup" in called_sql
+    mock_db.prepare_rollups.assert_called_once_with(table_name="test_crypto_table")
+
+    analyzer.get_spikes(
+        up_to_rank=1,
+        column=ColumnsToAnalyzeEnum.price.value,
+        order=OrderEnum.descending.value,
+        start_date_key="20240101",
+        end_date_key="20240131",
+    )
+
+    called_sql = mock_db.fetch_dataframe.call_args[1]["query"]
+    assert "FROM test_crypto_table\n" in called_sql
+    assert mock_db.prepare_rollups.call_count == 1
@@ -0,0 +1,107 @@
+from app.CryptoExtracter import CryptoExtracter
+from app.consts import BASE_URL
+
+
+def test_calculate_url_params_full_window():
+    """Check that every pair gets the same range without watermarks"""
+
+    urls = CryptoExtracter.calculate_retrospective_url_params(
+        coins_data=[("bitcoin", "usd"), ("ethereum", "eur")],
+        starting_from=100,
+        up_to=200,
+    )
+
+    assert urls == [
+        (
+            f"{BASE_URL}/coins/bitcoin/market_chart/range",
+            {"vs_currency": "usd", "from": 100, "to": 200},
+        ),
+        (
+            f"{BASE_URL}/coins/ethereum/market_chart/range",
+            {"vs_currency": "eur", "from": 100, "to": 200},
+        ),
+    ]
+
+
+def test_calculate_url_params_from_watermarks():
+    """Check that pair with watermark starts from the beginning of its latest day"""
+
+    urls = CryptoExtracter.calculate_retrospective_url_params(
+        coins_data=[("bitcoin", "usd"), ("ethereum", "usd")],
+        starting_from=100,
+        up_to=1704200000,
+        watermarks={("bitcoin", "usd"): 20240101},
+    )
+
+    # 2024-01-01 00:00:00 UTC
+    assert urls[0][1]["from"] == 1704067200
+    # pair without rows is backfilled from the start of window
+    assert urls[1][1]["from"] == 100
+
+
+def test_incremental_coins_data_without_backfill():
+    """Check that pairs without rows are skipped when backfill is disabled"""
+
+    coins_data = [("bitcoin", "usd"), ("ethereum", "usd")]
+    watermarks = {("bitcoin", "usd"): 20240101}
+
+    assert CryptoExtracter.get_incremental_coins_data(
+        coins_data=coins_data, watermarks=watermarks, backfill=False
+    ) == [("bitcoin", "usd")]
+    assert (
+        CryptoExtracter.get_incremental_coins_data(
+            coins_data=coins_data, watermarks=watermarks
+        )
+        == coins_data
+    )
+
+
+def test_base_currency_coins_data():
+    """Check that every coin is fetched once in base currency plus native pairs"""
+
+    coins_data = [
+        ("bitcoin", "eur"),
+        ("bitcoin", "gbp"),
+        ("ethereum", "eur"),
+        ("ethereum", "gbp"),
+    ]
+
+    assert CryptoExtracter.get_base_currency_coins_data(
+        coins_data=coins_data,
+        base_currency="usd",
+        native_pairs=[("ethereum", "gbp")],
+    ) == [("bitcoin", "usd"), ("ethereum", "usd"), ("ethereum", "gbp")]
+
+
+def test_base_currency_watermarks():
+    """Check that base currency pair starts at the earliest watermark of pairs derived from it"""
+
+    coins_data = [
+        ("bitcoin", "usd"),
+        ("bitcoin", "eur"),
+        ("ethereum", "eur"),
+        ("ethereum", "gbp"),
+    ]
+    watermarks = {
+        ("bitcoin", "usd"): 20240110,
+        ("bitcoin", "eur"): 20240105,
+        ("ethereum", "eur"): 20240107,
+        ("ethereum", "gbp"): 20240103,
+    }
+
+    assert CryptoExtracter.get_base_currency_watermarks(
+        coins_data=coins_data,
+        watermarks=watermarks,
+        base_currency="usd",
+        native_pairs=[("ethereum", "gbp")],
+    ) == {
+        ("bitcoin", "usd"): 20240105,
+        ("ethereum", "usd"): 20240107,
+        ("ethereum", "gbp"): 20240103,
+    }
+
+    # pair without loaded rows needs full history of its base currency pair
+    del watermarks[("bitcoin", "eur")]
+    assert CryptoExtracter.get_base_currency_watermarks(
+        coins_data=coins_data, watermarks=watermarks, base_currency="usd"
+    ) == {("ethereum", "usd"): 20240103}
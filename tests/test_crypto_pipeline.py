@@ -0,0 +1,170 @@
+import asyncio
+
+import pytest
+from unittest.mock import MagicMock
+
+from app.CryptoExtracter import CryptoExtracter
+from app.CryptoPipeline import CryptoPipeline
+from app.DatabaseLoader import DatabaseLoader
+from app.enums.BackendEnum import BackendEnum
+
+
+def make_coin_data(timestamp: int, price: float) -> dict[str, list[list]]:
+    return {
+        "prices": [[timestamp, price]],
+        "total_volumes": [[timestamp, 1000.0]],
+        "market_caps": [[timestamp, 800000000.0]],
+    }
+
+
+@pytest.mark.asyncio
+async def test_pipeline_loads_in_batches(monkeypatch):
+    """Check that every fetched pair is normalized and loaded in batches"""
+
+    responses = {
+        "bitcoin": make_coin_data(1704067200000, 42000.0),
+        "ethereum": make_coin_data(1704067200000, 2300.0),
+        "solana": {},
+    }
+
+    async def mocked_fetch(session, base_url, params):
+        return responses[base_url]
+
+    extracter = CryptoExtracter()
+    monkeypatch.setattr(extracter, "_fetch_data", mocked_fetch)
+    db_loader = MagicMock()
+    db_loader.load_dataframe.return_value = {"rows": 1}
+
+    coins_data = [("bitcoin", "usd"), ("ethereum", "usd"), ("solana", "usd")]
+    urls = [(coin, {}) for coin, _ in coins_data]
+
+    pipeline = CryptoPipeline(
+        extracter=extracter, db_loader=db_loader, table_name="test", batch_size=1
+    )
+    df = await pipeline.run(urls=urls, coins_data=coins_data)
+
+    # failed pair is skipped, other pairs are loaded one batch each
+    assert db_loader.load_dataframe.call_count == 2
+    assert len(df) == 2
+    assert set(df["coin_name"]) == {"bitcoin", "ethereum"}
+    assert df["coin_name"].dtype == "category"
+
+
+@pytest.mark.asyncio
+async def test_pipeline_without_kept_frames(monkeypatch):
+    """Check that batches are loaded but not kept when keep_frames is not set"""
+
+    async def mocked_fetch(session, base_url, params):
+        return make_coin_data(1704067200000, 42000.0)
+
+    extracter = CryptoExtracter()
+    monkeypatch.setattr(extracter, "_fetch_data", mocked_fetch)
+    db_loader = MagicMock()
+    db_loader.load_dataframe.return_value = {"rows": 1}
+
+    coins_data = [("bitcoin", "usd"), ("ethereum", "usd")]
+    urls = [(coin, {}) for coin, _ in coins_data]
+
+    pipeline = CryptoPipeline(
+        extracter=extracter,
+        db_loader=db_loader,
+        table_name="test",
+        batch_size=1,
+        keep_frames=False,
+    )
+    df = await pipeline.run(urls=urls, coins_data=coins_data)
+
+    assert df.empty
+    assert db_loader.load_dataframe.call_count == 2
+    assert pipeline.loaded_rows == 2
+
+
+@pytest.mark.asyncio
+async def test_pipeline_raises_when_loader_fails(monkeypatch):
+    """Check that failed loader stops pipeline instead of blocking on full queue"""
+
+    async def mocked_fetch(session, base_url, params):
+        return make_coin_data(1704067200000, 42000.0)
+
+    extracter = CryptoExtracter()
+    monkeypatch.setattr(extracter, "_fetch_data", mocked_fetch)
+    db_loader = MagicMock()
+    db_loader.load_dataframe.side_effect = ValueError("load failed")
+
+    coins_data = [(f"coin_{i}", "usd") for i in range(6)]
+    urls = [(coin, {}) for coin, _ in coins_data]
+
+    pipeline = CryptoPipeline(
+        extracter=extracter,
+        db_loader=db_loader,
+        table_name="test",
+        batch_size=1,
+        max_buffered_batches=1,
+    )
+
+    run_task = asyncio.create_task(pipeline.run(urls=urls, coins_data=coins_data))
+    done, _ = await asyncio.wait({run_task}, timeout=5)
+
+    assert run_task in done
+    with pytest.raises(ValueError, match="load failed"):
+        run_task.result()
+    assert db_loader.load_dataframe.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_pipeline_raises_when_database_load_fails(monkeypatch, capsys):
+    """Check that load error reported by database loader stops pipeline and no rows are counted"""
+
+    async def mocked_fetch(session, base_url, params):
+        return make_coin_data(1704067200000, 42000.0)
+
+    extracter = CryptoExtracter()
+    monkeypatch.setattr(extracter, "_fetch_data", mocked_fetch)
+    # table is never created, so every load fails
+    db_loader = DatabaseLoader(backend=BackendEnum.sqlite.value)
+    db_loader.bulk_loader.verbose = False
+
+    coins_data = [(f"coin_{i}", "usd") for i in range(4)]
+    urls = [(coin, {}) for coin, _ in coins_data]
+
+    pipeline = CryptoPipeline(
+        extracter=extracter,
+        db_loader=db_loader,
+        table_name="missing_table",
+        batch_size=1,
+        max_buffered_batches=1,
+    )
+
+    run_task = asyncio.create_task(pipeline.run(urls=urls, coins_data=coins_data))
+    done, _ = await asyncio.wait({run_task}, timeout=5)
+
+    assert run_task in done
+    with pytest.raises(RuntimeError, match="was not loaded into missing_table"):
+        run_task.result()
+    assert pipeline.loaded_rows == 0
+    assert "Error while loading DataFrame into table" in capsys.readouterr().out
+
+
+@pytest.mark.asyncio
+async def test_stream_data_limits_in_flight(monkeypatch):
+    """Check that no more than max_in_flight requests are scheduled at once"""
+
+    in_flight = 0
+    max_observed = 0
+
+    async def mocked_fetch(session, base_url, params):
+        nonlocal in_flight, max_observed
+        in_flight += 1
+        max_observed = max(max_observed, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"url": base_url}
+
+    extracter = CryptoExtracter(max_concurrent=10)
+    monkeypatch.setattr(extracter, "_fetch_data", mocked_fetch)
+
+    urls = [(f"url_{i}", {}) for i in range(6)]
+    results = [result async for result in extracter.stream_data(urls, max_in_flight=2)]
+
+    assert max_observed == 2
+    assert sorted(index for index, _ in results) == list(range(6))
@@ -1,4 +1,5 @@
 import copy
+import numpy as np
 import pandas as pd
 import pytest
 
@@ -98,3 +99,278 @@ def test_normalize_empty_column(
         df = transformer.get_normalized_crypto()
 
         assert df.empty
+
+
+def test_normalize_numpy_input(
+    transformer: CryptoTransformer,
+    mock_api_data: list[dict[str, list[list]]],
+    mock_coins_data: list[tuple[str, str]],
+):
+    """Check that series decoded into NumPy arrays give the same result"""
+
+    numpy_data = [
+        {key: np.asarray(value, dtype=np.float64) for key, value in d.items()}
+        for d in mock_api_data
+    ]
+
+    transformer.normalize_crypto_data(data=mock_api_data, coins_data=mock_coins_data)
+    expected = transformer.get_normalized_crypto()
+
+    transformer.normalize_crypto_data(data=numpy_data, coins_data=mock_coins_data)
+    pd.testing.assert_frame_equal(transformer.get_normalized_crypto(), expected)
+
+
+def test_derive_currency_data(mock_api_data: list[dict[str, list[list]]]):
+    """Check that other currency is computed from base currency and FX rates"""
+
+    fx_data = {
+        "usd": {"prices": [[1704067200000, 40000.0], [1704153600000, 50000.0]]},
+        "eur": {"prices": [[1704067200000, 36000.0], [1704153600000, 40000.0]]},
+    }
+    fx_rates = CryptoTransformer.get_fx_rates(fx_data=fx_data, base_currency="usd")
+
+    data, coins_data = CryptoTransformer.derive_currency_data(
+        data=mock_api_data,
+        coins_data=[("bitcoin", "usd")],
+        fx_rates=fx_rates,
+        base_currency="usd",
+        currencies=["usd", "eur"],
+    )
+
+    assert coins_data == [("bitcoin", "usd"), ("bitcoin", "eur")]
+
+    # rate at the first timestamp is 36000 / 40000
+    assert data[1]["prices"][0, 1] == pytest.approx(42000.1234 * 0.9)
+    assert data[1]["market_caps"][0, 1] == pytest.approx(800000000.777 * 0.9)
+
+    # derived data is normalized like fetched one
+    transformer = CryptoTransformer()
+    transformer.normalize_crypto_data(data=data, coins_data=coins_data)
+    df = transformer.get_normalized_crypto()
+    assert set(df["currency"]) == {"usd", "eur"}
+
+
+def test_fx_rates_of_offset_timestamps():
+    """Check that FX rates are built from series sampled at different moments"""
+
+    day = 86400000
+    fx_data = {
+        "usd": {"prices": [[1704067200000, 40000.0], [1704067200000 + day, 50000.0]]},
+        # sampled minutes after usd series, the last point is far outside of it
+        "eur": {
+            "prices": [
+                [1704067200000 + 60000, 36000.0],
+                [1704067200000 + day / 2, 40500.0],
+                [1704067200000 + 5 * day, 1.0],
+            ]
+        },
+        "gbp": {"prices": [[1704067200000 + 10 * day, 1.0]]},
+    }
+
+    fx_rates = CryptoTransformer.get_fx_rates(fx_data=fx_data, base_currency="usd")
+
+    timestamps, rates = fx_rates["eur"]
+    assert timestamps.tolist() == [1704067200000 + 60000, 1704067200000 + day / 2]
+    assert rates[0] == pytest.approx(36000.0 / (40000.0 + 10000.0 * 60000 / day))
+    assert rates[1] == pytest.approx(0.9)
+    assert "gbp" not in fx_rates
+
+
+def test_derive_currency_data_skips_native_pairs(
+    mock_api_data: list[dict[str, list[list]]],
+):
+    """Check that natively fetched pairs are not derived"""
+
+    fx_rates = {"eur": (np.array([1704067200000.0]), np.array([0.9]))}
+
+    _, coins_data = CryptoTransformer.derive_currency_data(
+        data=mock_api_data,
+        coins_data=[("bitcoin", "usd")],
+        fx_rates=fx_rates,
+        base_currency="usd",
+        currencies=["usd", "eur"],
+        native_pairs=[("bitcoin", "eur")],
+    )
+
+    assert coins_data == [("bitcoin", "usd")]
+
+
+def test_vectorized_matches_pandas_path():
+    """Check that NumPy fast path gives output identical to DataFrame merges"""
+
+    hours = [1704067200000 + i * 3600000 for i in range(30)]
+    coin_data = {
+        "prices": [[t, 42000.0 + i * 0.125] for i, t in enumerate(hours)],
+        # shuffled and partially missing series
+        "total_volumes": [[t, 1000.555 + i] for i, t in enumerate(hours)][::-1][2:],
+        "market_caps": [[t, 8e8 + i * 0.333] for i, t in enumerate(hours) if i != 5],
+    }
+    duplicated_data = copy.deepcopy(coin_data)
+    duplicated_data["market_caps"].append(duplicated_data["market_caps"][0])
+
+    data = [coin_data, {}, duplicated_data, coin_data]
+    coins_data = [
+        ("bitcoin", "usd"),
+        ("ethereum", "usd"),
+        ("bitcoin", "eur"),
+        ("bitcoin", "usd"),
+    ]
+
+    pandas_transformer = CryptoTransformer(vectorized=False)
+    pandas_transformer.normalize_crypto_data(data=data, coins_data=coins_data)
+    numpy_transformer = CryptoTransformer(vectorized=True)
+    numpy_transformer.normalize_crypto_data(data=data, coins_data=coins_data)
+
+    pd.testing.assert_frame_equal(
+        numpy_transformer.get_normalized_crypto(),
+        pandas_transformer.get_normalized_crypto(),
+        check_exact=True,
+        check_index_type=True,
+    )
+
+
+def test_vectorized_matches_pandas_path_with_integer_payloads():
+    """Check that integer payloads keep int64 measures like DataFrame path"""
+
+    hours = [1704067200000 + i * 3600000 for i in range(5)]
+    integer_data = {
+        "prices": [[t, 42000 + i] for i, t in enumerate(hours)],
+        "total_volumes": [[t, 1000 * i] for i, t in enumerate(hours)],
+        "market_caps": [[t, 8 * 10**11 + i] for i, t in enumerate(hours)],
+    }
+    mixed_data = copy.deepcopy(integer_data)
+    mixed_data["prices"][0][1] = 42000.5
+
+    for data in ([integer_data], [integer_data, mixed_data]):
+        coins_data = [("bitcoin", "usd"), ("bitcoin", "eur")][: len(data)]
+        pandas_transformer = CryptoTransformer(vectorized=False)
+        pandas_transformer.normalize_crypto_data(data=data, coins_data=coins_data)
+        numpy_transformer = CryptoTransformer(vectorized=True)
+        numpy_transformer.normalize_crypto_data(data=data, coins_data=coins_data)
+
+        pd.testing.assert_frame_equal(
+            numpy_transformer.get_normalized_crypto(),
+            pandas_transformer.get_normalized_crypto(),
+            check_exact=True,
+        )
+
+    assert numpy_transformer.get_normalized_crypto().dtypes["price"] == np.float64
+    assert numpy_transformer.get_normalized_crypto().dtypes["volume"] == np.int64
+
+
+def test_aggregate_daily_ohlcv():
+    """Check that hourly points are reduced to one OHLCV row per day"""
+
+    day_start = 1704067200000
+    hours = [day_start + i * 3600000 for i in range(26)]
+    prices = [100.0, 120.0, 90.0] + [110.0] * 20 + [105.0, 200.0, 201.0]
+    coin_data = {
+        "prices": [[t, p] for t, p in zip(hours, prices)],
+        "total_volumes": [[t, float(i)] for i, t in enumerate(hours)],
+        "market_caps": [[t, float(i * 10)] for i, t in enumerate(hours)],
+    }
+
+    transformer = CryptoTransformer(aggregate_daily=True)
+    transformer.normalize_crypto_data(data=[coin_data], coins_data=[("bitcoin", "usd")])
+    df = transformer.get_normalized_crypto()
+
+    assert len(df) == 2
+
+    first_day = df[df["date_key"] == 20240101].iloc[0]
+    assert first_day["price_open"] == 100.0
+    assert first_day["price_high"] == 120.0
+    assert first_day["price_low"] == 90.0
+    assert first_day["price"] == 105.0
+    assert first_day["volume"] == 23.0
+    assert first_day["capitalization"] == 230.0
+    assert first_day["sample_count"] == 24
+
+    second_day = df[df["date_key"] == 20240102].iloc[0]
+    assert second_day["price_open"] == 200.0
+    assert second_day["price"] == 201.0
+    assert second_day["sample_count"] == 2
+
+
+def test_aggregate_daily_ohlcv_counts_identical_points():
+    """Check that repeated identical intraday points are aggregated before deduplication"""
+
+    day_start = 1704067200000
+    hours = [day_start + i * 3600000 for i in range(4)]
+    prices = [100.0, 100.0, 90.0, 100.0]
+    coin_data = {
+        "prices": [[t, p] for t, p in zip(hours, prices)],
+        "total_volumes": [[t, 5.0] for t in hours],
+        "market_caps": [[t, 50.0] for t in hours],
+    }
+
+    for vectorized in (True, False):
+        transformer = CryptoTransformer(vectorized=vectorized, aggregate_daily=True)
+        transformer.normalize_crypto_data(
+            data=[coin_data], coins_data=[("bitcoin", "usd")]
+        )
+        df = transformer.get_normalized_crypto()
+
+        assert len(df) == 1
+        row = df.iloc[0]
+        assert row["sample_count"] == 4
+        assert (row["price_open"], row["price_low"], row["price"]) == (
+            100.0,
+            90.0,
+            100.0,
+        )
+
+
+def test_parallel_matches_serial(mock_api_data: list[dict[str, list[list]]]):
+    """Check that process pool normalization is identical to serial one"""
+
+    data = [mock_api_data[0], {}, mock_api_data[0], mock_api_data[0]]
+    coins_data = [
+        ("bitcoin", "usd"),
+        ("ethereum", "usd"),
+        ("bitcoin", "eur"),
+        ("solana", "usd"),
+    ]
+
+    serial_transformer = CryptoTransformer()
+    serial_transformer.normalize_crypto_data(data=data, coins_data=coins_data)
+    parallel_transformer = CryptoTransformer(workers=2)
+    parallel_transformer.normalize_crypto_data(data=data, coins_data=coins_data)
+
+    pd.testing.assert_frame_equal(
+        parallel_transformer.get_normalized_crypto(),
+        serial_transformer.get_normalized_crypto(),
+        check_exact=True,
+        check_index_type=True,
+    )
+
+
+def test_compact_schema(mock_api_data: list[dict[str, list[list]]]):
+    """Check memory-lean schema and memory report"""
+
+    coins_data = [("bitcoin", "usd"), ("ethereum", "usd")]
+    data = [mock_api_data[0], {}]
+
+    transformer = CryptoTransformer(compact=True, float32_measures=True)
+    transformer.normalize_crypto_data(data=data, coins_data=coins_data)
+    df = transformer.get_normalized_crypto()
+
+    assert df["date_key"].dtype == np.int32
+    assert df["volume"].dtype == np.float32
+    assert df["capitalization"].dtype == np.float32
+    assert df["price"].dtype == np.float64
+
+    # categories are known up front even for pairs without data
+    assert list(df["coin_name"].cat.categories) == ["bitcoin", "ethereum"]
+    assert df.iloc[0]["date_key"] == 20240101
+    assert df.iloc[0]["price"] == 42000.12
+    assert df.iloc[0]["capitalization"] == pytest.approx(800000000.78, rel=2**-24)
+
+    # cents of values from 2**17 upward don't survive float32
+    assert round(float(np.float32(131071.01)), 2) == 131071.01
+    assert round(float(np.float32(131072.01)), 2) != 131072.01
+
+    report = transformer.memory_report()
+    assert (
+        report.loc["date_key", "after_bytes"] < report.loc["date_key", "before_bytes"]
+    )
+    assert report.loc["total", "after_bytes"] < report.loc["total", "before_bytes"]
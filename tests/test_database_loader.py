@@ -0,0 +1,698 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import inspect
+from unittest.mock import MagicMock
+
+from app.CryptoAnalyzer import CryptoAnalyzer
+from app.DatabaseLoader import DatabaseLoader
+from app.GapScanner import GapScanner
+from app.QueryCache import QueryCache
+from app.Rollups import Rollups
+from app.SqlDialect import CRYPTO_DATA_COLUMNS
+from app.enums.AnalyticsEngineEnum import AnalyticsEngineEnum
+from app.enums.BackendEnum import BackendEnum
+from app.enums.ColumnsToAnalyzeEnum import ColumnsToAnalyzeEnum
+from app.enums.OrderEnum import OrderEnum
+
+TABLE_NAME = "crypto_data"
+
+
+def get_backends() -> list:
+    backends = [BackendEnum.sqlite.value]
+    try:
+        import duckdb_engine  # noqa: F401
+
+        backends.append(BackendEnum.duckdb.value)
+    except ImportError:
+        pass
+    return backends
+
+
+@pytest.fixture(params=get_backends())
+def db(request):
+    """Get in-memory embedded database with crypto data table"""
+
+    db = DatabaseLoader(
+        backend=request.param, track_versions=True, maintain_rollups=True
+    )
+    db.bulk_loader.verbose = False
+    db.create_table(TABLE_NAME)
+    return db
+
+
+def make_df(date_keys: list[int], prices: list[float]) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "price": prices,
+            "volume": [1000.0] * len(prices),
+            "capitalization": [5000.0] * len(prices),
+            "date_key": date_keys,
+            "coin_name": pd.Categorical(["bitcoin"] * len(prices)),
+            "currency": pd.Categorical(["usd"] * len(prices)),
+        }
+    )
+
+
+def make_parity_df() -> pd.DataFrame:
+    """
+    Get rows of pairs with edge cases for comparing analytics engines: ties,
+    zero values, gaps, month and leap day boundaries, pairs shorter than windows and lags
+    """
+
+    days = [
+        int(day.strftime("%Y%m%d")) for day in pd.date_range("2024-01-28", "2024-03-03")
+    ]
+    # missing days are gaps, rows are ordered by date_key and not by calendar
+    bitcoin_days = [day for day in days if day not in (20240201, 20240215, 20240216)]
+    bitcoin_prices = [
+        [2.5, 0.0, 10.99, 2.5, 3.01][i % 5] for i in range(len(bitcoin_days))
+    ]
+    pairs = [
+        ("bitcoin", "usd", bitcoin_days, bitcoin_prices),
+        # every value ties and zeros make growth NULL
+        ("tether", "usd", days[:12], [1.0] * 6 + [0.0] * 6),
+        # shorter than windows and lags
+        ("solana", "eur", [20240131, 20240201, 20240229], [0.07, 0.07, 0.05]),
+        ("ethereum", "usd", [20240229], [3001.5]),
+    ]
+
+    frames = []
+    for coin_name, currency, date_keys, prices in pairs:
+        df = make_df(date_keys, prices)
+        df["volume"] = [price * 1000 + i for i, price in enumerate(prices)]
+        df["capitalization"] = [price * 10**6 for price in prices]
+        frames.append(df.assign(coin_name=coin_name, currency=currency))
+
+    return pd.concat(frames, ignore_index=True)
+
+
+PARITY_QUERIES = {
+    "get_spikes": {
+        "up_to_rank": 2,
+        "column": ColumnsToAnalyzeEnum.price.value,
+        "order": OrderEnum.descending.value,
+        "start_date_key": "20240131",
+        "end_date_key": "20240229",
+    },
+    "get_moving_average": {
+        "column": ColumnsToAnalyzeEnum.price.value,
+        "preceding_days": 2,
+        "following_days": 3,
+    },
+    "get_moving_averages": {
+        "column": ColumnsToAnalyzeEnum.volume.value,
+        "windows": [(0, 0), (6, 0), (0, 6), (40, 40)],
+    },
+    "get_volatility": {
+        "column": ColumnsToAnalyzeEnum.price.value,
+        "lag_to_row": 1,
+    },
+    "get_growth": {
+        "column": ColumnsToAnalyzeEnum.capitalization.value,
+        "lags": [1, 2, 7],
+    },
+    "get_monthly_analysis": {},
+}
+
+
+def get_prefixes(db: DatabaseLoader) -> list[tuple[int, int, float]]:
+    rows = db.execute_query(
+        f"SELECT date_key, row_index, price_cum "
+        f"FROM {Rollups.get_prefix_table(TABLE_NAME)} ORDER BY date_key"
+    )
+    return [(row[0], row[1], float(row[2])) for row in rows or []]
+
+
+def get_prices(db: DatabaseLoader) -> list[float]:
+    rows = db.execute_query(f"SELECT price FROM {TABLE_NAME} ORDER BY date_key")
+    return [float(row[0]) for row in rows]
+
+
+def test_load_modes(db):
+    """Check ignore, upsert and merge modes on embedded backend"""
+
+    db.load_dataframe(
+        df=make_df([20240101, 20240102], [1.0, 2.0]), table_name=TABLE_NAME
+    )
+    db.load_dataframe(df=make_df([20240102], [20.0]), table_name=TABLE_NAME)
+    assert get_prices(db) == [1.0, 2.0]
+
+    db.load_dataframe(
+        df=make_df([20240102], [20.0]), table_name=TABLE_NAME, mode="upsert"
+    )
+    assert get_prices(db) == [1.0, 20.0]
+
+    stats = db.load_dataframe(
+        df=make_df([20240101, 20240102, 20240103], [1.0, 25.0, 3.0]),
+        table_name=TABLE_NAME,
+        mode="merge",
+    )
+    assert get_prices(db) == [1.0, 25.0, 3.0]
+    assert (stats["inserted"], stats["updated"], stats["unchanged"]) == (1, 1, 1)
+
+    assert db.get_watermarks(table_name=TABLE_NAME) == {("bitcoin", "usd"): 20240103}
+
+
+def test_changed_keys_of_ignore_and_upsert(db):
+    """Check that statements which change no row report no changed keys"""
+
+    df = pd.concat(
+        [
+            make_df([20240101, 20240102], [1.0, 2.0]),
+            make_df([20240101], [7.0]).assign(coin_name="ethereum"),
+        ],
+        ignore_index=True,
+    )
+    db.load_dataframe(df=df, table_name=TABLE_NAME)
+
+    stats = db.load_dataframe(df=df, table_name=TABLE_NAME)
+    assert stats["changed_pairs"] == set()
+
+    stats = db.load_dataframe(df=df, table_name=TABLE_NAME, mode="upsert")
+    assert stats["changed_pairs"] == set()
+
+    # keys of every row of statement which changed any of them are reported
+    df.loc[1, "price"] = 2.5
+    stats = db.load_dataframe(df=df, table_name=TABLE_NAME, mode="upsert")
+    assert stats["changed_pairs"] == {("bitcoin", "usd"), ("ethereum", "usd")}
+    assert len(pd.concat(stats["changed_keys"])) == 3
+
+    stats = db.load_dataframe(df=df.iloc[[0]], table_name=TABLE_NAME, mode="merge")
+    assert stats["changed_pairs"] == set()
+
+
+def test_create_table_adds_missing_columns(db):
+    """Check that table of older schema gets later nullable columns and accepts OHLCV rows"""
+
+    with db.engine.connect() as connection:
+        connection.exec_driver_sql(
+            db.dialect.create_table_sql(
+                "old_crypto_data",
+                columns=[
+                    c for c in CRYPTO_DATA_COLUMNS if not c[-1] or c[0] == "currency"
+                ],
+            )
+        )
+        connection.commit()
+
+    db.create_table("old_crypto_data")
+    db.create_table("old_crypto_data")
+
+    df = make_df([20240101], [1.0]).assign(
+        price_open=[0.5], price_high=[1.5], price_low=[0.4], sample_count=[24]
+    )
+    assert db.load_dataframe(df=df, table_name="old_crypto_data") is not None
+    rows = db.execute_query("SELECT price_high, sample_count FROM old_crypto_data")
+    assert [(float(row[0]), row[1]) for row in rows] == [(1.5, 24)]
+
+
+def test_analytics_and_gaps(db):
+    """Check that analyzer and gap scanner queries run on embedded backend"""
+
+    db.load_dataframe(
+        df=make_df([20240130, 20240131, 20240201, 20240205], [1.0, 2.0, 4.0, 8.0]),
+        table_name=TABLE_NAME,
+    )
+    analyzer = CryptoAnalyzer(db=db, table_name=TABLE_NAME)
+
+    df_spikes = analyzer.get_spikes(
+        up_to_rank=1,
+        column=ColumnsToAnalyzeEnum.price.value,
+        order=OrderEnum.descending.value,
+        pairs=[("bitcoin", "usd")],
+        start_date_key="20240101",
+        end_date_key="20240301",
+    )
+    assert df_spikes["date_key"].tolist() == [20240205]
+
+    df_volatility = analyzer.get_volatility(
+        column=ColumnsToAnalyzeEnum.price.value,
+        lag_to_row=1,
+        pairs=[("bitcoin", "usd")],
+    )
+    assert df_volatility["price_growth"].astype(float).tolist() == [100.0] * 3
+
+    df_moving_average = analyzer.get_moving_average(
+        column=ColumnsToAnalyzeEnum.price.value,
+        preceding_days=1,
+        following_days=0,
+        pairs=[("bitcoin", "usd")],
+    )
+    assert df_moving_average["moving_avg_price"].astype(float).tolist() == [
+        1.0,
+        1.5,
+        3.0,
+        6.0,
+    ]
+
+    df_monthly = analyzer.get_monthly_analysis(pairs=[("bitcoin", "usd")])
+    assert sorted(df_monthly["year_month_key"]) == ["2024-01", "2024-02"]
+
+    gaps = GapScanner(db=db, table_name=TABLE_NAME).find_gaps()
+    assert gaps == [("bitcoin", "usd", 20240202, 20240204)]
+
+
+def test_iter_dataframe_chunks(db):
+    """Check streamed chunks and typed zero-row result"""
+
+    db.load_dataframe(
+        df=make_df([20240101, 20240102, 20240103], [1.0, 2.0, 3.0]),
+        table_name=TABLE_NAME,
+    )
+    schema = {"date_key": "int64", "price": "float64"}
+
+    chunks = list(
+        db.iter_dataframe(
+            query=f"SELECT date_key, price FROM {TABLE_NAME} ORDER BY date_key",
+            schema=schema,
+            chunk_size=2,
+        )
+    )
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert chunks[1].iloc[0]["price"] == 3.0
+
+    df = db.fetch_dataframe(
+        query=f"SELECT date_key, price FROM {TABLE_NAME} WHERE date_key < 0",
+        schema=schema,
+    )
+    assert df.empty
+    assert df.dtypes.to_dict() == schema
+
+
+def test_iter_dataframe_error_mid_stream():
+    """Check that error after first chunk is raised and fetched result is not truncated"""
+
+    db = DatabaseLoader(backend=BackendEnum.sqlite.value)
+    # sqlite evaluates rows lazily, the last one overflows after two chunks are read
+    query = """
+        WITH RECURSIVE t(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM t WHERE x < 5)
+        SELECT ABS(CASE WHEN x = 5 THEN -9223372036854775808 ELSE x END) AS v FROM t
+    """
+
+    frames = db.iter_dataframe(query=query, schema={"v": "int64"}, chunk_size=2)
+    assert next(frames)["v"].tolist() == [1, 2]
+    with pytest.raises(Exception):
+        list(frames)
+
+    df = db.fetch_dataframe(query=query, schema={"v": "int64"}, chunk_size=2)
+    assert df.empty
+    assert list(df.columns) == ["v"]
+
+
+def test_batch_analytics(db):
+    """Check that batch query of several pairs matches per-pair queries"""
+
+    df_ethereum = make_df([20240101, 20240102, 20240103], [10.0, 20.0, 10.0])
+    df_ethereum["coin_name"] = "ethereum"
+    db.load_dataframe(
+        df=pd.concat([make_df([20240101, 20240102], [1.0, 3.0]), df_ethereum]),
+        table_name=TABLE_NAME,
+    )
+    analyzer = CryptoAnalyzer(db=db, table_name=TABLE_NAME)
+    pairs = [("bitcoin", "usd"), ("ethereum", "usd"), ("solana", "usd")]
+
+    volatility = analyzer.get_volatility(
+        column=ColumnsToAnalyzeEnum.price.value,
+        lag_to_row=1,
+        pairs=pairs,
+        by_pair=True,
+    )
+    assert list(volatility) == pairs
+    assert volatility[("bitcoin", "usd")]["price_growth"].tolist() == [200.0]
+    assert volatility[("ethereum", "usd")]["price_growth"].tolist() == [100.0, -50.0]
+    assert volatility[("solana", "usd")].empty
+
+    df_spikes = analyzer.get_spikes(
+        up_to_rank=1,
+        column=ColumnsToAnalyzeEnum.price.value,
+        order=OrderEnum.descending.value,
+        start_date_key="20240101",
+        end_date_key="20240131",
+    )
+    assert sorted(zip(df_spikes["coin_name"], df_spikes["date_key"])) == [
+        ("bitcoin", 20240102),
+        ("ethereum", 20240102),
+    ]
+
+    monthly = analyzer.get_monthly_analysis(pairs=pairs[:1], by_pair=True)
+    assert monthly[("bitcoin", "usd")]["avg_price"].tolist() == [2.0]
+
+
+def test_query_cache_invalidated_by_load(db):
+    """Check that cached results are reused until rows of their pair change"""
+
+    db.load_dataframe(
+        df=make_df([20240101, 20240102], [1.0, 2.0]), table_name=TABLE_NAME
+    )
+    versions = db.get_data_versions(table_name=TABLE_NAME)
+    assert list(versions) == [("bitcoin", "usd")]
+
+    # loading the same rows again changes nothing
+    db.load_dataframe(
+        df=make_df([20240101, 20240102], [1.0, 2.0]), table_name=TABLE_NAME
+    )
+    db.load_dataframe(
+        df=make_df([20240101], [1.0]), table_name=TABLE_NAME, mode="merge"
+    )
+    assert db.get_data_versions(table_name=TABLE_NAME) == versions
+
+    analyzer = CryptoAnalyzer(db=db, table_name=TABLE_NAME, cache=QueryCache())
+    kwargs = {"pairs": [("bitcoin", "usd")]}
+
+    first = analyzer.get_monthly_analysis(**kwargs)
+    second = analyzer.get_monthly_analysis(**kwargs)
+    pd.testing.assert_frame_equal(first, second)
+    assert analyzer.cache.get_report()["hits"] == 1
+
+    db.load_dataframe(
+        df=make_df([20240101], [7.0]), table_name=TABLE_NAME, mode="merge"
+    )
+    assert db.get_data_versions(table_name=TABLE_NAME) != versions
+    assert analyzer.get_monthly_analysis(**kwargs)["avg_price"].tolist() == [4.5]
+    assert analyzer.cache.get_report()["hits"] == 1
+
+
+def test_data_versions_are_seeded_and_read_once(db, monkeypatch):
+    """Check that pairs loaded without tracking get tokens and tokens are read again only after load"""
+
+    # rows loaded without version tracking have no token yet
+    db.bulk_loader.load(df=make_df([20240101], [1.0]), table_name=TABLE_NAME)
+    versions = db.get_data_versions(table_name=TABLE_NAME)
+    assert list(versions) == [("bitcoin", "usd")]
+    assert versions[("bitcoin", "usd")] != 0
+
+    analyzer = CryptoAnalyzer(db=db, table_name=TABLE_NAME, cache=QueryCache())
+    connect = db.engine.connect
+    monkeypatch.setattr(
+        db.engine, "connect", MagicMock(side_effect=AssertionError("reads versions"))
+    )
+    monkeypatch.setattr(db, "fetch_dataframe", MagicMock(wraps=db.fetch_dataframe))
+    assert db.get_data_versions(table_name=TABLE_NAME) == versions
+    monkeypatch.setattr(db.engine, "connect", connect)
+
+    kwargs = {"pairs": [("bitcoin", "usd")]}
+    analyzer.get_monthly_analysis(**kwargs)
+    analyzer.get_monthly_analysis(**kwargs)
+    assert db.fetch_dataframe.call_count == 1
+
+    # pair without rows has no token, its results are never cached
+    analyzer.get_monthly_analysis(pairs=[("bitcoin", "usd"), ("solana", "usd")])
+    analyzer.get_monthly_analysis(pairs=[("bitcoin", "usd"), ("solana", "usd")])
+    assert db.fetch_dataframe.call_count == 3
+
+    db.load_dataframe(df=make_df([20240102], [3.0]), table_name=TABLE_NAME)
+    assert db.get_data_versions(table_name=TABLE_NAME) != versions
+    assert analyzer.get_monthly_analysis(**kwargs)["avg_price"].tolist() == [2.0]
+
+
+def test_frame_engine_matches_sql(db):
+    """Check that in-process engine returns the same results as SQL queries"""
+
+    rng = np.random.default_rng(7)
+    date_keys = [
+        int(day.strftime("%Y%m%d")) for day in pd.date_range("2024-01-01", "2024-03-31")
+    ]
+    frames = []
+    for coin_name in ["bitcoin", "ethereum"]:
+        # few distinct values make ties and zero growth
+        df_pair = make_df(
+            date_keys, rng.choice([0.0, 1.5, 2.25, 3.01, 10.99], len(date_keys))
+        )
+        df_pair["volume"] = rng.integers(1, 10**6, len(date_keys)) / 100
+        df_pair["coin_name"] = coin_name
+        frames.append(df_pair)
+    df = pd.concat(frames, ignore_index=True)
+    db.load_dataframe(df=df, table_name=TABLE_NAME)
+
+    analyzer = CryptoAnalyzer(db=db, table_name=TABLE_NAME, df=df)
+    pairs = [("bitcoin", "usd"), ("ethereum", "usd")]
+    queries = {
+        "get_spikes": {
+            "up_to_rank": 3,
+            "column": ColumnsToAnalyzeEnum.price.value,
+            "order": OrderEnum.ascending.value,
+            "start_date_key": "20240110",
+            "end_date_key": "20240220",
+        },
+        "get_moving_average": {
+            "column": ColumnsToAnalyzeEnum.volume.value,
+            "preceding_days": 3,
+            "following_days": 2,
+        },
+        "get_volatility": {
+            "column": ColumnsToAnalyzeEnum.price.value,
+            "lag_to_row": 2,
+        },
+        "get_moving_averages": {
+            "column": ColumnsToAnalyzeEnum.price.value,
+            "windows": [(6, 0), (29, 0), (0, 0), (3, 2)],
+        },
+        "get_growth": {
+            "column": ColumnsToAnalyzeEnum.volume.value,
+            "lags": [1, 7, 30],
+        },
+        "get_monthly_analysis": {},
+    }
+    sort_columns = ["coin_name", "currency", "date_key"]
+
+    for name, kwargs in queries.items():
+        method = getattr(analyzer, name)
+        df_sql = method(**kwargs, pairs=pairs, engine=AnalyticsEngineEnum.sql.value)
+        df_frame = method(**kwargs, pairs=pairs, engine=AnalyticsEngineEnum.frame.value)
+        assert not df_frame.empty
+
+        columns = [column for column in sort_columns if column in df_sql] or [
+            "coin_name",
+            "year_month_key",
+        ]
+        pd.testing.assert_frame_equal(
+            df_frame.sort_values(columns).reset_index(drop=True),
+            df_sql.sort_values(columns).reset_index(drop=True),
+            check_exact=False,
+            rtol=1e-12,
+        )
+
+
+def test_frame_engine_loads_stored_history(db):
+    """Check that frame engine loaded from table sees rows of earlier loads"""
+
+    db.load_dataframe(
+        df=make_df([20240101, 20240102], [1.0, 2.0]), table_name=TABLE_NAME
+    )
+    db.load_dataframe(df=make_df([20240103], [4.0]), table_name=TABLE_NAME)
+
+    analyzer = CryptoAnalyzer(db=db, table_name=TABLE_NAME)
+    df_history = analyzer.load_frame(pairs=[("bitcoin", "usd")])
+    assert sorted(df_history["date_key"]) == [20240101, 20240102, 20240103]
+    pd.testing.assert_frame_equal(
+        analyzer.get_history(pairs=[("bitcoin", "usd")]), df_history
+    )
+    kwargs = {"pairs": [("bitcoin", "usd")]}
+
+    pd.testing.assert_frame_equal(
+        analyzer.get_volatility(
+            column=ColumnsToAnalyzeEnum.price.value,
+            lag_to_row=1,
+            engine=AnalyticsEngineEnum.frame.value,
+            **kwargs,
+        ),
+        analyzer.get_volatility(
+            column=ColumnsToAnalyzeEnum.price.value, lag_to_row=1, **kwargs
+        ),
+    )
+
+
+def test_rollup_engine_matches_sql(db):
+    """Check that rollups kept by incremental loads give the same results as SQL queries"""
+
+    rng = np.random.default_rng(11)
+    date_keys = [
+        int(day.strftime("%Y%m%d")) for day in pd.date_range("2024-01-01", "2024-03-31")
+    ]
+    df = make_df(date_keys, rng.choice([0.0, 1.5, 2.25, 10.99], len(date_keys)))
+    df["volume"] = rng.integers(1, 10**6, len(date_keys)) / 100
+
+    # rows loaded before rollups exist are added when they are prepared
+    db.bulk_loader.load(df=df.iloc[:40], table_name=TABLE_NAME)
+    db.prepare_rollups(table_name=TABLE_NAME)
+    # later loads append days, update days inside history and insert a missing one
+    db.load_dataframe(df=df.iloc[41:70], table_name=TABLE_NAME)
+    db.load_dataframe(
+        df=df.iloc[[10, 50]].assign(price=[3.01, 4.5]),
+        table_name=TABLE_NAME,
+        mode="merge",
+    )
+    db.load_dataframe(
+        df=df.iloc[[40] + list(range(70, len(df)))], table_name=TABLE_NAME
+    )
+
+    analyzer = CryptoAnalyzer(db=db, table_name=TABLE_NAME)
+    queries = {
+        "get_moving_average": {
+            "column": ColumnsToAnalyzeEnum.price.value,
+            "preceding_days": 3,
+            "following_days": 2,
+        },
+        "get_moving_averages": {
+            "column": ColumnsToAnalyzeEnum.volume.value,
+            "windows": [(6, 0), (29, 0), (0, 0), (200, 0)],
+        },
+        "get_volatility": {
+            "column": ColumnsToAnalyzeEnum.price.value,
+            "lag_to_row": 2,
+        },
+        "get_growth": {
+            "column": ColumnsToAnalyzeEnum.price.value,
+            "lags": [1, 7, 30],
+        },
+        "get_monthly_analysis": {},
+    }
+
+    for name, kwargs in queries.items():
+        method = getattr(analyzer, name)
+        df_sql = method(**kwargs, engine=AnalyticsEngineEnum.sql.value)
+        df_rollup = method(**kwargs, engine=AnalyticsEngineEnum.rollup.value)
+        assert not df_rollup.empty
+
+        columns = ["date_key"] if "date_key" in df_sql else ["year_month_key"]
+        pd.testing.assert_frame_equal(
+            df_rollup.sort_values(columns).reset_index(drop=True),
+            df_sql.sort_values(columns).reset_index(drop=True),
+            check_exact=False,
+            rtol=1e-12,
+        )
+
+
+@pytest.mark.parametrize("name", PARITY_QUERIES)
+def test_engines_agree_on_edge_cases(db, name):
+    """Check that SQL, frame and rollup engines return the same rows on shared edge case data"""
+
+    df = make_parity_df()
+    # rollups are prepared from the first load and updated by the second one
+    db.load_dataframe(df=df.iloc[::2], table_name=TABLE_NAME)
+    db.prepare_rollups(table_name=TABLE_NAME)
+    db.load_dataframe(df=df.iloc[1::2], table_name=TABLE_NAME)
+
+    analyzer = CryptoAnalyzer(db=db, table_name=TABLE_NAME, df=df)
+    method = getattr(analyzer, name)
+    results = {
+        engine.value: method(**PARITY_QUERIES[name], engine=engine.value)
+        for engine in AnalyticsEngineEnum
+    }
+
+    df_sql = results[AnalyticsEngineEnum.sql.value]
+    assert not df_sql.empty
+    columns = ["coin_name", "currency"] + (
+        ["date_key"] if "date_key" in df_sql else ["year_month_key"]
+    )
+    for engine, df_engine in results.items():
+        pd.testing.assert_frame_equal(
+            df_engine.sort_values(columns).reset_index(drop=True),
+            df_sql.sort_values(columns).reset_index(drop=True),
+            check_exact=False,
+            rtol=1e-12,
+            obj=f"{name} of {engine} engine",
+        )
+
+
+def test_date_range_keeps_windows_of_whole_history(db):
+    """Check that every engine returns rows of date range with windows and lags reaching rows outside it"""
+
+    rng = np.random.default_rng(5)
+    date_keys = [
+        int(day.strftime("%Y%m%d")) for day in pd.date_range("2024-01-01", "2024-02-29")
+    ]
+    df = make_df(date_keys, rng.choice([0.0, 1.5, 2.25, 10.99], len(date_keys)))
+    db.load_dataframe(df=df, table_name=TABLE_NAME)
+    db.prepare_rollups(table_name=TABLE_NAME)
+
+    analyzer = CryptoAnalyzer(db=db, table_name=TABLE_NAME, df=df)
+    queries = {
+        "get_moving_average": {"preceding_days": 3, "following_days": 2},
+        "get_moving_averages": {"windows": [(6, 0), (0, 4), (100, 100)]},
+        "get_volatility": {"lag_to_row": 7},
+        "get_growth": {"lags": [1, 30]},
+    }
+    date_range = {"start_date_key": "20240205", "end_date_key": "20240229"}
+
+    for name, kwargs in queries.items():
+        method = getattr(analyzer, name)
+        df_sql = method(**kwargs, column=ColumnsToAnalyzeEnum.price.value)
+        df_expected = (
+            df_sql[df_sql["date_key"] >= 20240205]
+            .sort_values("date_key")
+            .reset_index(drop=True)
+        )
+
+        for engine in AnalyticsEngineEnum:
+            df_range = method(
+                **kwargs,
+                **date_range,
+                column=ColumnsToAnalyzeEnum.price.value,
+                engine=engine.value,
+            )
+            pd.testing.assert_frame_equal(
+                df_range.sort_values("date_key").reset_index(drop=True),
+                df_expected,
+                check_exact=False,
+                rtol=1e-12,
+            )
+
+
+def test_stale_rollups_are_rebuilt(db, monkeypatch):
+    """Check that rollups left behind by failed update are rebuilt when they are prepared"""
+
+    db.load_dataframe(
+        df=make_df([20240101, 20240102], [1.0, 2.0]), table_name=TABLE_NAME
+    )
+    db.prepare_rollups(table_name=TABLE_NAME)
+
+    def fail(**kwargs):
+        raise RuntimeError("update failed")
+
+    with monkeypatch.context() as m:
+        m.setattr(db.rollups, "_refresh", fail)
+        db.load_dataframe(df=make_df([20240103], [6.0]), table_name=TABLE_NAME)
+
+    analyzer = CryptoAnalyzer(db=db, table_name=TABLE_NAME)
+    df = analyzer.get_monthly_analysis(
+        pairs=[("bitcoin", "usd")], engine=AnalyticsEngineEnum.rollup.value
+    )
+
+    assert df["avg_price"].tolist() == [3.0]
+
+
+def test_loads_never_rebuild_rollups(db):
+    """Check that loads don't build rollups and rollups not prepared by loader are rebuilt later"""
+
+    db.load_dataframe(df=make_df([20240101], [1.0]), table_name=TABLE_NAME)
+    assert not inspect(db.engine).has_table(Rollups.get_prefix_table(TABLE_NAME))
+
+    # loader without rollup maintenance only marks rollups stale
+    other_db = DatabaseLoader(backend=db.dialect.backend)
+    other_db.engine = db.engine
+    other_db.bulk_loader.engine = db.engine
+    other_db.bulk_loader.verbose = False
+    other_db.load_dataframe(df=make_df([20240102], [3.0]), table_name=TABLE_NAME)
+    db.prepare_rollups(table_name=TABLE_NAME)
+
+    # prefixes of later days are shifted when a missing day is back-filled
+    db.load_dataframe(
+        df=make_df([20240103, 20240105], [5.0, 9.0]), table_name=TABLE_NAME
+    )
+    db.load_dataframe(df=make_df([20240104], [7.0]), table_name=TABLE_NAME)
+    assert get_prefixes(db) == [
+        (20240101, 1, 1.0),
+        (20240102, 2, 4.0),
+        (20240103, 3, 9.0),
+        (20240104, 4, 16.0),
+        (20240105, 5, 25.0),
+    ]
+
+    # rollups changed by another loader are not updated but rebuilt
+    other_db.load_dataframe(df=make_df([20240106], [11.0]), table_name=TABLE_NAME)
+    db.load_dataframe(df=make_df([20240107], [13.0]), table_name=TABLE_NAME)
+    assert len(get_prefixes(db)) == 5
+    db.prepare_rollups(table_name=TABLE_NAME)
+    assert get_prefixes(db)[-2:] == [(20240106, 6, 36.0), (20240107, 7, 49.0)]
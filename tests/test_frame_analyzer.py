@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.FrameAnalyzer import FrameAnalyzer
+from app.SqlDialect import EmbeddedSqlDialect
+from app.enums.ColumnsToAnalyzeEnum import ColumnsToAnalyzeEnum
+from app.enums.OrderEnum import OrderEnum
+
+
+def make_df(coin_name: str, date_keys: list[int], prices: list[float]) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "price": prices,
+            "volume": [2.675] * len(prices),
+            "capitalization": [5000.0] * len(prices),
+            "date_key": date_keys,
+            "coin_name": pd.Categorical([coin_name] * len(prices)),
+            "currency": pd.Categorical(["usd"] * len(prices)),
+        }
+    )
+
+
+@pytest.fixture
+def frame_analyzer():
+    """Get frame analyzer of two pairs given out of date order"""
+
+    df = pd.concat(
+        [
+            make_df(
+                "bitcoin",
+                [20240201, 20240130, 20240131, 20240203, 20240202],
+                [2.0, 2.0, 3.0, 1.0, 0.0],
+            ),
+            make_df(
+                "ethereum",
+                [20240101, 20240102, 20240103, 20240104],
+                [8.0, 8.01, 8.0, 7.99],
+            ),
+        ],
+        ignore_index=True,
+    )
+    return FrameAnalyzer(df=df)
+
+
+def test_spikes_dense_rank(frame_analyzer):
+    """Check that tied values share rank and ranks have no gaps"""
+
+    df = frame_analyzer.get_spikes(
+        up_to_rank=2,
+        column=ColumnsToAnalyzeEnum.price.value,
+        order=OrderEnum.descending.value,
+        pairs=[("bitcoin", "usd")],
+        start_date_key="20240101",
+        end_date_key="20240201",
+    )
+
+    assert df["date_key"].tolist() == [20240131, 20240130, 20240201]
+    assert df["price_rank"].tolist() == [1, 2, 2]
+    assert df["price"].tolist() == [3.0, 2.0, 2.0]
+
+
+def test_moving_average_window_edges(frame_analyzer):
+    """Check that frame is cut at pair edges and AVG is rounded like MySQL DECIMAL"""
+
+    df = frame_analyzer.get_moving_average(
+        column=ColumnsToAnalyzeEnum.price.value,
+        preceding_days=1,
+        following_days=1,
+        pairs=[("bitcoin", "usd")],
+    )
+
+    assert df["date_key"].tolist() == [
+        20240130,
+        20240131,
+        20240201,
+        20240202,
+        20240203,
+    ]
+    assert df["moving_avg_price"].tolist() == [2.5, 2.333333, 1.666667, 1.0, 0.5]
+
+
+def test_moving_average_double_dialect():
+    """Check that DOUBLE average of embedded backends is the nearest float of mean"""
+
+    frame_analyzer = FrameAnalyzer(
+        df=make_df("bitcoin", [20240101, 20240102, 20240103], [2.0, 3.0, 2.0]),
+        dialect=EmbeddedSqlDialect(),
+    )
+
+    df = frame_analyzer.get_moving_average(
+        column=ColumnsToAnalyzeEnum.price.value,
+        preceding_days=2,
+        following_days=0,
+        pairs=None,
+    )
+
+    assert df["moving_avg_price"].tolist() == [2.0, 2.5, 7 / 3]
+
+
+def test_volatility_rounding(frame_analyzer):
+    """Check growth rounding half away from zero and NULL on division by zero"""
+
+    df = frame_analyzer.get_volatility(
+        column=ColumnsToAnalyzeEnum.price.value, lag_to_row=1, pairs=None
+    )
+    growth = dict(zip(df["date_key"], df["price_growth"]))
+
+    assert growth[20240131] == 50.0
+    assert growth[20240201] == -33.33
+    assert growth[20240202] == -100.0
+    assert np.isnan(growth[20240203])
+    assert [growth[20240102], growth[20240103], growth[20240104]] == [
+        0.13,
+        -0.12,
+        -0.13,
+    ]
+
+
+def test_monthly_analysis(frame_analyzer):
+    """Check averages of every month and rounding of values to column scale"""
+
+    df = frame_analyzer.get_monthly_analysis(pairs=None)
+
+    assert df["year_month_key"].tolist() == ["2024-01", "2024-02", "2024-01"]
+    assert df["coin_name"].tolist() == ["bitcoin", "bitcoin", "ethereum"]
+    assert df["avg_price"].tolist() == [2.5, 1.0, 8.0]
+    # 2.675 is stored as 2.68 like MySQL rounds decimal literal
+    assert df["avg_volume"].tolist() == [2.68, 2.68, 2.68]
+
+
+def test_growth_of_every_lag(frame_analyzer):
+    """Check that rows without lagged row keep NaN growth and lag 1 matches volatility"""
+
+    df = frame_analyzer.get_growth(
+        column=ColumnsToAnalyzeEnum.price.value,
+        lags=[1, 3],
+        pairs=[("ethereum", "usd")],
+    )
+    df_volatility = frame_analyzer.get_volatility(
+        column=ColumnsToAnalyzeEnum.price.value,
+        lag_to_row=1,
+        pairs=[("ethereum", "usd")],
+    )
+
+    assert df["date_key"].tolist() == [20240101, 20240102, 20240103, 20240104]
+    assert np.isnan(df["price_growth_1"][0])
+    assert df["price_growth_1"][1:].tolist() == df_volatility["price_growth"].tolist()
+    assert np.isnan(df["price_growth_3"][:3]).all()
+    assert df["price_growth_3"][3] == -0.13
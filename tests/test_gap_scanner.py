@@ -0,0 +1,64 @@
+import pytest
+from unittest.mock import MagicMock
+
+from app.GapScanner import GapScanner
+
+
+@pytest.fixture
+def mock_db():
+    """Get mock database instance"""
+    return MagicMock()
+
+
+@pytest.fixture
+def scanner(mock_db):
+    """Get gap scanner with mock database"""
+    return GapScanner(db=mock_db, table_name="test_crypto_table")
+
+
+def test_find_gaps(scanner, mock_db):
+    """Check that present days around the gap are turned into missing day range"""
+
+    mock_db.execute_query.return_value = [
+        ("bitcoin", "usd", 20240101, 20240105),
+        ("bitcoin", "usd", 20240228, 20240301),
+    ]
+
+    gaps = scanner.find_gaps()
+
+    called_sql = mock_db.execute_query.call_args[1]["query"]
+    assert "LAG(date_key)" in called_sql
+    assert "FROM test_crypto_table" in called_sql
+
+    assert gaps == [
+        ("bitcoin", "usd", 20240102, 20240104),
+        ("bitcoin", "usd", 20240229, 20240229),
+    ]
+
+
+def test_find_gaps_empty_table(scanner, mock_db):
+    """Check that nothing is returned for table without gaps"""
+
+    mock_db.execute_query.return_value = None
+
+    assert scanner.find_gaps() == []
+
+
+def test_merge_gaps():
+    """Check that close gaps of one pair are merged into one range"""
+
+    gaps = [
+        ("bitcoin", "usd", 20240102, 20240102),
+        ("bitcoin", "usd", 20240105, 20240106),
+        ("bitcoin", "usd", 20240301, 20240301),
+        ("ethereum", "usd", 20240103, 20240103),
+    ]
+
+    ranges = GapScanner.merge_gaps(gaps=gaps, merge_within_days=2)
+
+    assert ranges == [
+        # 2024-01-02 00:00:00 UTC up to 2024-01-06 23:59:59 UTC
+        ("bitcoin", "usd", 1704153600, 1704585599),
+        ("bitcoin", "usd", 1709251200, 1709337599),
+        ("ethereum", "usd", 1704240000, 1704326399),
+    ]
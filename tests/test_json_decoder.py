@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.JsonDecoder import JsonDecoder
+
+BODY = b'{"prices": [[1704067200000, 42000.5]], "total_volumes": [], "market_caps": [[1704067200000, 8.0]]}'
+
+
+def test_decode_to_lists():
+    """Check that body is decoded into plain python objects by default"""
+
+    data = JsonDecoder().decode(BODY)
+
+    assert data["prices"] == [[1704067200000, 42000.5]]
+    assert data["total_volumes"] == []
+
+
+def test_decode_to_numpy():
+    """Check that market chart series are decoded into (n, 2) float64 arrays"""
+
+    data = JsonDecoder(to_numpy=True).decode(BODY)
+
+    assert isinstance(data["prices"], np.ndarray)
+    assert data["prices"].dtype == np.float64
+    assert data["prices"].shape == (1, 2)
+    assert data["prices"][0, 0] == 1704067200000
+    assert data["total_volumes"].shape == (0, 2)
+
+
+@pytest.mark.asyncio
+async def test_large_body_is_decoded_in_executor():
+    """Check that bodies above threshold are decoded in executor"""
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        decoder = JsonDecoder(offload_threshold=10, executor=executor)
+        data = await decoder.decode_async(BODY)
+
+    assert data["market_caps"] == [[1704067200000, 8.0]]
+
+
+@pytest.mark.asyncio
+async def test_decode_invalid_body():
+    """Check that invalid JSON raises ValueError"""
+
+    with pytest.raises(ValueError):
+        await JsonDecoder().decode_async(b"not json")
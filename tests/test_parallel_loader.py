@@ -0,0 +1,144 @@
+import pandas as pd
+import pytest
+from unittest.mock import MagicMock
+from sqlalchemy.exc import OperationalError
+
+from app.ParallelLoader import ParallelLoader
+from app.SqlDialect import SqliteDialect
+
+
+@pytest.fixture
+def mock_engine():
+    """Get mock engine with pool of 4 connections"""
+
+    engine = MagicMock()
+    engine.pool.size.return_value = 4
+    return engine
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame(
+        {
+            "coin_name": ["bitcoin", "bitcoin", "ethereum", "ethereum", "solana"],
+            "currency": ["usd"] * 5,
+            "date_key": [20240101, 20240102, 20240101, 20240103, 20240104],
+            "price": [1.0, 2.0, 3.0, 4.0, 5.0],
+        }
+    )
+
+
+def make_error(code: int) -> OperationalError:
+    return OperationalError("INSERT", {}, Exception(code, "error"))
+
+
+def test_split_by_pair(mock_engine, df):
+    """Check that every pair is one partition"""
+
+    loader = ParallelLoader(engine=mock_engine)
+    partitions = loader.split(df=df, partitions=2)
+
+    assert len(partitions) == 3
+    assert sorted(len(p) for p in partitions) == [1, 2, 2]
+
+
+def test_split_by_date_keeps_days_together(mock_engine, df):
+    """Check that date ranges cover every row and never split one day"""
+
+    loader = ParallelLoader(engine=mock_engine, partition_by="date")
+    partitions = loader.split(df=df, partitions=2)
+
+    assert len(partitions) == 2
+    assert sum(len(p) for p in partitions) == len(df)
+    assert set(partitions[0]["date_key"]).isdisjoint(partitions[1]["date_key"])
+
+
+def test_workers_are_limited_to_pool_size(mock_engine):
+    """Check that workers never exceed number of pooled connections"""
+
+    assert ParallelLoader(engine=mock_engine, workers=16).workers == 4
+
+
+def test_partition_is_retried_on_deadlock(mock_engine, df):
+    """Check that deadlocked partition is retried and other errors are reported"""
+
+    loader = ParallelLoader(engine=mock_engine, backoff_base=0, track_changes=True)
+    calls = {}
+
+    def load(df, table_name, strategy, mode):
+        coin = df["coin_name"].iloc[0]
+        calls[coin] = calls.get(coin, 0) + 1
+        if coin == "bitcoin" and calls[coin] == 1:
+            raise make_error(1213)
+        if coin == "solana":
+            raise make_error(1062)
+        return {"rows": len(df), "changed_keys": [], "changed_pairs": {(coin, "usd")}}
+
+    loader.bulk_loader.load = MagicMock(side_effect=load)
+    stats = loader.load(df=df, table_name="crypto_data", mode="upsert")
+
+    assert calls == {"bitcoin": 2, "ethereum": 1, "solana": 1}
+    assert stats["rows"] == 4
+    assert stats["retries"] == 1
+    assert stats["failed"] == 1
+    assert [ParallelLoader._get_error_code(e) for e in stats["errors"]] == [1062]
+    # failed partition may have committed some chunks
+    assert stats["changed_pairs"] == {
+        ("bitcoin", "usd"),
+        ("ethereum", "usd"),
+        ("solana", "usd"),
+    }
+    assert loader.bulk_loader.load.call_args.kwargs["mode"] == "upsert"
+
+
+def test_benchmark_uses_scratch_table(mock_engine, df):
+    """Check that benchmark loads copy of table once per worker count"""
+
+    conn = mock_engine.connect.return_value.__enter__.return_value
+    loader = ParallelLoader(engine=mock_engine)
+    loader.bulk_loader.load = MagicMock(
+        side_effect=lambda df, **kwargs: {
+            "rows": len(df),
+            "changed_keys": [],
+            "changed_pairs": set(),
+        }
+    )
+
+    df_benchmark = loader.benchmark(
+        df=df, table_name="crypto_data", worker_counts=[1, 2]
+    )
+
+    assert df_benchmark["workers"].tolist() == [1, 2]
+    statements = [c.args[0] for c in conn.exec_driver_sql.call_args_list]
+    assert statements[0] == (
+        "CREATE TABLE IF NOT EXISTS `crypto_data_benchmark` LIKE `crypto_data`"
+    )
+    assert statements.count("TRUNCATE TABLE `crypto_data_benchmark`") == 2
+    assert statements[-1] == "DROP TABLE IF EXISTS `crypto_data_benchmark`"
+    assert all(
+        c.kwargs["table_name"] == "crypto_data_benchmark"
+        for c in loader.bulk_loader.load.call_args_list
+    )
+
+
+def test_benchmark_uses_dialect_of_backend(mock_engine, df):
+    """Check that scratch table of embedded backend is created, emptied and dropped with its SQL"""
+
+    conn = mock_engine.connect.return_value.__enter__.return_value
+    loader = ParallelLoader(engine=mock_engine, dialect=SqliteDialect())
+    loader.bulk_loader.load = MagicMock(
+        side_effect=lambda df, **kwargs: {
+            "rows": len(df),
+            "changed_keys": [],
+            "changed_pairs": set(),
+        }
+    )
+
+    loader.benchmark(df=df, table_name="crypto_data", worker_counts=[1])
+
+    statements = [c.args[0] for c in conn.exec_driver_sql.call_args_list]
+    assert statements[0].startswith(
+        'CREATE TABLE IF NOT EXISTS "crypto_data_benchmark" ('
+    )
+    assert 'DELETE FROM "crypto_data_benchmark"' in statements
+    assert statements[-1] == 'DROP TABLE IF EXISTS "crypto_data_benchmark"'
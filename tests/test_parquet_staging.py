@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from app.CryptoTransformer import CryptoTransformer
+from app.ParquetStaging import ParquetStaging
+
+# 2024-01-31 12:00 and 2024-02-01 12:00 UTC
+TIMESTAMPS = [1706702400000, 1706788800000]
+
+
+def make_payload(price: float) -> dict[str, list]:
+    return {
+        "prices": [[ts, price + i] for i, ts in enumerate(TIMESTAMPS)],
+        "total_volumes": [[ts, 1000.0 + i] for i, ts in enumerate(TIMESTAMPS)],
+        "market_caps": [[ts, 5000.0 + i] for i, ts in enumerate(TIMESTAMPS)],
+    }
+
+
+def normalize(data, coins_data) -> pd.DataFrame:
+    transformer = CryptoTransformer()
+    transformer.normalize_crypto_data(data=data, coins_data=coins_data)
+    return transformer.get_normalized_crypto()
+
+
+def test_raw_replay_matches_fetched_data(tmp_path):
+    """Check that replayed raw payloads normalize into the same frame"""
+
+    staging = ParquetStaging(root_dir=str(tmp_path))
+    data = [make_payload(100.0), make_payload(10.0)]
+    coins_data = [("bitcoin", "usd"), ("ethereum", "usd")]
+
+    run_id = staging.write_raw(data=data, coins_data=coins_data)
+    replay_data, replay_coins_data = staging.read_raw(run_id=run_id)
+
+    assert replay_coins_data == coins_data
+    pd.testing.assert_frame_equal(
+        normalize(replay_data, replay_coins_data), normalize(data, coins_data)
+    )
+
+
+def test_raw_runs_are_deduplicated(tmp_path):
+    """Check that points of several runs are read once with value of the latest run"""
+
+    staging = ParquetStaging(root_dir=str(tmp_path))
+    coins_data = [("bitcoin", "usd")]
+    staging.write_raw(data=[make_payload(100.0)], coins_data=coins_data)
+    latest_payload = make_payload(200.0)
+    latest_payload["prices"] = latest_payload["prices"][1:]
+    staging.write_raw(data=[latest_payload], coins_data=coins_data)
+
+    replay_data, replay_coins_data = staging.read_raw()
+
+    assert replay_coins_data == coins_data
+    assert replay_data[0]["prices"][:, 1].tolist() == [100.0, 201.0]
+    assert replay_data[0]["total_volumes"][:, 1].tolist() == [1000.0, 1001.0]
+
+
+def test_normalized_reader_prunes_partitions(tmp_path):
+    """Check that only partitions matching filters are read"""
+
+    staging = ParquetStaging(root_dir=str(tmp_path))
+    coins_data = [("bitcoin", "usd"), ("ethereum", "usd")]
+    df = normalize([make_payload(100.0), make_payload(10.0)], coins_data)
+
+    staging.write_normalized(df=df)
+
+    assert (tmp_path / "normalized" / "coin_name=bitcoin" / "currency=usd").is_dir()
+
+    df_read = staging.read_normalized(coins=["ethereum"], months=[202402])
+    assert len(df_read) == 1
+    assert df_read["coin_name"].tolist() == ["ethereum"]
+    assert df_read["date_key"].tolist() == [20240201]
+    assert df_read["price"].tolist() == [11.0]
+
+
+def test_readers_without_data(tmp_path):
+    """Check that readers return empty results before anything was written"""
+
+    staging = ParquetStaging(root_dir=str(tmp_path))
+
+    assert staging.read_normalized().empty
+    assert staging.read_raw() == ([], [])
+
+
+def test_timestamps_to_months():
+    """Check conversion of millisecond timestamps into YYYYMM"""
+
+    months = ParquetStaging._timestamps_to_months(np.array(TIMESTAMPS))
+
+    assert months.tolist() == [202401, 202402]
@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+
+from app.QueryCache import QueryCache
+
+QUERY = "SELECT coin_name, price FROM crypto_data WHERE coin_name = 'bitcoin';"
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({"coin_name": ["bitcoin"] * 3, "price": [1.0, 2.0, 3.0]})
+
+
+def test_cache_hit_and_miss(df):
+    """Check that cached frame is returned only for the same data version"""
+
+    cache = QueryCache()
+
+    assert cache.get(QUERY, version=[1]) is None
+    cache.set(QUERY, version=[1], df=df)
+
+    cached = cache.get("  " + QUERY.replace(" ", "\n"), version=[1])
+    pd.testing.assert_frame_equal(cached, df)
+    assert cache.get(QUERY, version=[2]) is None
+
+    # returned frame is a copy
+    cached["price"] = 0.0
+    assert cache.get(QUERY, version=[1])["price"].tolist() == [1.0, 2.0, 3.0]
+
+    report = cache.get_report()
+    assert report["hits"] == 2
+    assert report["misses"] == 2
+    assert report["entries"] == 1
+
+
+def test_memory_eviction_by_size(df):
+    """Check that least recently used frames are evicted above memory limit"""
+
+    size = int(df.memory_usage(index=True, deep=True).sum())
+    cache = QueryCache(max_bytes=size * 2)
+
+    cache.set("first", version=[], df=df)
+    cache.set("second", version=[], df=df)
+    cache.get("first", version=[])
+    cache.set("third", version=[], df=df)
+
+    assert cache.get("second", version=[]) is None
+    assert cache.get("first", version=[]) is not None
+    assert cache.get_report()["evictions"] == 1
+
+
+def test_disk_store_survives_restart(tmp_path, df):
+    """Check that flushed on-disk store is reused by new cache instance"""
+
+    cache = QueryCache(cache_dir=str(tmp_path))
+    cache.set(QUERY, version=[1], df=df)
+    cache.flush()
+
+    restarted = QueryCache(cache_dir=str(tmp_path))
+
+    pd.testing.assert_frame_equal(restarted.get(QUERY, version=[1]), df)
+    assert restarted.get_report()["disk_entries"] == 1
+
+
+def test_unflushed_files_are_adopted(tmp_path, df):
+    """Check that pickles written without flushed index are reused after restart"""
+
+    cache = QueryCache(cache_dir=str(tmp_path))
+    cache.set(QUERY, version=[1], df=df)
+    (tmp_path / "interrupted.tmp").write_bytes(b"partial")
+
+    restarted = QueryCache(cache_dir=str(tmp_path))
+
+    pd.testing.assert_frame_equal(restarted.get(QUERY, version=[1]), df)
+    assert restarted.get_report()["disk_entries"] == 1
+    assert not (tmp_path / "interrupted.tmp").exists()
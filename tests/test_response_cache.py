@@ -0,0 +1,116 @@
+import time
+
+import pytest
+
+from app.ResponseCache import ResponseCache
+
+URL = "https://api.coingecko.com/api/v3/coins/bitcoin/market_chart/range"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(cache_dir=str(tmp_path))
+
+
+def test_cache_hit_and_miss(cache):
+    """Check that cached response is returned and statistics are counted"""
+
+    params = {"vs_currency": "usd", "from": 1704067200, "to": 1704153599}
+
+    assert cache.get(URL, params) is None
+    cache.set(URL, params, b'{"prices": [[1704067200000, 42000.0]]}')
+
+    assert cache.get(URL, params) == b'{"prices": [[1704067200000, 42000.0]]}'
+
+    report = cache.get_report()
+    assert report["hits"] == 1
+    assert report["misses"] == 1
+    assert report["entries"] == 1
+
+
+def test_cache_key_keeps_exact_time_range():
+    """Check that only the same url, params and bounds share key"""
+
+    key = ResponseCache.make_key(
+        URL, {"vs_currency": "usd", "from": 1704067200, "to": 1704100000}
+    )
+    same_key = ResponseCache.make_key(
+        URL + "/", {"to": "1704100000", "from": 1704067200, "vs_currency": "usd"}
+    )
+    same_day_key = ResponseCache.make_key(
+        URL, {"vs_currency": "usd", "from": 1704067200, "to": 1704110000}
+    )
+
+    assert key == same_key
+    assert key != same_day_key
+
+
+def test_only_range_ending_at_day_start_is_closed(cache):
+    """Check that range ending inside past day expires and range ending at day start does not"""
+
+    today_start = int(time.time()) // 86400 * 86400
+    closed = {"vs_currency": "usd", "from": 1704067200, "to": today_start}
+    mid_day = {"vs_currency": "usd", "from": 1704067200, "to": today_start - 3600}
+
+    cache.set(URL, closed, b'{"prices": []}')
+    cache.set(URL, mid_day, b'{"prices": []}')
+
+    entries = cache._index
+    assert entries[ResponseCache.make_key(URL, closed)]["expires_at"] is None
+    assert entries[ResponseCache.make_key(URL, mid_day)]["expires_at"] is not None
+
+
+def test_open_day_expires(cache):
+    """Check that response including current day expires after TTL"""
+
+    cache.open_day_ttl = -1
+    params = {"vs_currency": "usd", "from": 1704067200, "to": int(time.time())}
+    cache.set(URL, params, b'{"prices": []}')
+
+    assert cache.get(URL, params) is None
+
+
+def test_cache_persists_between_instances(tmp_path):
+    """Check that closed day response survives restart"""
+
+    params = {"vs_currency": "usd", "from": 1704067200, "to": 1704153600}
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    cache.set(URL, params, b'{"prices": [[1, 2]]}')
+    cache.flush()
+
+    restarted_cache = ResponseCache(cache_dir=str(tmp_path))
+    assert restarted_cache.get(URL, params) == b'{"prices": [[1, 2]]}'
+
+
+def test_unflushed_files_are_adopted(tmp_path):
+    """Check that files written without flushed index are reused and stale temp files removed"""
+
+    params = {"vs_currency": "usd", "from": 1704067200, "to": 1704153599}
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    cache.set(URL, params, b'{"prices": [[1, 2]]}')
+    (tmp_path / "interrupted.tmp").write_bytes(b'{"pri')
+
+    restarted_cache = ResponseCache(cache_dir=str(tmp_path))
+
+    assert restarted_cache.get(URL, params) == b'{"prices": [[1, 2]]}'
+    assert restarted_cache.get_report()["total_bytes"] == 20
+    assert not (tmp_path / "interrupted.tmp").exists()
+
+
+def test_lru_eviction_by_size(tmp_path):
+    """Check that least recently used entries are evicted above size limit"""
+
+    cache = ResponseCache(cache_dir=str(tmp_path), max_bytes=50)
+    first = {"vs_currency": "usd", "from": 0, "to": 86400}
+    second = {"vs_currency": "eur", "from": 0, "to": 86400}
+    third = {"vs_currency": "gbp", "from": 0, "to": 86400}
+
+    cache.set(URL, first, b'{"prices": [[1, 2]]}')
+    cache.set(URL, second, b'{"prices": [[1, 2]]}')
+    # access first entry so second one becomes least recently used
+    cache.get(URL, first)
+    cache.set(URL, third, b'{"prices": [[1, 2]]}')
+
+    assert cache.get(URL, second) is None
+    assert cache.get(URL, first) is not None
+    assert cache.get_report()["total_bytes"] <= 50
@@ -0,0 +1,56 @@
+from decimal import Decimal
+
+from app.ResultFrame import infer_schema, make_dataframe
+
+
+def test_make_dataframe_converts_decimals():
+    """Check that DECIMAL values become float64 and missing values are kept"""
+
+    rows = [
+        ("bitcoin", 20240101, Decimal("42000.50")),
+        ("bitcoin", 20240102, None),
+    ]
+
+    df = make_dataframe(rows=rows, columns=["coin_name", "date_key", "price"])
+
+    assert df["price"].dtype == "float64"
+    assert df["date_key"].dtype == "int64"
+    assert df.iloc[0]["price"] == 42000.5
+    assert df["price"].isna().iloc[1]
+
+
+def test_make_dataframe_nullable_integers():
+    """Check that integer column with NULL keeps integer dtype"""
+
+    df = make_dataframe(
+        rows=[(1,), (None,)], columns=["rank"], schema={"rank": "int64"}
+    )
+
+    assert df["rank"].dtype == "Int64"
+    assert df["rank"].isna().tolist() == [False, True]
+
+
+def test_make_dataframe_zero_rows():
+    """Check that zero-row result has columns of declared schema"""
+
+    schema = {"date_key": "int64", "price": "float64", "coin_name": "str"}
+
+    df = make_dataframe(rows=[], columns=list(schema), schema=schema)
+
+    assert df.empty
+    assert list(df.columns) == list(schema)
+    assert df["date_key"].dtype == "int64"
+    assert df["price"].dtype == "float64"
+
+
+def test_infer_schema():
+    """Check dtypes inferred from first non-null value"""
+
+    rows = [(None, 1, "usd", True), (Decimal("1.5"), 2, "eur", False)]
+
+    assert infer_schema(rows, ["price", "date_key", "currency", "flag"]) == {
+        "price": "float64",
+        "date_key": "int64",
+        "currency": "str",
+        "flag": "bool",
+    }